@@ -0,0 +1,74 @@
+"""Time the vectorized group-bys of :mod:`src.scraper.analytics`.
+
+Run with ``python -m benchmarks.analytics [--offers 1000000]``. A
+synthetic :class:`OfferFrame` with realistic cardinalities (brands,
+models, years, locations) is built directly from arrays, then a few
+typical aggregations are timed; the best of ``--repeat`` runs is shown.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.scraper.analytics import CATEGORICAL, NUMERIC, OfferFrame
+
+QUERIES = [
+    (("model", "year"), "price", ("count", "median", "p25", "p75")),
+    (("car_brand",), "price_per_km", ("count", "mean", "p90")),
+    (("fuel_type", "location"), "mileage_km", ("count", "median")),
+    ((), "price", ("count", "mean", "p1", "p99")),
+]
+CARDINALITY = {
+    "car_brand": 60,
+    "model": 800,
+    "fuel_type": 6,
+    "location": 2500,
+    "price_currency": 2,
+}
+
+
+def synthetic_frame(n: int, seed: int = 0) -> OfferFrame:
+    rng = np.random.default_rng(seed)
+    numeric = {
+        "year": rng.integers(1995, 2026, n).astype(np.float64),
+        "price": rng.lognormal(11, 0.6, n).round(),
+        "engine_capacity": rng.choice([998.0, 1395.0, 1598.0, 1968.0, 2993.0], n),
+        "engine_power": rng.integers(60, 400, n).astype(np.float64),
+        "mileage_km": rng.integers(0, 400_000, n).astype(np.float64),
+    }
+    # some missing values, as in scraped data
+    numeric["mileage_km"][rng.random(n) < 0.05] = np.nan
+    codes = {
+        f: rng.integers(0, CARDINALITY[f], n).astype(np.int32) for f in CATEGORICAL
+    }
+    categories = {
+        f: [f"{f}-{i:04d}" for i in range(CARDINALITY[f])] for f in CATEGORICAL
+    }
+    assert set(numeric) == set(NUMERIC)
+    return OfferFrame(numeric, codes, categories)
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--offers", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    frame = synthetic_frame(args.offers)
+    print(f"{len(frame)} offers")
+    for by, value, aggregates in QUERIES:
+        best, rows = float("inf"), []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            rows = frame.group_by(by, value, aggregates)
+            best = min(best, time.perf_counter() - started)
+        label = ", ".join(by) or "(all)"
+        print(
+            f"  {best * 1000:7.1f} ms  {value} by {label}: "
+            f"{len(rows)} groups, {' '.join(aggregates)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Compare the BeautifulSoup and streaming DOM parsers on snapshot.html.
+
+Run with ``python -m benchmarks.dom_backends [path]``. Prints the mean
+wall time and the tracemalloc peak of parsing the page with each backend.
+"""
+
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from src.scraper.parser import parse_listings_dom
+from src.scraper.stream_parser import parse_listings_stream
+
+ROOT = Path(__file__).resolve().parents[1]
+BASE_URL = "https://www.otomoto.pl/osobowe/bmw/seria-5"
+BACKENDS = {"soup": parse_listings_dom, "stream": parse_listings_stream}
+
+
+def measure(func, html: str, repeat: int = 5):
+    """Return (mean seconds, peak traced bytes, offers) for `func(html)`."""
+    with redirect_stdout(StringIO()):
+        offers = func(html, BASE_URL)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func(html, BASE_URL)
+        elapsed = (time.perf_counter() - started) / repeat
+
+        tracemalloc.start()
+        func(html, BASE_URL)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak, len(offers)
+
+
+def main(argv=None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    path = Path(argv[0]) if argv else ROOT / "snapshot.html"
+    html = path.read_text(encoding="utf-8")
+    print(f"{path.name}: {len(html) / 1e6:.2f} MB")
+    results = {}
+    for name, func in BACKENDS.items():
+        results[name] = measure(func, html)
+        elapsed, peak, count = results[name]
+        print(
+            f"  {name:<7} {elapsed * 1000:8.1f} ms  "
+            f"peak {peak / 1e6:7.1f} MB  {count} offers"
+        )
+    soup, stream = results["soup"], results["stream"]
+    print(
+        f"  stream vs soup: {soup[0] / stream[0]:.1f}x faster, "
+        f"{soup[1] / max(stream[1], 1):.1f}x less peak memory"
+    )
+
+
+if __name__ == "__main__":
+    main()
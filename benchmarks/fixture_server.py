@@ -0,0 +1,211 @@
+"""Local stand-in for the listing site, serving pages built from snapshot.html.
+
+Every ``?page=N`` request up to `pages` gets a copy of the template page
+whose offer ids are made unique per page, so a crawl sees new offers on
+every page; later pages are empty. Latency, jitter, random server errors
+and a token-bucket rate limit answering ``429`` with ``Retry-After`` can
+be configured to see how the crawler copes.
+
+Run standalone with ``python -m benchmarks.fixture_server --port 8765``
+or use :class:`FixtureServer` as a context manager.
+"""
+
+import argparse
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from src.scraper.ratelimit import TokenBucket
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_TEMPLATE = ROOT / "snapshot.html"
+LISTING_PATH = "/osobowe/bmw/seria-5"
+
+EMPTY_PAGE = b"<!DOCTYPE html><html><body><main></main></body></html>"
+
+
+class PageFactory:
+    """Render page `n` of the fake search from a saved listing page."""
+
+    def __init__(self, template: str):
+        self.template = template
+        ids = sorted(set(re.findall(r'<article[^>]*data-id="([^"]+)"', template)))
+        self._ids = re.compile("|".join(re.escape(i) for i in ids)) if ids else None
+        self.offers_per_page = len(ids)
+        self.render = lru_cache(maxsize=64)(self._render)
+
+    def _render(self, page: int) -> bytes:
+        if self._ids is None:
+            return self.template.encode("utf-8")
+        suffix = f"{page:04d}"
+        html = self._ids.sub(lambda m: m.group(0) + suffix, self.template)
+        return html.encode("utf-8")
+
+
+class FixtureServer:
+    """Threaded HTTP server replaying listing pages with injected faults.
+
+    `latency` and `jitter` are seconds added to every response,
+    `error_rate` is the share of requests answered with ``503``, and
+    `rate_limit` (requests per second, with `burst`) makes excess requests
+    fail with ``429``. `status_counts` counts the statuses sent.
+    """
+
+    def __init__(
+        self,
+        pages: int = 50,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: Optional[float] = None,
+        burst: float = 1.0,
+        template: Path = DEFAULT_TEMPLATE,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.factory = PageFactory(Path(template).read_text(encoding="utf-8"))
+        self.random = random.Random(seed)
+        self.status_counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL of the first listing page."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{LISTING_PATH}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body, headers = server.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path: str):
+        """Return ``(status, body, headers)`` for a request to `path`."""
+        with self._lock:
+            delay = self.latency + (
+                self.random.uniform(0, self.jitter) if self.jitter else 0
+            )
+            fail = self.error_rate and self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        if self.bucket is not None:
+            wait = self.bucket.try_acquire()
+            if wait > 0:
+                return self._count(
+                    429, b"Too Many Requests", {"Retry-After": str(math.ceil(wait))}
+                )
+        if fail:
+            return self._count(503, b"Service Unavailable", {})
+
+        parts = urlsplit(path)
+        if parts.path != LISTING_PATH:
+            return self._count(404, b"Not Found", {})
+        try:
+            page = int(parse_qs(parts.query).get("page", ["1"])[0])
+        except ValueError:
+            page = 1
+        if page > self.pages:
+            return self._count(200, EMPTY_PAGE, {})
+        return self._count(200, self.factory.render(page), {})
+
+    def _count(self, status: int, body: bytes, headers):
+        with self._lock:
+            self.status_counts[status] += 1
+        return status, body, headers
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def add_server_arguments(ap: argparse.ArgumentParser) -> None:
+    """Add the fault-injection options shared with the load test."""
+    ap.add_argument("--pages", type=int, default=50)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    ap.add_argument("--jitter", type=float, default=0.0, help="extra random seconds")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of 503s")
+    ap.add_argument(
+        "--rate-limit", type=float, default=None, help="requests/s before 429"
+    )
+    ap.add_argument("--burst", type=float, default=1.0)
+    ap.add_argument("--template", type=Path, default=DEFAULT_TEMPLATE)
+    ap.add_argument("--seed", type=int, default=None)
+
+
+def server_from_args(args, port: int = 0) -> FixtureServer:
+    return FixtureServer(
+        pages=args.pages,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        template=args.template,
+        port=port,
+        seed=args.seed,
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_server_arguments(ap)
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args(argv)
+    server = server_from_args(args, port=args.port)
+    print(f"Serving {args.pages} pages at {server.url} (Ctrl+C to stop)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(dict(server.status_counts))
+
+
+if __name__ == "__main__":
+    main()
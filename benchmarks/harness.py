@@ -0,0 +1,351 @@
+"""Benchmark harness for the parser and utils hot paths.
+
+Times `parse_listings`, `parse_offer_element` and the small text helpers
+from :mod:`src.scraper.utils` on ``snapshot.html`` and
+``tests/fixtures/sample_page.html``, reports throughput and allocations
+per case and the peak RSS of the whole run, and compares the results
+with a stored baseline. Peak RSS is a high-water mark of the process, so
+it cannot be attributed to single cases run one after another.
+
+Usage::
+
+    python -m benchmarks.harness                       # run and print
+    python -m benchmarks.harness --compare benchmarks/baseline.json
+    python -m benchmarks.harness --save benchmarks/baseline.json
+
+Baselines are machine specific; regenerate one before comparing on a new
+machine. Stage metrics (:mod:`src.scraper.metrics`) are switched off
+unless ``--metrics`` is given, so that their cost can be measured too.
+With ``--compare`` the exit status is 1 when any case is slower
+(or allocates more) than the baseline by more than ``--threshold``.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from bs4 import BeautifulSoup
+
+from src.scraper.metrics import NullMetrics, set_metrics
+from src.scraper.models import CarModel
+from src.scraper.parser import (
+    parse_listings,
+    parse_listings_dom,
+    parse_offer_element,
+    validate_offers,
+)
+from src.scraper.storage import jsonl_bytes
+from src.scraper.stream_parser import parse_listings_stream
+from src.scraper.utils import (
+    make_id_from_url_or_hash,
+    parse_float_from_text,
+    parse_floats_from_texts,
+    parse_int_from_text,
+    parse_ints_from_texts,
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+SNAPSHOT = ROOT / "snapshot.html"
+SAMPLE = ROOT / "tests" / "fixtures" / "sample_page.html"
+BASE_URL = "https://www.otomoto.pl/osobowe/bmw/seria-5"
+DEFAULT_THRESHOLD = 0.25
+
+PRICES = ["48 500 zł", "239 900", "1 234,56 PLN", "89 000 zł", "brak"] * 20
+MILEAGES = ["225 275 km", "45 275 km", "120000", "brak", "0 km"] * 20
+URLS = [
+    "https://www.otomoto.pl/osobowe/oferta/bmw-seria-5-ID6HAxmo.html",
+    "https://www.otomoto.pl/oferta/6141370937",
+    None,
+] * 30
+
+
+@dataclass
+class Case:
+    """A benchmarked callable; `pages` and `offers` are per call."""
+
+    name: str
+    func: Callable[[], object]
+    pages: int = 0
+    offers: int = 0
+    ops: int = 1
+
+
+@dataclass
+class Result:
+    name: str
+    seconds_per_call: float
+    calls: int
+    pages_per_s: Optional[float]
+    offers_per_s: Optional[float]
+    ops_per_s: float
+    alloc_peak_bytes: int
+    alloc_blocks: int
+
+
+def _peak_rss_kb() -> Optional[int]:
+    """Peak RSS of this process so far, over every case already run."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _quiet(func: Callable[[], object]) -> Callable[[], object]:
+    """Wrap `func` so the parsers' debug prints do not skew timings."""
+
+    def run():
+        with redirect_stdout(StringIO()):
+            return func()
+
+    return run
+
+
+def build_cases() -> List[Case]:
+    """Return the benchmark cases available in this checkout."""
+    cases: List[Case] = []
+    pages = {"sample": SAMPLE, "snapshot": SNAPSHOT}
+    for label, path in pages.items():
+        if not path.exists():
+            continue
+        html = path.read_text(encoding="utf-8")
+        with redirect_stdout(StringIO()):
+            parsed = parse_listings(html, BASE_URL)
+            dom_offers = len(parse_listings_dom(html, BASE_URL))
+        offers = len(parsed)
+        cases.append(
+            Case(
+                f"parse_listings[{label}]",
+                _quiet(lambda h=html: parse_listings(h, BASE_URL)),
+                pages=1,
+                offers=offers,
+            )
+        )
+        cases.append(
+            Case(
+                f"parse_listings_dom[{label}]",
+                _quiet(lambda h=html: parse_listings_dom(h, BASE_URL)),
+                pages=1,
+                offers=dom_offers,
+            )
+        )
+        cases.append(
+            Case(
+                f"parse_listings_stream[{label}]",
+                _quiet(lambda h=html: parse_listings_stream(h, BASE_URL)),
+                pages=1,
+                offers=dom_offers,
+            )
+        )
+        articles = BeautifulSoup(html, "html.parser").find_all(
+            "article", attrs={"data-id": True}
+        )
+        cases.append(
+            Case(
+                f"parse_offer_element[{label}]",
+                _quiet(
+                    lambda items=articles: [
+                        parse_offer_element(it, BASE_URL) for it in items
+                    ]
+                ),
+                offers=len(articles),
+                ops=len(articles),
+            )
+        )
+        # page-level validation and serialization against the previous
+        # per-offer model round trip and json.dumps lines
+        cases.append(
+            Case(
+                f"validate_offers[{label}]",
+                lambda raws=parsed: validate_offers(raws),
+                offers=offers,
+                ops=offers,
+            )
+        )
+        cases.append(
+            Case(
+                f"carmodel_roundtrip[{label}]",
+                lambda raws=parsed: [
+                    CarModel.model_validate(o).model_dump() for o in raws
+                ],
+                offers=offers,
+                ops=offers,
+            )
+        )
+        cases.append(
+            Case(
+                f"jsonl_bytes[{label}]",
+                lambda raws=parsed: jsonl_bytes(raws),
+                offers=offers,
+                ops=offers,
+            )
+        )
+        cases.append(
+            Case(
+                f"json_dumps_lines[{label}]",
+                lambda raws=parsed: "".join(
+                    json.dumps(o, ensure_ascii=False) + "\n" for o in raws
+                ).encode("utf-8"),
+                offers=offers,
+                ops=offers,
+            )
+        )
+
+    cases.append(
+        Case(
+            "parse_float_from_text",
+            lambda: [parse_float_from_text(s) for s in PRICES],
+            ops=len(PRICES),
+        )
+    )
+    cases.append(
+        Case(
+            "parse_int_from_text",
+            lambda: [parse_int_from_text(s) for s in MILEAGES],
+            ops=len(MILEAGES),
+        )
+    )
+    cases.append(
+        Case(
+            "parse_floats_from_texts",
+            lambda: parse_floats_from_texts(PRICES),
+            ops=len(PRICES),
+        )
+    )
+    cases.append(
+        Case(
+            "parse_ints_from_texts",
+            lambda: parse_ints_from_texts(MILEAGES),
+            ops=len(MILEAGES),
+        )
+    )
+    cases.append(
+        Case(
+            "make_id_from_url_or_hash",
+            lambda: [make_id_from_url_or_hash(u, "BMW Seria 5") for u in URLS],
+            ops=len(URLS),
+        )
+    )
+    return cases
+
+
+def run_case(case: Case, min_time: float = 0.5) -> Result:
+    """Time `case` for at least `min_time` seconds, then trace its memory."""
+    case.func()  # warm up caches and lazy imports
+    calls = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time or calls < 3:
+        case.func()
+        calls += 1
+        elapsed = time.perf_counter() - started
+    per_call = elapsed / calls
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = case.func()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(
+        max(stat.count_diff, 0) for stat in after.compare_to(before, "filename")
+    )
+    del result
+
+    return Result(
+        name=case.name,
+        seconds_per_call=per_call,
+        calls=calls,
+        pages_per_s=case.pages / per_call if case.pages else None,
+        offers_per_s=case.offers / per_call if case.offers else None,
+        ops_per_s=case.ops / per_call,
+        alloc_peak_bytes=peak,
+        alloc_blocks=blocks,
+    )
+
+
+def compare(
+    results: List[Result], baseline: Dict[str, Dict], threshold: float
+) -> List[str]:
+    """Return a message for every case that regressed beyond `threshold`."""
+    regressions = []
+    for r in results:
+        base = baseline.get(r.name)
+        if not base:
+            continue
+        for key in ("seconds_per_call", "alloc_peak_bytes"):
+            old, new = base.get(key), getattr(r, key)
+            if old and new > old * (1 + threshold):
+                regressions.append(
+                    f"{r.name}: {key} {old:.6g} -> {new:.6g} "
+                    f"(+{(new / old - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def format_result(r: Result) -> str:
+    parts = [f"{r.name:<36} {r.seconds_per_call * 1000:9.3f} ms"]
+    if r.pages_per_s is not None:
+        parts.append(f"{r.pages_per_s:8.1f} pages/s")
+    if r.offers_per_s is not None:
+        parts.append(f"{r.offers_per_s:9.0f} offers/s")
+    else:
+        parts.append(f"{r.ops_per_s:9.0f} ops/s")
+    parts.append(f"alloc peak {r.alloc_peak_bytes / 1024:8.0f} KiB")
+    parts.append(f"blocks {r.alloc_blocks:6d}")
+    return "  ".join(parts)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--compare", type=Path, help="baseline JSON to compare with")
+    ap.add_argument("--save", type=Path, help="write results as a new baseline")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    ap.add_argument("--min-time", type=float, default=0.5)
+    ap.add_argument("-k", dest="filter", help="only run cases containing this text")
+    ap.add_argument("--metrics", action="store_true", help="keep stage metrics on")
+    args = ap.parse_args(argv)
+    if not args.metrics:
+        set_metrics(NullMetrics())
+
+    results = []
+    for case in build_cases():
+        if args.filter and args.filter not in case.name:
+            continue
+        result = run_case(case, args.min_time)
+        results.append(result)
+        print(format_result(result))
+    print(f"process peak RSS (all cases): {_peak_rss_kb()} KiB")
+
+    if args.save:
+        payload = {r.name: asdict(r) for r in results}
+        args.save.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSIONS (threshold {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regressions against {args.compare} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
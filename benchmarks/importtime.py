@@ -0,0 +1,113 @@
+"""Measure the cold-start import cost of a module with ``python -X importtime``.
+
+Usage::
+
+    python -m benchmarks.importtime                   # lambda_handler
+    python -m benchmarks.importtime src.scraper.main --top 20
+    python -m benchmarks.importtime --budget-ms 50    # exit 1 when slower
+
+Every run imports the module in a fresh interpreter with the environment
+of a Lambda container (``AWS_LAMBDA_FUNCTION_NAME`` set) unless
+``--local`` is given. The fastest of ``--repeat`` runs is reported, with
+the modules that took longest to import themselves.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+LAMBDA_ENV = {"AWS_LAMBDA_FUNCTION_NAME": "importtime-benchmark"}
+
+
+@dataclass
+class ImportProfile:
+    """Import times (microseconds) of `module` and everything it loaded."""
+
+    module: str
+    # module name -> (self, cumulative)
+    modules: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    @property
+    def total_ms(self) -> float:
+        return self.modules[self.module][1] / 1000
+
+    def top(self, n: int = 15) -> List[Tuple[str, int, int]]:
+        """Return the `n` modules with the largest self time."""
+        ranked = sorted(self.modules.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(name, own, cumulative) for name, (own, cumulative) in ranked[:n]]
+
+
+def parse_importtime(module: str, stderr: str) -> ImportProfile:
+    """Parse the ``import time: self | cumulative | name`` lines."""
+    profile = ImportProfile(module)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        if not own.strip().isdigit():
+            continue  # the header line
+        profile.modules[name.strip()] = (int(own), int(cumulative))
+    if module not in profile.modules:
+        raise RuntimeError(f"{module} was not imported:\n{stderr[-2000:]}")
+    return profile
+
+
+def measure(
+    module: str = "lambda_handler",
+    env: Optional[Dict[str, str]] = None,
+    repeat: int = 3,
+) -> ImportProfile:
+    """Import `module` in `repeat` fresh interpreters; return the fastest."""
+    run_env = dict(os.environ, **(env or {}))
+    # bytecode caches are warm after the first run; compile them up front
+    # so every measured run sees the same thing
+    subprocess.run(
+        [sys.executable, "-c", f"import {module}"], cwd=ROOT, env=run_env, check=True
+    )
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT,
+            env=run_env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        profile = parse_importtime(module, proc.stderr)
+        if best is None or profile.total_ms < best.total_ms:
+            best = profile
+    return best
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("module", nargs="?", default="lambda_handler")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, help="fail when the import is slower")
+    ap.add_argument("--local", action="store_true", help="do not simulate Lambda")
+    args = ap.parse_args(argv)
+
+    profile = measure(
+        args.module, env=None if args.local else LAMBDA_ENV, repeat=args.repeat
+    )
+    print(
+        f"import {args.module}: {profile.total_ms:.1f} ms ({len(profile.modules)} modules)"
+    )
+    print(f"  {'self ms':>8} {'cum ms':>8}  module")
+    for name, own, cumulative in profile.top(args.top):
+        print(f"  {own / 1000:8.1f} {cumulative / 1000:8.1f}  {name}")
+    if args.budget_ms is not None and profile.total_ms > args.budget_ms:
+        print(f"over budget: {profile.total_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Load-test the crawler against the local fixture server.
+
+Run with ``python -m benchmarks.loadtest --pages 50 --concurrency 4
+--latency 0.2 --jitter 0.1 --error-rate 0.05 --rate-limit 20``. A
+:class:`benchmarks.fixture_server.FixtureServer` is started on a free port,
+:func:`src.scraper.crawler.scrape_pages` crawls it with a fresh
+:class:`src.scraper.fetcher.Fetcher`, and throughput, retries, the
+statuses served and the crawler's stage metrics are reported. Nothing touches the real site.
+"""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from collections import Counter
+from typing import Dict
+
+from benchmarks.fixture_server import (
+    FixtureServer,
+    add_server_arguments,
+    server_from_args,
+)
+from src.scraper import crawler
+from src.scraper.fetcher import Fetcher, set_default_fetcher
+from src.scraper.metrics import Metrics, set_metrics
+from src.scraper.ratelimit import AdaptiveRateLimiter
+from src.scraper.retry import CircuitBreaker
+from src.scraper.storage import LocalJSONLStorage
+
+
+def run_loadtest(
+    server: FixtureServer,
+    max_pages: int,
+    concurrency: int = 1,
+    delay: float = 0.0,
+    rate_per_host: float = None,
+    tries: int = 3,
+    parse_workers: int = 0,
+    quiet: bool = True,
+) -> Dict[str, float]:
+    """Crawl a running `server` and return throughput and retry figures."""
+    fetcher = Fetcher(
+        tries=tries,
+        history=max(1000, max_pages * tries * 4),
+        breaker=CircuitBreaker(),
+        limiter=AdaptiveRateLimiter(),
+    )
+    previous = set_default_fetcher(fetcher)
+    metrics = Metrics()
+    previous_metrics = set_metrics(metrics)
+    out = io.StringIO() if quiet else None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = LocalJSONLStorage(folder=tmp)
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(out) if quiet else contextlib.nullcontext():
+                offers = crawler.scrape_pages(
+                    base_url=server.url,
+                    max_pages=max_pages,
+                    delay=delay,
+                    concurrency=concurrency,
+                    rate_per_host=rate_per_host,
+                    storage=storage,
+                    parse_workers=parse_workers,
+                )
+            wall = time.perf_counter() - started
+    finally:
+        set_default_fetcher(previous)
+        set_metrics(previous_metrics)
+        fetcher.close()
+
+    attempts = list(fetcher.stats)
+    statuses = Counter(s.status for s in attempts)
+    pages_ok = statuses.get(200, 0)
+    return {
+        "wall_time": wall,
+        "pages": pages_ok,
+        "pages_per_s": pages_ok / wall if wall else 0.0,
+        "offers": len(offers),
+        "requests": len(attempts),
+        "retries": sum(1 for s in attempts if s.attempt > 1),
+        "statuses": dict(sorted(statuses.items(), key=lambda kv: str(kv[0]))),
+        "metrics": metrics,
+    }
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_server_arguments(ap)
+    ap.add_argument("--max-pages", type=int, default=None, help="defaults to --pages")
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument(
+        "--delay", type=float, default=0.0, help="crawler delay between pages"
+    )
+    ap.add_argument("--rate-per-host", type=float, default=None)
+    ap.add_argument("--tries", type=int, default=3)
+    ap.add_argument("--parse-workers", type=int, default=0, help="parser processes")
+    ap.add_argument("--verbose", action="store_true", help="show crawler output")
+    args = ap.parse_args(argv)
+
+    with server_from_args(args) as server:
+        report = run_loadtest(
+            server,
+            max_pages=args.max_pages or args.pages,
+            concurrency=args.concurrency,
+            delay=args.delay,
+            rate_per_host=args.rate_per_host,
+            tries=args.tries,
+            parse_workers=args.parse_workers,
+            quiet=not args.verbose,
+        )
+        served = dict(server.status_counts)
+
+    print(
+        f"{report['pages']} pages, {report['offers']} offers in "
+        f"{report['wall_time']:.2f}s ({report['pages_per_s']:.1f} pages/s)"
+    )
+    print(
+        f"{report['requests']} requests, {report['retries']} retries, "
+        f"client statuses {report['statuses']}, server statuses {served}"
+    )
+    print(report["metrics"].summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare JSONL and Parquet storage on an existing offers file.
+
+Run with ``python -m benchmarks.storage_formats [path/to/offers.jsonl]``
+(defaults to ``data/all_offers.jsonl``). The offers are replicated
+`--copies` times to get a dataset large enough to time, written with
+both backends, then scanned in full and with a filter.
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from src.scraper.parquet_storage import ParquetStorage, read_offers
+from src.scraper.storage import LocalJSONLStorage, iter_jsonl
+
+ROOT = Path(__file__).resolve().parents[1]
+WHERE = "year >= 2015 AND price < 50000"
+
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument(
+        "path", nargs="?", type=Path, default=ROOT / "data" / "all_offers.jsonl"
+    )
+    ap.add_argument("--copies", type=int, default=50)
+    args = ap.parse_args(argv)
+
+    offers = list(iter_jsonl(args.path))
+    rows = [{**o, "id": f"{o['id']}-{i}"} for i in range(args.copies) for o in offers]
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = LocalJSONLStorage(folder=str(Path(tmp) / "jsonl"))
+        jsonl_path = Path(jsonl.save(rows))
+        with ParquetStorage(folder=str(Path(tmp) / "parquet")) as parquet:
+            parquet.save(rows)
+        parquet_root = Path(tmp) / "parquet"
+        parquet_size = sum(f.stat().st_size for f in parquet_root.rglob("*.parquet"))
+
+        def scan_jsonl(where=False):
+            with jsonl_path.open(encoding="utf-8") as f:
+                records = (json.loads(line) for line in f)
+                if where:
+                    return sum(
+                        1 for r in records if r["year"] >= 2015 and r["price"] < 50000
+                    )
+                return sum(1 for _ in records)
+
+        jsonl_full, n = _timed(scan_jsonl)
+        parquet_full, table = _timed(lambda: read_offers(parquet_root))
+        jsonl_where, n_where = _timed(lambda: scan_jsonl(where=True))
+        parquet_where, filtered = _timed(lambda: read_offers(parquet_root, WHERE))
+
+        print(f"{len(rows)} offers")
+        print(
+            f"  size   jsonl {jsonl_path.stat().st_size / 1e6:7.2f} MB  "
+            f"parquet {parquet_size / 1e6:7.2f} MB"
+        )
+        print(
+            f"  scan   jsonl {jsonl_full * 1000:7.1f} ms  "
+            f"parquet {parquet_full * 1000:7.1f} ms  ({n} / {table.num_rows} rows)"
+        )
+        print(
+            f"  where  jsonl {jsonl_where * 1000:7.1f} ms  "
+            f"parquet {parquet_where * 1000:7.1f} ms  "
+            f"({n_where} / {filtered.num_rows} rows, {WHERE})"
+        )
+
+
+if __name__ == "__main__":
+    main()
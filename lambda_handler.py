@@ -3,11 +3,92 @@ AWS Lambda Handler for Otomoto Scraper
 
 This module adapts the scraper to work with AWS Lambda.
 Lambda invokes this handler function when triggered.
+
+The event's "mode" selects what runs:
+- (none): a single crawl of OTOMOTO_URL, see `src.scraper.main`
+- "coordinator": split the search URLs into page-range shards, run each
+  one as a separate invocation of this function and merge the results
+- "shard": crawl one shard and return its offers to the coordinator
+- "schedule": crawl the search URLs that are due, busiest first, within
+  a page budget (see `src.scraper.scheduler`)
+
+Any mode can be profiled with the event keys "profile" ("cprofile" or
+"sampling"), "profile_memory" (tracemalloc), "profile_top" and, for the
+default crawl, "profile_page" (crawl only that page); see
+`src.scraper.profiling`. Profiles are written to /tmp/data/profiles and
+their hotspots printed to the log.
+
+Every invocation ends by logging its fetch/parse/store metrics in
+CloudWatch Embedded Metric Format (see `src.scraper.metrics`), with the
+function name and mode as dimensions.
+
+To keep cold starts short, importing this module loads only the
+configuration and metrics; each mode imports what it needs on first use.
+The crawl stack (requests, pydantic, the shared HTTP session) is set up
+once per container by `warm_up` and reused by warm invocations.
 """
 
+import functools
 import json
 import os
-from src.scraper.main import main as run_scraper
+from src.scraper.config import (
+    CRAWL_BUDGET_PAGES,
+    METRICS_NAMESPACE,
+    S3_BUCKET,
+    S3_PREFIX,
+    SEARCH_URLS,
+    STORAGE_BACKEND,
+)
+from src.scraper.metrics import get_metrics
+
+
+@functools.lru_cache(maxsize=None)
+def warm_up():
+    """Import the crawl stack and open the shared HTTP session, once.
+
+    Importing the parser compiles its regular expressions and builds the
+    offer validation schema; later calls return immediately.
+    """
+    from src.scraper import parser  # noqa: F401
+    from src.scraper.fetcher import get_default_fetcher
+
+    get_default_fetcher()
+
+
+def run_coordinator_event(event, context):
+    """Fan a crawl out to shard invocations of this function.
+
+    Event keys (all optional): search_urls (default: OTOMOTO_URLS or
+    OTOMOTO_URL), pages per search (5), pages_per_shard (5),
+    max_parallel (10) and options passed to every shard (e.g. delay).
+    """
+    from src.scraper.shards import lambda_invoker, plan_shards, run_coordinator
+    from src.scraper.storage import create_storage
+
+    shards = plan_shards(
+        event.get("search_urls") or SEARCH_URLS,
+        pages=int(event.get("pages", 5)),
+        pages_per_shard=int(event.get("pages_per_shard", 5)),
+    )
+    invoke = lambda_invoker(context.invoked_function_arn)
+    with create_storage(STORAGE_BACKEND, folder="data") as storage:
+        return run_coordinator(
+            shards,
+            invoke,
+            storage,
+            max_parallel=int(event.get("max_parallel", 10)),
+            options=event.get("options"),
+        )
+
+
+def emit_metrics(metrics, context, mode):
+    """Print the invocation's metrics as EMF documents, one per line."""
+    dimensions = {
+        "FunctionName": context.function_name,
+        "Mode": mode or "crawl",
+    }
+    for doc in metrics.emf(METRICS_NAMESPACE, dimensions):
+        print(json.dumps(doc))
 
 
 def handler(event, context):
@@ -40,16 +121,87 @@ def handler(event, context):
     print(f"Request ID: {context.aws_request_id}")
     print(f"Function: {context.function_name}")
     print(f"Memory limit: {context.memory_limit_in_mb} MB")
-    
+
+    # warm containers reuse the registry: count this invocation only
+    metrics = get_metrics()
+    metrics.reset()
+    mode = event.get("mode") if isinstance(event, dict) else None
+    options = event if isinstance(event, dict) else {}
+    profiler = None
     try:
+        page = int(options["profile_page"]) if options.get("profile_page") else None
+        if options.get("profile") or options.get("profile_memory"):
+            from src.scraper.profiling import make_profiler
+
+            profiler = make_profiler(
+                options.get("profile"),
+                memory=bool(options.get("profile_memory")),
+                page=page,
+                top=int(options.get("profile_top", 20)),
+            )
+            profiler.start()
+        if mode == "shard":
+            from src.scraper.shards import handle_shard_event
+
+            warm_up()
+            result = handle_shard_event(event)
+            print(f"Shard {result['shard_id']} collected {result['count']} offers")
+            return {'statusCode': 200, 'body': json.dumps(result, ensure_ascii=False)}
+        if mode == "schedule":
+            from src.scraper.scheduler import run_scheduled
+            from src.scraper.storage import create_storage
+
+            warm_up()
+            with create_storage(STORAGE_BACKEND, folder="data") as storage:
+                report = run_scheduled(
+                    event.get("search_urls") or SEARCH_URLS,
+                    storage,
+                    budget=int(event.get("budget", CRAWL_BUDGET_PAGES)),
+                )
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'searches': report, 'request_id': context.aws_request_id})
+            }
+        if mode == "coordinator":
+            stats = run_coordinator_event(event, context)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({**stats, 'request_id': context.aws_request_id})
+            }
+
         # Run the scraper
+        from src.scraper.main import run as run_scraper
+
+        warm_up()
         print("Starting scraper...")
-        run_scraper()
-        
+        run_scraper(page=page)
+
+        if STORAGE_BACKEND == "s3":
+            # offers went straight to S3; nothing to look for in /tmp
+            print(f"Scraper completed. Output in s3://{S3_BUCKET}/{S3_PREFIX}/")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Scraper completed successfully',
+                    'output': f"s3://{S3_BUCKET}/{S3_PREFIX}/",
+                    'request_id': context.aws_request_id
+                })
+            }
+
         # Check if output file was created
         output_file = "/tmp/data/all_offers.jsonl"
+        if not os.path.exists(output_file) and os.path.isdir("/tmp/data/all_offers"):
+            # compressed segments (SCRAPER_JSONL_COMPRESSION)
+            output_file = "/tmp/data/all_offers"
         if os.path.exists(output_file):
-            file_size = os.path.getsize(output_file)
+            if os.path.isdir(output_file):
+                file_size = sum(
+                    os.path.getsize(os.path.join(root, name))
+                    for root, _, names in os.walk(output_file)
+                    for name in names
+                )
+            else:
+                file_size = os.path.getsize(output_file)
             print(f"Scraper completed. Output file size: {file_size} bytes")
             
             return {
@@ -84,3 +236,13 @@ def handler(event, context):
                 'request_id': context.aws_request_id
             })
         }
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        emit_metrics(metrics, context, mode)
+
+
+# Provisioned concurrency and SnapStart run the init phase ahead of the
+# first request, so the crawl stack can be loaded there for free.
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") in ("provisioned-concurrency", "snap-start"):
+    warm_up()
@@ -0,0 +1,361 @@
+"""Vectorized analytics over stored offers.
+
+:class:`OfferFrame` holds offers as NumPy columns: numeric fields as
+float64 (missing values are NaN) and ``car_brand``, ``model``,
+``fuel_type``, ``location`` and ``price_currency`` dictionary-encoded as
+int32 codes into sorted category lists (-1 = missing).
+:meth:`OfferFrame.group_by` sorts the rows by group and value; the
+count, sum, mean, min, max and any percentile of every group are then
+read off that one sorted array, without a Python loop over groups or
+offers.
+
+Usage::
+
+    python -m src.scraper.analytics --by model year
+    python -m src.scraper.analytics --by car_brand --value price_per_km \\
+        --agg count median p90 --where "year >= 2015"
+
+Offers are read with :func:`src.scraper.storage.iter_offers`; an offer
+stored by several runs counts once, with its latest values, and the
+price and mileage changes logged by incremental crawls in
+``offer_changes.jsonl`` are applied to it.
+
+Requires the optional ``numpy`` package.
+"""
+
+import argparse
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover - depends on the environment
+    raise ImportError("Offer analytics need numpy: pip install numpy") from e
+
+from .storage import Filter, apply_change, iter_offers, parse_filter
+
+CATEGORICAL = ("car_brand", "model", "fuel_type", "location", "price_currency")
+NUMERIC = ("year", "price", "engine_capacity", "engine_power", "mileage_km")
+# columns computed from others on demand
+DERIVED = ("price_per_km",)
+AGGREGATES = ("count", "sum", "mean", "min", "max", "median")
+DEFAULT_AGGREGATES = ("count", "median", "p25", "p75")
+
+_PERCENTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?|100)$")
+_COMPARE = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+def _densify(keys: "np.ndarray", size: int):
+    """Renumber non-negative integer `keys` below `size` to 0..k-1.
+
+    Returns the distinct keys (sorted) and the renumbered array. Small key
+    spaces are counted in one pass instead of sorted.
+    """
+    if size <= 4 * len(keys) + 4096:
+        present = np.bincount(keys, minlength=size) > 0
+        return np.flatnonzero(present), (np.cumsum(present) - 1)[keys]
+    return np.unique(keys, return_inverse=True)
+
+
+def _check_aggregate(name: str) -> None:
+    if name not in AGGREGATES and not _PERCENTILE.match(name):
+        raise ValueError(
+            f"Unknown aggregate {name!r}; expected one of {AGGREGATES} or pNN"
+        )
+
+
+class OfferFrame:
+    """Columnar, read-only view of a set of offers."""
+
+    def __init__(
+        self,
+        numeric: Dict[str, "np.ndarray"],
+        codes: Dict[str, "np.ndarray"],
+        categories: Dict[str, List[str]],
+    ):
+        self.numeric = numeric
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "OfferFrame":
+        """Encode `records` (offer dicts) column by column."""
+        values: Dict[str, List[float]] = {f: [] for f in NUMERIC}
+        raw_codes: Dict[str, List[int]] = {f: [] for f in CATEGORICAL}
+        lookup: Dict[str, Dict[str, int]] = {f: {} for f in CATEGORICAL}
+        nan = float("nan")
+        for record in records:
+            for field in NUMERIC:
+                value = record.get(field)
+                values[field].append(nan if value is None else value)
+            for field in CATEGORICAL:
+                value = record.get(field)
+                if value is None:
+                    raw_codes[field].append(-1)
+                    continue
+                table = lookup[field]
+                code = table.get(value)
+                if code is None:
+                    code = table[value] = len(table)
+                raw_codes[field].append(code)
+
+        numeric = {f: np.array(values[f], dtype=np.float64) for f in NUMERIC}
+        codes, categories = {}, {}
+        for field in CATEGORICAL:
+            # renumber so that codes follow the sorted categories
+            labels = list(lookup[field])
+            order = sorted(range(len(labels)), key=labels.__getitem__)
+            rank = np.empty(len(labels) + 1, dtype=np.int32)
+            rank[order] = np.arange(len(labels), dtype=np.int32)
+            rank[-1] = -1  # code -1 indexes the last slot
+            codes[field] = rank[np.array(raw_codes[field], dtype=np.int32)]
+            categories[field] = [labels[i] for i in order]
+        return cls(numeric, codes, categories)
+
+    def __len__(self) -> int:
+        return len(self.numeric["price"])
+
+    def column(self, name: str) -> "np.ndarray":
+        """Return numeric or derived column `name` as float64."""
+        if name in self.numeric:
+            return self.numeric[name]
+        if name == "price_per_km":
+            mileage = self.numeric["mileage_km"]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(mileage > 0, self.numeric["price"] / mileage, np.nan)
+        raise KeyError(f"Unknown numeric column {name!r}")
+
+    def labels(self, name: str) -> List[Optional[str]]:
+        """Decode categorical column `name` back to strings."""
+        categories = self.categories[name]
+        return [categories[c] if c >= 0 else None for c in self.codes[name].tolist()]
+
+    def take(self, mask: "np.ndarray") -> "OfferFrame":
+        """Return the rows selected by a boolean mask or index array."""
+        return OfferFrame(
+            {f: a[mask] for f, a in self.numeric.items()},
+            {f: a[mask] for f, a in self.codes.items()},
+            self.categories,
+        )
+
+    def mask(self, where) -> "np.ndarray":
+        """Boolean mask of the rows matching `where`, a filter expression
+        (see :func:`src.scraper.storage.parse_filter`) or filter tuples.
+
+        Categorical fields support ``=`` and ``!=`` only.
+        """
+        filters: List[Filter] = parse_filter(where) if isinstance(where, str) else where
+        selected = np.ones(len(self), dtype=bool)
+        for field, op, value in filters:
+            if field in self.codes:
+                if op not in ("==", "!="):
+                    raise ValueError(f"{field} can only be compared with = or !=")
+                categories = self.categories[field]
+                i = np.searchsorted(categories, str(value)) if categories else 0
+                code = i if i < len(categories) and categories[i] == str(value) else -2
+                selected &= _COMPARE[op](self.codes[field], code)
+            else:
+                selected &= _COMPARE[op](self.column(field), value)
+        return selected
+
+    def where(self, where) -> "OfferFrame":
+        return self.take(self.mask(where))
+
+    def _group_codes(self, field: str):
+        """Return dense codes (0..n-1, -1 = missing) and labels of `field`."""
+        if field in self.codes:
+            return self.codes[field], self.categories[field]
+        values = self.column(field)
+        present = ~np.isnan(values)
+        values = values[present]
+        dense = np.full(len(present), -1, dtype=np.int64)
+        if field in ("year", "engine_power", "mileage_km") and len(values):
+            low = int(values.min())
+            uniques, dense[present] = _densify(
+                values.astype(np.int64) - low, int(values.max()) - low + 1
+            )
+            return dense, (uniques + low).tolist()
+        uniques, dense[present] = np.unique(values, return_inverse=True)
+        return dense, uniques.tolist()
+
+    def group_by(
+        self,
+        by: Sequence[str],
+        value: str = "price",
+        aggregates: Sequence[str] = DEFAULT_AGGREGATES,
+    ) -> List[Dict]:
+        """Aggregate column `value` per combination of the `by` fields.
+
+        `aggregates` are names from :data:`AGGREGATES` or percentiles
+        written ``pNN`` (``p90``, ``p99.9``; linearly interpolated like
+        :func:`numpy.percentile`). Rows with a missing group key or value
+        are left out; groups come out sorted by their keys. With no `by`
+        fields the whole frame is one group.
+        """
+        for name in aggregates:
+            _check_aggregate(name)
+        values = self.column(value)
+        keep = ~np.isnan(values)
+        keys, labels = [], []
+        for field in by:
+            codes, field_labels = self._group_codes(field)
+            keep &= codes >= 0
+            keys.append(codes)
+            labels.append(field_labels)
+        values = values[keep]
+        if not len(values):
+            return []
+
+        shape = tuple(max(len(l), 1) for l in labels)
+        if keys:
+            combined = np.ravel_multi_index([k[keep] for k in keys], shape)
+            group_keys, group = _densify(combined, int(np.prod(shape)))
+        else:
+            group_keys = np.zeros(1, dtype=np.int64)
+            group = np.zeros(len(values), dtype=np.int64)
+
+        # sort by value, then stably by group: every group's values end up
+        # contiguous and in order (radix sort when group ids fit 16 bits)
+        order = np.argsort(values)
+        by_value = group[order]
+        if len(group_keys) <= 1 << 16:
+            by_value = by_value.astype(np.uint16)
+        order = order[np.argsort(by_value, kind="stable")]
+        ordered = values[order]
+        counts = np.bincount(group)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        columns: Dict[str, "np.ndarray"] = {}
+        for name in aggregates:
+            if name == "count":
+                columns[name] = counts
+            elif name in ("sum", "mean"):
+                sums = np.add.reduceat(ordered, starts)
+                columns[name] = sums if name == "sum" else sums / counts
+            elif name == "min":
+                columns[name] = ordered[starts]
+            elif name == "max":
+                columns[name] = ordered[starts + counts - 1]
+            else:
+                q = 50.0 if name == "median" else float(name[1:])
+                position = starts + (counts - 1) * (q / 100.0)
+                low = np.floor(position).astype(np.int64)
+                high = np.minimum(low + 1, starts + counts - 1)
+                fraction = position - low
+                columns[name] = ordered[low] + (ordered[high] - ordered[low]) * fraction
+
+        # decode to Python values column by column, then zip into rows
+        indexes = np.unravel_index(group_keys, shape) if keys else ()
+        decoded = [
+            [field_labels[i] for i in index.tolist()]
+            for field_labels, index in zip(labels, indexes)
+        ]
+        names = list(by) + list(columns)
+        cells = decoded + [column.tolist() for column in columns.values()]
+        return [dict(zip(names, row)) for row in zip(*cells)]
+
+
+def load_offers(
+    folder: str = "data",
+    name: str = "all_offers",
+    latest: bool = True,
+    changes: Optional[str] = "offer_changes",
+) -> OfferFrame:
+    """Load dataset `name` from `folder` into an :class:`OfferFrame`.
+
+    With `latest` an offer stored more than once is kept once, with the
+    values of its last record, and then the change events of dataset
+    `changes` are applied to it in the order they were logged:
+    incremental crawls record a price or mileage change only there, not
+    as a new record. Without `latest` every stored record is kept as it
+    was written.
+    """
+    records: Iterable[Dict] = iter_offers(folder, name)
+    if latest:
+        by_id: Dict[str, Dict] = {}
+        for record in records:
+            by_id[record.get("id")] = record
+        if changes:
+            for event in iter_offers(folder, changes):
+                offer = by_id.get(event.get("id"))
+                if offer is not None and event.get("changes"):
+                    by_id[event["id"]] = apply_change(offer, event)
+        records = by_id.values()
+    return OfferFrame.from_records(records)
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.2f}" if abs(value) >= 1 else f"{value:.4f}"
+    return str(value)
+
+
+def format_table(rows: List[Dict]) -> str:
+    """Render result rows as a plain, right-aligned text table."""
+    if not rows:
+        return "(no rows)"
+    header = list(rows[0])
+    cells = [header] + [[_format(row[c]) for c in header] for row in rows]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(r, widths)) for r in cells
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Aggregate stored Otomoto offers.")
+    ap.add_argument("--folder", default="data")
+    ap.add_argument("--name", default="all_offers", help="dataset to read")
+    ap.add_argument(
+        "--by", nargs="*", default=["car_brand", "model"], help="fields to group by"
+    )
+    ap.add_argument("--value", default="price", help=f"one of {NUMERIC + DERIVED}")
+    ap.add_argument(
+        "--agg",
+        nargs="+",
+        default=list(DEFAULT_AGGREGATES),
+        help="count, sum, mean, min, max, median or pNN",
+    )
+    ap.add_argument("--where", help='e.g. "year >= 2015 AND fuel_type = Diesel"')
+    ap.add_argument("--min-count", type=int, default=1, help="drop smaller groups")
+    ap.add_argument("--sort", help="sort by this aggregate, descending")
+    ap.add_argument("--limit", type=int, help="print only the first N groups")
+    ap.add_argument(
+        "--all-records",
+        action="store_true",
+        help="count every stored record, not just the latest one per offer",
+    )
+    ap.add_argument("--json", action="store_true", help="print JSON lines")
+    args = ap.parse_args(argv)
+
+    frame = load_offers(args.folder, args.name, latest=not args.all_records)
+    if args.where:
+        frame = frame.where(args.where)
+    aggregates = list(args.agg)
+    if args.min_count > 1 and "count" not in aggregates:
+        aggregates.insert(0, "count")
+    rows = frame.group_by(args.by, args.value, aggregates)
+    rows = [r for r in rows if r.get("count", args.min_count) >= args.min_count]
+    if args.sort:
+        rows.sort(key=lambda r: r[args.sort], reverse=True)
+    if args.limit:
+        rows = rows[: args.limit]
+
+    if args.json:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+    else:
+        print(f"{len(frame)} offers, {len(rows)} groups")
+        print(format_table(rows))
+
+
+if __name__ == "__main__":
+    main()
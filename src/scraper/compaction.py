@@ -0,0 +1,310 @@
+"""Deduplicate and compact stored JSONL offers in bounded memory.
+
+The crawler only dedupes within one run, so repeated runs leave several
+rows per offer id in ``data/all_offers.jsonl``. :func:`compact` reduces
+any number of inputs (plain, ``.gz`` or ``.zst`` JSONL files, or segment
+directories written by :class:`src.scraper.segments.SegmentWriter`) to
+the latest record of every id, sorted by id::
+
+    python -m src.scraper.compaction data/all_offers.jsonl \\
+        -o data/all_offers.jsonl --changes data/collapsed_changes.jsonl
+
+It works in two passes over a spill directory:
+
+1. Every line is tagged with its position in the input and its id and
+   appended to one of `partitions` files chosen by a hash of the id, so
+   all versions of an offer land in the same, much smaller, partition.
+2. Each partition is read back in input order, keeping only the latest
+   line per id and the tracked values of the version before it; a change
+   event (the crawler's ``{"id", "seen_at", "changes"}`` format) is
+   emitted whenever a tracked field changed between two versions. The
+   partition's survivors are sorted by id into a run file.
+
+A partition still larger than `partition_bytes` is split
+`SPLIT_FANOUT` ways with a hash independent of the one that built it, so
+memory stays bounded however large the input is (only many versions of
+one single id defeat this).
+
+Finally the sorted runs are merged (:func:`heapq.merge`) into the output,
+which is written to a temporary file and moved into place, so an input
+may be compacted onto itself. Later inputs win over earlier ones.
+
+Stored JSONL offers carry no timestamp, so ``seen_at`` of the collapsed
+events is the record's ``scraped_at`` when it has one (e.g. rows exported
+from Parquet) and null otherwise.
+"""
+
+import argparse
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pydantic_core import from_json
+
+from .segments import _open_segment, iter_manifest_segments
+from .storage import TRACKED_FIELDS
+
+DEFAULT_MEMORY_MB = 256
+MAX_PARTITIONS = 256
+MAX_DEPTH = 4
+# oversized partitions are split this many ways
+SPLIT_FANOUT = 16
+# compressed inputs expand roughly this much when spilled as plain JSONL
+COMPRESSION_RATIO = 6
+
+PathLike = Union[str, Path]
+
+
+def _input_files(path: Path) -> List[Path]:
+    if path.is_dir():
+        return [p for p, _ in iter_manifest_segments(path)]
+    return [path]
+
+
+def _iter_lines(paths: Sequence[Path]) -> Iterator[bytes]:
+    for path in paths:
+        for file in _input_files(path):
+            with _open_segment(file) as stream:
+                for line in stream:
+                    line = line.strip()
+                    if line:
+                        yield line
+
+
+def _estimate_bytes(paths: Sequence[Path]) -> int:
+    total = 0
+    for path in paths:
+        for file in _input_files(path):
+            size = file.stat().st_size
+            compressed = file.name.endswith((".gz", ".zst"))
+            total += size * COMPRESSION_RATIO if compressed else size
+    return total
+
+
+def _partition_of(key: bytes, partitions: int, depth: int) -> int:
+    # a keyed hash per split level: keys that shared a partition at one
+    # level are spread independently at the next
+    digest = hashlib.blake2b(
+        key, digest_size=8, salt=depth.to_bytes(16, "little")
+    ).digest()
+    return int.from_bytes(digest, "little") % partitions
+
+
+def _open_output(path: Path, compress: bool):
+    if compress:
+        return gzip.open(path, "wb", compresslevel=6)
+    return path.open("wb")
+
+
+class _Compactor:
+    def __init__(self, workdir: Path, partitions: int, partition_bytes: int):
+        self.workdir = workdir
+        self.partitions = partitions
+        self.partition_bytes = partition_bytes
+        self.runs: List[Path] = []
+        self.change_runs: List[Path] = []
+        self.stats = {
+            "records": 0,
+            "offers": 0,
+            "changes": 0,
+            "skipped": 0,
+            "partitions": 0,
+            "largest_partition": 0,
+        }
+        self._names = 0
+
+    def _new_path(self, kind: str) -> Path:
+        self._names += 1
+        return self.workdir / f"{kind}-{self._names:05d}"
+
+    def spill(self, lines: Iterator[bytes]) -> None:
+        """Pass 1: tag every line with its position, hash it to a partition."""
+        paths = [self._new_path("part") for _ in range(self.partitions)]
+        with ExitStack() as stack:
+            files = [stack.enter_context(p.open("wb")) for p in paths]
+            for seq, line in enumerate(lines):
+                self.stats["records"] += 1
+                try:
+                    offer_id = from_json(line).get("id")
+                except (ValueError, AttributeError):
+                    offer_id = None
+                if offer_id is None or offer_id == "":
+                    self.stats["skipped"] += 1
+                    continue
+                key = json.dumps(str(offer_id)).encode("utf-8")
+                files[_partition_of(key, self.partitions, 0)].write(
+                    b"%d\t%s\t%s\n" % (seq, key, line)
+                )
+        for path in paths:
+            self.reduce(path, depth=0)
+
+    def split(self, path: Path, depth: int) -> None:
+        """Re-partition an oversized partition with another hash salt."""
+        paths = [self._new_path("part") for _ in range(SPLIT_FANOUT)]
+        with ExitStack() as stack, path.open("rb") as f:
+            files = [stack.enter_context(p.open("wb")) for p in paths]
+            for tagged in f:
+                key = tagged.split(b"\t", 2)[1]
+                files[_partition_of(key, SPLIT_FANOUT, depth)].write(tagged)
+        path.unlink()
+        for sub in paths:
+            self.reduce(sub, depth)
+
+    def reduce(self, path: Path, depth: int) -> None:
+        """Pass 2: keep the latest line per id of one partition."""
+        size = path.stat().st_size
+        if size == 0:
+            path.unlink()
+            return
+        if size > self.partition_bytes and depth < MAX_DEPTH:
+            self.split(path, depth + 1)
+            return
+        self.stats["partitions"] += 1
+        self.stats["largest_partition"] = max(self.stats["largest_partition"], size)
+        latest: Dict[str, bytes] = {}
+        tracked: Dict[str, Tuple] = {}
+        events: List[Tuple[str, int, Dict]] = []
+        with path.open("rb") as f:
+            # lines are in input order within a partition
+            for tagged in f:
+                seq, _, line = tagged.rstrip(b"\n").split(b"\t", 2)
+                record = from_json(line)
+                offer_id = str(record["id"])
+                values = tuple(record.get(field) for field in TRACKED_FIELDS)
+                previous = tracked.get(offer_id)
+                if previous is not None and previous != values:
+                    changes = {
+                        field: (old, new)
+                        for field, old, new in zip(TRACKED_FIELDS, previous, values)
+                        if old != new
+                    }
+                    event = {
+                        "id": offer_id,
+                        "seen_at": record.get("scraped_at"),
+                        "changes": changes,
+                    }
+                    events.append((offer_id, int(seq), event))
+                tracked[offer_id] = values
+                latest[offer_id] = line
+        path.unlink()
+
+        run = self._new_path("run")
+        with run.open("wb") as f:
+            for offer_id in sorted(latest):
+                f.write(
+                    json.dumps(offer_id).encode("utf-8")
+                    + b"\t"
+                    + latest[offer_id]
+                    + b"\n"
+                )
+        self.runs.append(run)
+        self.stats["offers"] += len(latest)
+        if events:
+            events.sort(key=lambda e: (e[0], e[1]))
+            changes_run = self._new_path("changes")
+            with changes_run.open("wb") as f:
+                for offer_id, _, event in events:
+                    line = json.dumps(event, ensure_ascii=False).encode("utf-8")
+                    f.write(json.dumps(offer_id).encode("utf-8") + b"\t" + line + b"\n")
+            self.change_runs.append(changes_run)
+            self.stats["changes"] += len(events)
+
+
+def _iter_run(path: Path) -> Iterator[Tuple[str, bytes]]:
+    with path.open("rb") as f:
+        for tagged in f:
+            key, line = tagged.split(b"\t", 1)
+            yield json.loads(key), line
+
+
+def _merge_runs(runs: Sequence[Path], output: Path) -> None:
+    """Merge sorted run files into `output`, via a temporary file."""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + ".tmp")
+    iterators = [_iter_run(run) for run in runs]
+    with _open_output(tmp, output.name.endswith(".gz")) as f:
+        for _, line in heapq.merge(*iterators, key=lambda item: item[0]):
+            f.write(line)
+    os.replace(tmp, output)
+
+
+def compact(
+    inputs: Sequence[PathLike],
+    output: PathLike,
+    changes_output: Optional[PathLike] = None,
+    memory_mb: float = DEFAULT_MEMORY_MB,
+    partitions: Optional[int] = None,
+    partition_bytes: Optional[int] = None,
+    tmp_dir: Optional[PathLike] = None,
+) -> Dict[str, int]:
+    """Write the latest record per offer id in `inputs` to `output`.
+
+    `output` (and `changes_output`, which receives the collapsed change
+    events) is gzip-compressed when its name ends in ``.gz``. Partitions
+    are sized so one fits in about `memory_mb`; `partitions` and
+    `partition_bytes` override that. Spill files go to a temporary
+    directory next to `output` unless `tmp_dir` is given.
+
+    Returns counts of input records, output offers, change events,
+    skipped lines (broken or without an id) and reduced partitions, and
+    the size in bytes of the largest partition reduced in memory.
+    """
+    paths = [Path(p) for p in inputs]
+    output = Path(output)
+    if partition_bytes is None:
+        # parsed records take several times their JSON size in memory
+        partition_bytes = max(int(memory_mb * 1024 * 1024) // 4, 1024 * 1024)
+    if partitions is None:
+        # position and id tags add about a fifth to every line
+        estimate = _estimate_bytes(paths) * 6 // 5
+        partitions = min(max(-(-estimate // partition_bytes), 1), MAX_PARTITIONS)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(
+        prefix="compact-", dir=tmp_dir or output.parent
+    ) as workdir:
+        compactor = _Compactor(Path(workdir), partitions, partition_bytes)
+        compactor.spill(_iter_lines(paths))
+        _merge_runs(compactor.runs, output)
+        if changes_output is not None:
+            _merge_runs(compactor.change_runs, Path(changes_output))
+    stats = compactor.stats
+    print(
+        f"[compact] {stats['records']} records -> {stats['offers']} offers "
+        f"({stats['changes']} change events, {stats['skipped']} skipped, "
+        f"{stats['partitions']} partitions) in {output}"
+    )
+    return stats
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Deduplicate stored offers by id.")
+    ap.add_argument(
+        "inputs", nargs="+", type=Path, help="JSONL files or segment directories"
+    )
+    ap.add_argument("-o", "--output", type=Path, required=True)
+    ap.add_argument(
+        "--changes", type=Path, help="write the collapsed change events here"
+    )
+    ap.add_argument("--memory-mb", type=float, default=DEFAULT_MEMORY_MB)
+    ap.add_argument(
+        "--tmp-dir", type=Path, help="spill directory (default: next to output)"
+    )
+    args = ap.parse_args(argv)
+    compact(
+        args.inputs,
+        args.output,
+        changes_output=args.changes,
+        memory_mb=args.memory_mb,
+        tmp_dir=args.tmp_dir,
+    )
+
+
+if __name__ == "__main__":
+    main()
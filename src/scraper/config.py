@@ -1,13 +1,71 @@
 """Configuration values for the scraper.
 
-This module reads environment variables (via python-dotenv) and exposes
-configuration constants used across the package.
+This module reads environment variables and exposes configuration
+constants used across the package. Outside AWS Lambda a local ``.env``
+file is loaded first (via python-dotenv); a Lambda function gets its
+settings from its environment and skips the import.
 """
 
 import os
 
-from dotenv import load_dotenv
+if not os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    from dotenv import load_dotenv
 
-load_dotenv()
+    load_dotenv()
 
 BASE_URL = os.getenv("OTOMOTO_URL", "https://www.otomoto.pl/osobowe/bmw/seria-5")
+
+# Search URLs covered by a sharded crawl, comma separated (default: BASE_URL)
+SEARCH_URLS = [
+    u.strip() for u in os.getenv("OTOMOTO_URLS", "").split(",") if u.strip()
+] or [BASE_URL]
+
+# Page requests one scheduled crawl (src.scraper.scheduler) may spend
+CRAWL_BUDGET_PAGES = int(os.getenv("SCRAPER_CRAWL_BUDGET", "20"))
+
+# Number of listing pages fetched in parallel (1 = sequential crawl)
+CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "1"))
+
+# Keep-alive connections kept open per host by the shared HTTP session
+HTTP_POOL_SIZE = int(os.getenv("SCRAPER_HTTP_POOL_SIZE", "10"))
+
+# Worker processes parsing pages while the next ones are fetched: a number,
+# "auto" for one per available core, or 0 to parse in the crawler process
+PARSE_WORKERS = os.getenv("SCRAPER_PARSE_WORKERS", "0")
+
+# On-disk HTTP cache for listing pages (disabled when empty). With
+# SCRAPER_OFFLINE=1 pages are replayed from the cache without network access.
+HTTP_CACHE_DIR = os.getenv("SCRAPER_HTTP_CACHE", "")
+HTTP_CACHE_TTL = float(os.getenv("SCRAPER_HTTP_CACHE_TTL", str(24 * 3600)))
+HTTP_CACHE_MAX_MB = int(os.getenv("SCRAPER_HTTP_CACHE_MAX_MB", "200"))
+HTTP_OFFLINE = os.getenv("SCRAPER_OFFLINE", "") == "1"
+
+# DOM parser used when a page has no __NEXT_DATA__ block: "soup" or "stream"
+PARSER_BACKEND = os.getenv("SCRAPER_PARSER_BACKEND", "soup")
+
+# Storage backend for scraped offers: "jsonl", "parquet", "sqlite" or "s3"
+STORAGE_BACKEND = os.getenv("SCRAPER_STORAGE", "jsonl")
+
+# S3 backend: offers are streamed to s3://S3_BUCKET/SCRAPER_S3_PREFIX/ as
+# multipart uploads of SCRAPER_S3_PART_MB compressed parts (min. 5)
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("SCRAPER_S3_PREFIX", "otomoto")
+S3_COMPRESSION = os.getenv("SCRAPER_S3_COMPRESSION", "gzip")
+S3_PART_MB = float(os.getenv("SCRAPER_S3_PART_MB", "8"))
+
+# JSONL backend: "gzip" or "zstd" streams offers into compressed segments
+# that rotate after SCRAPER_SEGMENT_MB of JSONL or SCRAPER_SEGMENT_SECONDS
+# (0 = no limit). With neither set, offers go to one plain all_offers.jsonl.
+JSONL_COMPRESSION = os.getenv("SCRAPER_JSONL_COMPRESSION", "")
+SEGMENT_MB = float(os.getenv("SCRAPER_SEGMENT_MB", "0"))
+SEGMENT_SECONDS = float(os.getenv("SCRAPER_SEGMENT_SECONDS", "0"))
+
+# Flag offers that look like relists of earlier offers under a new id
+# (src.scraper.relists); matches go to relists.jsonl next to the offers.
+DETECT_RELISTS = os.getenv("SCRAPER_DETECT_RELISTS", "0") == "1"
+
+# Per-stage counters and timers (src.scraper.metrics); 0 turns them off.
+# Lambda invocations log them in CloudWatch Embedded Metric Format under
+# SCRAPER_METRICS_NAMESPACE.
+METRICS_ENABLED = os.getenv("SCRAPER_METRICS", "1") != "0"
+METRICS_NAMESPACE = os.getenv("SCRAPER_METRICS_NAMESPACE", "OtomotoScraper")
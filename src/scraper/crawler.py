@@ -1,16 +1,103 @@
-"""A small, sequential web crawler used by the development tooling.
+"""A small web crawler used by the development tooling.
 
-The implementation is intentionally simple and synchronous — it fetches
-pages one by one, parses offers and appends new ones to a local JSONL file.
+By default pages are fetched one by one; with ``concurrency > 1`` a small
+thread pool keeps several page requests in flight under a per-host rate
+limit. Either way offers are parsed, deduplicated and appended to a local
+JSONL file in page order.
+
+With ``parse_workers > 0`` pages are parsed in worker processes while
+the next pages are being fetched (see :mod:`src.scraper.pipeline`).
+
+In incremental mode the storage's persistent offer index is consulted so
+offers stored by earlier runs are skipped and only their price or
+mileage changes are recorded. New offers can also be checked for relists
+of earlier offers under a new id (see :mod:`src.scraper.relists`).
 """
 
 import time
-from typing import Dict, List, Set
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from .config import BASE_URL
 from .fetcher import fetch_page
-from .parser import parse_listings
-from .storage import LocalJSONLStorage
+from .metrics import get_metrics
+from .pipeline import iter_parsed_pages
+from .ratelimit import HostRateLimiter
+from .storage import CHANGED, NEW, LocalJSONLStorage, OfferStorage, utc_now
+
+# (page number, url, html or None, fetch error or None)
+PageResult = Tuple[int, str, Optional[str], Optional[Exception]]
+
+
+def page_url(base_url: str, page: int) -> str:
+    """Return the listing URL for `page` (page 1 is `base_url` itself)."""
+    if page == 1:
+        return base_url
+    sep = "&" if "?" in base_url else "?"
+    return f"{base_url}{sep}page={page}"
+
+
+def _iter_pages_sequential(
+    base_url: str, pages: Iterable[int], delay: float
+) -> Iterator[PageResult]:
+    """Fetch pages one at a time, sleeping `delay` seconds between them."""
+    first = True
+    for page in pages:
+        if not first:
+            time.sleep(delay)
+        first = False
+        url = page_url(base_url, page)
+        print(f"[scrape] Fetching page {page}: {url}")
+        try:
+            yield page, url, fetch_page(url, timeout=15), None
+        except RuntimeError as e:
+            yield page, url, None, e
+
+
+def _iter_pages_concurrent(
+    base_url: str,
+    pages: Iterable[int],
+    concurrency: int,
+    limiter: HostRateLimiter,
+) -> Iterator[PageResult]:
+    """Fetch pages with up to `concurrency` requests in flight.
+
+    Results are yielded in page order. Closing the generator (e.g. when the
+    caller stops on an empty page) cancels pages that have not started yet.
+    """
+
+    def fetch(page: int, url: str) -> str:
+        limiter.acquire(url)
+        print(f"[scrape] Fetching page {page}: {url}")
+        return fetch_page(url, timeout=15)
+
+    pages = iter(pages)
+    pending: deque = deque()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def submit(page: int) -> None:
+        url = page_url(base_url, page)
+        pending.append((page, url, executor.submit(fetch, page, url)))
+
+    try:
+        for page in islice(pages, concurrency):
+            submit(page)
+        while pending:
+            page, url, future = pending.popleft()
+            try:
+                html, error = future.result(), None
+            except RuntimeError as e:
+                html, error = None, e
+            next_page = next(pages, None)
+            if next_page is not None:
+                submit(next_page)
+            yield page, url, html, error
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def scrape_pages(
@@ -18,61 +105,160 @@ def scrape_pages(
     max_pages: int = 50,
     delay: float = 1.0,
     stop_on_empty: bool = True,
+    concurrency: int = 1,
+    rate_per_host: Optional[float] = None,
+    incremental: bool = False,
+    stop_after_unchanged: Optional[int] = None,
+    storage: Optional[OfferStorage] = None,
+    parse_workers: int = 0,
+    start_page: int = 1,
+    on_page: Optional[Callable[[int, int, int], None]] = None,
+    detect_relists: bool = False,
 ) -> List[Dict]:
     """
-    Simple sequential crawler:
+    Simple crawler:
       - page 1: base_url
       - page N: base_url + "?page=N"
     Returns a list of new, unique offers from a single run.
+
+    Pages `start_page` to `max_pages` (inclusive) are crawled, so a crawl
+    can be split into page ranges (see :mod:`src.scraper.shards`).
+
+    With ``concurrency > 1`` up to that many pages are fetched at once.
+    Requests to one host are limited to `rate_per_host` per second, which
+    defaults to ``1 / delay`` so the request rate never exceeds the one of
+    the sequential crawler.
+
+    With `incremental` offers already in the storage's offer index are not
+    saved again; offers whose price or mileage changed are returned too and
+    their changes are appended to the storage's change log. The crawl stops
+    after `stop_after_unchanged` consecutive pages without new or changed
+    offers.
+
+    With ``parse_workers > 0`` pages are parsed by that many processes,
+    overlapping with fetching; offers are still deduplicated and written
+    in page order by this function.
+
+    `on_page`, if given, is called after every processed page with the
+    page number and the counts of new and changed offers on it.
+
+    With `detect_relists` every new offer is checked against the storage's
+    relist index (see :mod:`src.scraper.relists`); likely relists and
+    duplicates under another id are still saved, and flagged in the
+    storage's relist log.
+
+    Offers are written to `storage`, a local JSONL file under ``data/`` by
+    default. The caller owns `storage` and is responsible for closing it.
     """
-    page = 1
     seen_ids: Set[str] = set()
     collected: List[Dict] = []
-    storage = LocalJSONLStorage(folder="data")
+    if storage is None:
+        storage = LocalJSONLStorage(folder="data")
+    index = storage.index if incremental else None
+    relist_index = storage.relist_index if detect_relists else None
+    metrics = get_metrics()
+    unchanged_pages = 0
 
-    while page <= max_pages:
-        if page == 1:
-            url = base_url
-        else:
-            sep = "&" if "?" in base_url else "?"
-            url = f"{base_url}{sep}page={page}"
+    pages = range(start_page, max_pages + 1)
+    if concurrency > 1:
+        if rate_per_host is None and delay > 0:
+            rate_per_host = 1.0 / delay
+        limiter = HostRateLimiter(rate_per_host)
+        fetched = _iter_pages_concurrent(base_url, pages, concurrency, limiter)
+    else:
+        fetched = _iter_pages_sequential(base_url, pages, delay)
+    results = iter_parsed_pages(fetched, base_url, parse_workers)
 
-        print(f"[scrape] Fetching page {page}: {url}")
-        try:
-            html = fetch_page(url, timeout=15)
-        except RuntimeError as e:
-            print(f"[scrape] Fetch error on page {page}: {e}")
-            break
-
-        offers = parse_listings(html, base_url)
-        print(f"[scrape] Found {len(offers)} offers on page {page}")
-
-        # dedupe in this run and collect new offers
-        new_offers = []
-        for off in offers:
-            off_id = str(off.get("id") or off.get("url") or "")
-            if not off_id:
-                # fallback: skip if no id/url
-                continue
-            if off_id in seen_ids:
-                continue
-            seen_ids.add(off_id)
-            new_offers.append(off)
-
-        if new_offers:
-            storage.save(new_offers, filename="all_offers.jsonl")
-            collected.extend(new_offers)
-            print(
-                f"[scrape] Saved {len(new_offers)} new offers (total collected: {len(collected)})"
-            )
-        else:
-            print("[scrape] No new offers on this page.")
-
-        if stop_on_empty and len(offers) == 0:
-            print(f"[scrape] No offers on page {page} — stopping.")
-            break
-
-        page += 1
-        time.sleep(delay)
+    try:
+        for page, _, offers, error in results:
+            if error is not None:
+                print(f"[scrape] Fetch error on page {page}: {error}")
+                break
+
+            print(f"[scrape] Found {len(offers)} offers on page {page}")
+
+            # dedupe in this run and collect new offers
+            new_offers = []
+            known_offers = []
+            changed_offers = []
+            change_events = []
+            seen_at = utc_now()
+            for off in offers:
+                off_id = str(off.get("id") or off.get("url") or "")
+                if not off_id:
+                    # fallback: skip if no id/url
+                    continue
+                if off_id in seen_ids:
+                    continue
+                seen_ids.add(off_id)
+                if index is None:
+                    new_offers.append(off)
+                    continue
+                status, changes = index.classify(off)
+                index.record(off, seen_at)
+                if status == NEW:
+                    new_offers.append(off)
+                    continue
+                known_offers.append(off)
+                if status == CHANGED:
+                    changed_offers.append(off)
+                    change_events.append(
+                        {"id": off_id, "seen_at": seen_at, "changes": changes}
+                    )
+
+            relist_events = []
+            if relist_index is not None:
+                for off in new_offers:
+                    event = relist_index.observe(off, seen_at)
+                    if event is not None:
+                        relist_events.append(event)
+                # keep offers that are still listed from ageing out
+                for off in known_offers:
+                    relist_index.add(off, seen_at)
+
+            if new_offers:
+                with metrics.timer("store.write_seconds"):
+                    storage.save(new_offers, filename="all_offers.jsonl")
+                metrics.incr("store.offers", len(new_offers))
+                collected.extend(new_offers)
+                print(
+                    f"[scrape] Saved {len(new_offers)} new offers (total collected: {len(collected)})"
+                )
+            if change_events:
+                with metrics.timer("store.write_seconds"):
+                    storage.save_changes(change_events)
+                    storage.save_updated(changed_offers)
+                metrics.incr("store.changes", len(change_events))
+                collected.extend(changed_offers)
+                print(f"[scrape] Recorded {len(change_events)} changed offers")
+            if relist_events:
+                with metrics.timer("store.write_seconds"):
+                    storage.save_relists(relist_events)
+                metrics.incr("store.relists", len(relist_events))
+                print(f"[scrape] Flagged {len(relist_events)} likely relisted offers")
+            if not new_offers and not change_events:
+                print("[scrape] No new offers on this page.")
+            if on_page is not None:
+                on_page(page, len(new_offers), len(change_events))
+
+            if stop_on_empty and len(offers) == 0:
+                print(f"[scrape] No offers on page {page} — stopping.")
+                break
+
+            if new_offers or change_events:
+                unchanged_pages = 0
+            else:
+                unchanged_pages += 1
+            if stop_after_unchanged and unchanged_pages >= stop_after_unchanged:
+                print(
+                    f"[scrape] {unchanged_pages} pages without new or changed offers — stopping."
+                )
+                break
+    finally:
+        results.close()
+        fetched.close()
+        if index is not None or relist_index is not None:
+            with metrics.timer("store.flush_seconds"):
+                storage.flush()
 
     return collected
@@ -1,14 +1,45 @@
 """HTTP fetching helpers used by the scraper.
 
-This module provides a small retrying `fetch_page` helper which returns
-the HTML body or raises on repeated failures.
+This module provides a session-based :class:`Fetcher` which keeps
+connections to the site alive between requests and records per-fetch
+transport timings, plus the small retrying `fetch_page` helper which
+returns the HTML body or raises on repeated failures.
+
+A Fetcher can be given an :class:`~src.scraper.http_cache.HTTPCache`: it
+then revalidates cached pages with conditional requests and, in offline
+mode, replays them without touching the network.
+
+Retries back off exponentially with jitter and honor ``Retry-After``; the
+shared fetcher also adapts its request rate to throttling and pauses
+behind a circuit breaker when the site keeps failing (see
+:mod:`src.scraper.retry`).
 """
 
+import socket
+import threading
 import time
-from typing import Optional
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
 
 import requests
 from requests import RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from .config import (
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_MAX_MB,
+    HTTP_CACHE_TTL,
+    HTTP_OFFLINE,
+    HTTP_POOL_SIZE,
+)
+from .http_cache import HTTPCache
+from .metrics import BYTES, SECONDS, get_metrics
+from .ratelimit import AdaptiveRateLimiter
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy, parse_retry_after
 
 HEADERS = {
     "User-Agent": (
@@ -22,34 +53,381 @@ HEADERS = {
 }
 
 
-def fetch_page(url: str, timeout: int = 10, save_snapshot: Optional[str] = None) -> str:
-    """Fetch a URL with a small retry loop and return the response text.
+@dataclass
+class FetchStats:
+    """Transport timings (seconds) and sizes for a single HTTP attempt.
 
-    On repeated failures a RuntimeError is raised.
+    `dns`, `connect` and `tls` stay at zero when the request reused a
+    pooled keep-alive connection.
     """
-    tries = 3
-    for attempt in range(1, tries + 1):
+
+    url: str
+    attempt: int = 1
+    status: Optional[int] = None
+    new_connection: bool = False
+    dns: float = 0.0
+    connect: float = 0.0
+    tls: float = 0.0
+    ttfb: float = 0.0
+    body: float = 0.0
+    total: float = 0.0
+    wire_bytes: int = 0
+    content_bytes: int = 0
+
+
+# Stats object of the request currently running on this thread; the
+# connection classes below fill in DNS/connect/TLS timings when they open
+# a new socket.
+_current = threading.local()
+
+
+class _TimedConnectionMixin:
+    """Record DNS, TCP connect and TLS handshake times of new connections.
+
+    The host is resolved once, for the DNS timing, and its addresses are
+    then tried in order until one connects, as
+    :func:`socket.create_connection` would do.
+    """
+
+    def _new_conn(self):
+        stats = getattr(_current, "stats", None)
+        if stats is None:
+            return super()._new_conn()
+        host = self._dns_host
+        started = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            # let urllib3 resolve again and raise its usual error
+            infos = []
+        resolved = time.perf_counter()
+        addresses = list(dict.fromkeys(info[4][0] for info in infos)) or [host]
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=timeout)
-            # print status for debug
-            print(f"[fetch] {url} -> {resp.status_code}")
-            resp.raise_for_status()
-            text = resp.text
-            if save_snapshot:
-                with open(save_snapshot, "w", encoding="utf-8") as f:
-                    f.write(text)
-            return text
-        except requests.HTTPError as e:
-            # HTTP errors from raise_for_status
-            print(f"[fetch] HTTP error {e} (attempt {attempt}/{tries})")
-            status = getattr(resp, "status_code", None)
-            if status in (403, 429):
-                # 403 or rate-limit -> don't hammer, wait longer
-                time.sleep(5 * attempt)
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (ConnectTimeoutError, NewConnectionError):
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+        stats.new_connection = True
+        stats.dns = resolved - started
+        stats.connect = time.perf_counter() - resolved
+        return sock
+
+    def connect(self):
+        stats = getattr(_current, "stats", None)
+        started = time.perf_counter()
+        super().connect()
+        if stats is not None and isinstance(self, HTTPSConnection):
+            elapsed = time.perf_counter() - started
+            stats.tls = max(0.0, elapsed - stats.dns - stats.connect)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report transport timings."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class Fetcher:
+    """Retrying page fetcher backed by a pooled, keep-alive session.
+
+    `pool_size` is the number of connections kept open per host and should
+    be at least the crawl concurrency. The last `history` attempts are kept
+    in :attr:`stats`; :meth:`summary` aggregates them.
+
+    With a `cache`, pages are stored with their validators and refetched
+    with ``If-None-Match`` / ``If-Modified-Since``; a 304 answer is served
+    from the cache. With `offline` pages come only from the cache.
+
+    Failed attempts are retried as decided by `retry` (a
+    :class:`~src.scraper.retry.RetryPolicy` with `tries` attempts by
+    default). An optional `limiter` adapts the per-host request rate to
+    429 answers, and an optional `breaker` pauses all requests after a run
+    of failures; a fetch that runs out of tries while the breaker is open
+    waits for it and starts over, at most `max_pauses` times. One fetch
+    spends at most `max_wait` seconds in total sleeping on backoff and on
+    the breaker; once that budget is used up it fails instead of waiting,
+    so a site that keeps failing cannot stall a crawl (or a Lambda) for
+    the breaker's growing cool-downs.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        tries: int = 3,
+        headers: Optional[Dict[str, str]] = None,
+        history: int = 1000,
+        cache: Optional[HTTPCache] = None,
+        offline: bool = False,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        max_pauses: int = 3,
+        max_wait: float = 120.0,
+    ):
+        if offline and cache is None:
+            raise ValueError("offline mode needs a cache to replay from")
+        self.tries = tries
+        self.retry = retry or RetryPolicy(tries=tries)
+        self.breaker = breaker
+        self.limiter = limiter
+        self.max_pauses = max_pauses
+        self.max_wait = max_wait
+        self.cache = cache
+        self.offline = offline
+        self.session = requests.Session()
+        self.session.headers.update(headers or HEADERS)
+        adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats: Deque[FetchStats] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def _get(
+        self,
+        url: str,
+        timeout: int,
+        stats: FetchStats,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> requests.Response:
+        """Perform one GET, filling `stats` with timings and sizes."""
+        _current.stats = stats
+        started = time.perf_counter()
+        try:
+            resp = self.session.get(url, timeout=timeout, stream=True, headers=headers)
+            headers_at = time.perf_counter()
+            # read the body even for error responses so the connection
+            # goes back to the pool
+            content = resp.content
+            done = time.perf_counter()
+        finally:
+            _current.stats = None
+            stats.total = time.perf_counter() - started
+            with self._lock:
+                self.stats.append(stats)
+            metrics = get_metrics()
+            metrics.incr("fetch.requests")
+            metrics.observe("fetch.latency", stats.total, SECONDS)
+        stats.status = resp.status_code
+        stats.ttfb = max(
+            0.0, headers_at - started - stats.dns - stats.connect - stats.tls
+        )
+        stats.body = done - headers_at
+        stats.wire_bytes = resp.raw.tell() if resp.raw is not None else len(content)
+        stats.content_bytes = len(content)
+        metrics.incr("fetch.bytes", stats.wire_bytes, BYTES)
+        return resp
+
+    def fetch(
+        self, url: str, timeout: int = 10, save_snapshot: Optional[str] = None
+    ) -> str:
+        """Fetch a URL with a small retry loop and return the response text.
+
+        On repeated failures a RuntimeError is raised.
+        """
+        text = self._fetch(url, timeout)
+        if save_snapshot:
+            with open(save_snapshot, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def _fetch(self, url: str, timeout: int) -> str:
+        if self.offline:
+            # recordings are replayed however old they are
+            cached = self.cache.get(url, allow_stale=True)
+            if cached is None:
+                raise RuntimeError(f"{url} is not in the cache (offline mode)")
+            print(f"[fetch] {url} -> replayed from cache")
+            get_metrics().incr("fetch.cache_replays")
+            return self.cache.read(cached)
+
+        cached = self.cache.get(url) if self.cache is not None else None
+        retry = self.retry
+        metrics = get_metrics()
+        attempt = pauses = 0
+        waited = 0.0
+        while True:
+            attempt += 1
+            if self.breaker is not None:
+                try:
+                    waited += self.breaker.wait(timeout=self.max_wait - waited)
+                except CircuitOpenError as e:
+                    metrics.incr("fetch.failures")
+                    raise RuntimeError(f"Failed to fetch {url}: {e}") from e
+            if self.limiter is not None:
+                self.limiter.acquire(url)
+            resp = None
+            status = retry_after = None
+            try:
+                resp = self._get(
+                    url,
+                    timeout,
+                    FetchStats(url=url, attempt=attempt),
+                    headers=self.cache.conditional_headers(cached) if cached else None,
+                )
+                # print status for debug
+                print(f"[fetch] {url} -> {resp.status_code}")
+                if resp.status_code == 304 and cached is not None:
+                    metrics.incr("fetch.not_modified")
+                    self._record(url, ok=True)
+                    self.cache.refresh(cached)
+                    return self.cache.read(cached)
+                resp.raise_for_status()
+                text = resp.text
+                self._record(url, ok=True)
+                if self.cache is not None:
+                    self.cache.store(
+                        url,
+                        text,
+                        etag=resp.headers.get("ETag"),
+                        last_modified=resp.headers.get("Last-Modified"),
+                    )
+                return text
+            except requests.HTTPError as e:
+                # HTTP errors from raise_for_status
+                print(f"[fetch] HTTP error {e} (attempt {attempt}/{retry.tries})")
+                metrics.incr("fetch.http_errors")
+                status = resp.status_code
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            except RequestException as e:
+                # network-level errors (timeouts, connection errors, etc.)
+                print(f"[fetch] network/error {e} (attempt {attempt}/{retry.tries})")
+                metrics.incr("fetch.network_errors")
+            retryable = status is None or status in retry.retry_statuses
+            # hard errors such as a 404 are neither successes nor failures
+            self._record(url, ok=False if retryable else None, throttled=status == 429)
+            if retry.should_retry(attempt, status) and waited < self.max_wait:
+                metrics.incr("fetch.retries")
+                delay = min(retry.delay(attempt, retry_after), self.max_wait - waited)
+                time.sleep(delay)
+                waited += delay
+                continue
+            if (
+                retryable
+                and self.breaker is not None
+                and self.breaker.state != CircuitBreaker.CLOSED
+                and pauses < self.max_pauses
+                and waited < self.max_wait
+            ):
+                # the site is failing as a whole: wait for the breaker to
+                # let a trial request through, then start over
+                pauses += 1
+                attempt = 0
+                metrics.incr("fetch.breaker_pauses")
+                continue
+            metrics.incr("fetch.failures")
+            raise RuntimeError(f"Failed to fetch {url} after {attempt} tries")
+
+    def _record(self, url: str, ok: Optional[bool], throttled: bool = False) -> None:
+        """Feed the outcome of an attempt to the breaker and rate limiter.
+
+        Only 2xx and 304 answers are successes (`ok` True); `ok` None is
+        an answer that is neither.
+        """
+        if self.breaker is not None:
+            if ok:
+                self.breaker.record_success()
+            elif ok is None:
+                self.breaker.record_neutral()
             else:
-                time.sleep(1)
-        except RequestException as e:
-            # network-level errors (timeouts, connection errors, etc.)
-            print(f"[fetch] network/error {e} (attempt {attempt}/{tries})")
-            time.sleep(1 * attempt)
-    raise RuntimeError(f"Failed to fetch {url} after {tries} tries")
+                self.breaker.record_failure()
+        if self.limiter is not None:
+            if throttled:
+                self.limiter.on_throttle(url)
+            elif ok:
+                self.limiter.on_success(url)
+
+    def summary(self) -> Dict[str, float]:
+        """Aggregate the recorded attempts into totals and mean timings."""
+        with self._lock:
+            records: List[FetchStats] = list(self.stats)
+        count = len(records)
+        summary: Dict[str, float] = {
+            "requests": count,
+            "new_connections": sum(r.new_connection for r in records),
+            "wire_bytes": sum(r.wire_bytes for r in records),
+            "content_bytes": sum(r.content_bytes for r in records),
+        }
+        for field in ("dns", "connect", "tls", "ttfb", "body", "total"):
+            values = [getattr(r, field) for r in records]
+            summary[f"mean_{field}"] = sum(values) / count if count else 0.0
+        return summary
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+
+
+_default_fetcher: Optional[Fetcher] = None
+_default_lock = threading.Lock()
+
+
+def get_default_fetcher() -> Fetcher:
+    """Return the process-wide :class:`Fetcher` used by `fetch_page`."""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            cache = None
+            if HTTP_CACHE_DIR:
+                cache = HTTPCache(
+                    HTTP_CACHE_DIR,
+                    ttl=HTTP_CACHE_TTL,
+                    max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024,
+                )
+            retry = RetryPolicy()
+            _default_fetcher = Fetcher(
+                cache=cache,
+                offline=HTTP_OFFLINE,
+                retry=retry,
+                # open before a page runs out of tries, so the crawl pauses
+                breaker=CircuitBreaker(failure_threshold=retry.tries),
+                limiter=AdaptiveRateLimiter(),
+            )
+        return _default_fetcher
+
+
+def set_default_fetcher(fetcher: Optional[Fetcher]) -> Optional[Fetcher]:
+    """Replace the process-wide :class:`Fetcher` and return the old one.
+
+    Passing None makes the next `fetch_page` call build a fresh default.
+    """
+    global _default_fetcher
+    with _default_lock:
+        previous, _default_fetcher = _default_fetcher, fetcher
+        return previous
+
+
+def fetch_page(url: str, timeout: int = 10, save_snapshot: Optional[str] = None) -> str:
+    """Fetch a URL with the shared keep-alive :class:`Fetcher`.
+
+    On repeated failures a RuntimeError is raised.
+    """
+    return get_default_fetcher().fetch(
+        url, timeout=timeout, save_snapshot=save_snapshot
+    )
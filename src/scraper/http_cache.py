@@ -0,0 +1,169 @@
+"""On-disk HTTP response cache used by :class:`src.scraper.fetcher.Fetcher`.
+
+Bodies are stored one file per URL next to a small JSON index holding the
+``ETag`` / ``Last-Modified`` validators, the store time and the last
+access time of every entry. Entries older than `ttl` are dropped and the
+least recently used ones are evicted once the cache grows beyond
+`max_bytes`. Offline replays read entries with ``allow_stale=True``,
+which never expires them, so old recordings stay usable.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+
+@dataclass
+class CacheEntry:
+    """Index record of a cached response."""
+
+    url: str
+    file: str
+    size: int
+    stored_at: float
+    last_access: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class HTTPCache:
+    """TTL- and size-bounded LRU cache of response bodies on disk.
+
+    `ttl` is in seconds (None keeps entries until they are evicted for
+    space) and `max_bytes` bounds the total size of cached bodies.
+    """
+
+    INDEX_FILENAME = "index.json"
+
+    def __init__(
+        self,
+        folder: str,
+        ttl: Optional[float] = 24 * 3600,
+        max_bytes: int = 200 * 1024 * 1024,
+    ):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CacheEntry] = {}
+        index_path = self.folder / self.INDEX_FILENAME
+        if index_path.exists():
+            with index_path.open("r", encoding="utf-8") as f:
+                self._entries = {
+                    url: CacheEntry(**entry) for url, entry in json.load(f).items()
+                }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return self.get(url) is not None
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(e.size for e in self._entries.values())
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return self.ttl is not None and now - entry.stored_at > self.ttl
+
+    def get(self, url: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """Return the live entry for `url` and mark it as recently used.
+
+        With `allow_stale` an expired entry is returned as well and nothing
+        is removed from the cache.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            missing = not (self.folder / entry.file).exists()
+            if allow_stale:
+                return None if missing else entry
+            if self._expired(entry, now) or missing:
+                self._remove(url)
+                self._save_index()
+                return None
+            entry.last_access = now
+            return entry
+
+    def read(self, entry: CacheEntry) -> str:
+        """Return the cached body of `entry`."""
+        return (self.folder / entry.file).read_text(encoding="utf-8")
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Return ``If-None-Match`` / ``If-Modified-Since`` headers for `entry`."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(
+        self,
+        url: str,
+        body: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> CacheEntry:
+        """Cache `body` for `url` and evict entries if over budget."""
+        data = body.encode("utf-8")
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html"
+        tmp = self.folder / (name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, self.folder / name)
+        now = time.time()
+        entry = CacheEntry(
+            url=url,
+            file=name,
+            size=len(data),
+            stored_at=now,
+            last_access=now,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        with self._lock:
+            self._entries[url] = entry
+            self._evict(now)
+            self._save_index()
+        return entry
+
+    def refresh(self, entry: CacheEntry) -> None:
+        """Restart the TTL of `entry` after the server confirmed it (304)."""
+        with self._lock:
+            entry.stored_at = entry.last_access = time.time()
+            self._save_index()
+
+    def _evict(self, now: float) -> None:
+        for url, entry in list(self._entries.items()):
+            if self._expired(entry, now):
+                self._remove(url)
+        total = self.total_bytes
+        for entry in sorted(self._entries.values(), key=lambda e: e.last_access):
+            if total <= self.max_bytes:
+                break
+            total -= entry.size
+            self._remove(entry.url)
+
+    def _remove(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            try:
+                (self.folder / entry.file).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _save_index(self) -> None:
+        path = self.folder / self.INDEX_FILENAME
+        tmp = path.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({u: asdict(e) for u, e in self._entries.items()}, f)
+        os.replace(tmp, path)
@@ -1,22 +1,86 @@
 """Command-line entrypoint for running the scraper.
 
 This module exposes a simple `main()` function that runs the crawler once.
+With ``--profile`` the run is profiled (see :mod:`src.scraper.profiling`);
+``--profile-page N`` crawls and profiles page N only.
 """
 
+import argparse
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
 from .crawler import scrape_pages
-from .config import BASE_URL
+from .fetcher import get_default_fetcher
+from .config import (
+    BASE_URL,
+    CONCURRENCY,
+    DETECT_RELISTS,
+    PARSE_WORKERS,
+    STORAGE_BACKEND,
+)
+from .metrics import get_metrics
+from .pipeline import resolve_parse_workers
+from .profiling import PROFILE_MODES, make_profiler
+from .storage import create_storage
 
 
-def main() -> None:
+def run(max_pages: int = 5, page: Optional[int] = None) -> List[Dict]:
     """Run a single scraping session and print a short summary.
 
-    This function exists so the package can be executed with
-    `python -m src.scraper.main` during development.
+    With `page` only that page is crawled, e.g. to profile it.
     """
     print("Start scraping Otomoto (simple crawler).")
-    offers = scrape_pages(base_url=BASE_URL, max_pages=5, delay=1.0, stop_on_empty=True)
+    with create_storage(STORAGE_BACKEND, folder="data") as storage:
+        offers = scrape_pages(
+            base_url=BASE_URL,
+            start_page=page or 1,
+            max_pages=page or max_pages,
+            delay=1.0,
+            stop_on_empty=True,
+            concurrency=CONCURRENCY,
+            parse_workers=resolve_parse_workers(PARSE_WORKERS),
+            incremental=True,
+            stop_after_unchanged=2,
+            storage=storage,
+            detect_relists=DETECT_RELISTS,
+        )
     print(f"Finished. Collected {len(offers)} offers in this run.")
+    transport = get_default_fetcher().summary()
+    print(
+        "Transport: {requests} requests, {new_connections} new connections, "
+        "{wire_bytes} bytes on the wire, mean connect {mean_connect:.3f}s, "
+        "mean TTFB {mean_ttfb:.3f}s".format(**transport)
+    )
+    print(get_metrics().summary())
+    return offers
+
+
+def main(argv=None) -> None:
+    """Parse the command line and run :func:`run`, profiled if asked to.
+
+    This function exists so the package can be executed with
+    `python -m src.scraper.main` during development.
+    """
+    ap = argparse.ArgumentParser(description="Scrape Otomoto listings once.")
+    ap.add_argument("--max-pages", type=int, default=5)
+    ap.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        help="profile the run (cprofile or sampling)",
+    )
+    ap.add_argument(
+        "--profile-memory", action="store_true", help="take a tracemalloc snapshot"
+    )
+    ap.add_argument("--profile-page", type=int, help="crawl and profile this page only")
+    ap.add_argument("--profile-top", type=int, default=20, help="hotspots to print")
+    args = ap.parse_args(argv)
+
+    profiler = make_profiler(
+        args.profile, args.profile_memory, args.profile_page, args.profile_top
+    )
+    with profiler or nullcontext():
+        run(max_pages=args.max_pages, page=args.profile_page)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
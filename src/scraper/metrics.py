@@ -0,0 +1,232 @@
+"""Counters, timers and histograms for the fetch, parse and store stages.
+
+The stages report to the process-wide registry returned by
+:func:`get_metrics`. Names are dotted and start with the stage:
+
+- ``fetch.requests``, ``fetch.latency`` (seconds per attempt),
+  ``fetch.bytes``, ``fetch.retries``, ``fetch.http_errors``,
+  ``fetch.network_errors``, ``fetch.failures``, ``fetch.breaker_pauses``,
+  ``fetch.not_modified``, ``fetch.cache_replays``
+- ``parse.seconds`` (per page), ``parse.offers`` (per page),
+  ``parse.validation_failures``
+- ``store.write_seconds`` (per save call), ``store.flush_seconds``,
+  ``store.offers``, ``store.changes``
+
+At the end of a run :meth:`Metrics.summary` renders them as a short
+table and :meth:`Metrics.emf` as CloudWatch Embedded Metric Format
+documents: printed to a Lambda's log stream, CloudWatch turns them into
+metrics without any API calls.
+
+``SCRAPER_METRICS=0`` (or :func:`set_metrics` with :class:`NullMetrics`,
+as the benchmarks do) replaces the registry with one whose methods do
+nothing.
+"""
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import METRICS_ENABLED
+
+# CloudWatch units
+COUNT = "Count"
+SECONDS = "Seconds"
+BYTES = "Bytes"
+NONE = "None"
+
+# values per metric allowed in one EMF document
+EMF_MAX_VALUES = 100
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms.
+
+    Histograms keep every observed value, which is fine for the few
+    hundred pages of a run; call :meth:`reset` between runs of a
+    long-lived process (e.g. warm Lambda invocations).
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, List[float]] = {}
+        self.units: Dict[str, str] = {}
+
+    def incr(self, name: str, value: float = 1, unit: str = COUNT) -> None:
+        """Add `value` to counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            self.units.setdefault(name, unit)
+
+    def observe(self, name: str, value: float, unit: str = NONE) -> None:
+        """Add one value to histogram `name`."""
+        with self._lock:
+            self.histograms.setdefault(name, []).append(value)
+            self.units.setdefault(name, unit)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Observe the seconds spent in the ``with`` block in `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, SECONDS)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.units.clear()
+
+    def export(self) -> Dict[str, Any]:
+        """Return the raw counters and values, e.g. to send them to another
+        process; :meth:`merge` adds them to a registry."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {k: list(v) for k, v in self.histograms.items()},
+                "units": dict(self.units),
+            }
+
+    def merge(self, exported: Dict[str, Any]) -> None:
+        units = exported.get("units", {})
+        for name, value in exported.get("counters", {}).items():
+            self.incr(name, value, units.get(name, COUNT))
+        for name, values in exported.get("histograms", {}).items():
+            with self._lock:
+                self.histograms.setdefault(name, []).extend(values)
+                self.units.setdefault(name, units.get(name, NONE))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return counter values and count/sum/mean/p50/p95/max of every
+        histogram, keyed by metric name."""
+        data = self.export()
+        snap: Dict[str, Any] = dict(data["counters"])
+        for name, values in data["histograms"].items():
+            ordered = sorted(values)
+            snap[name] = {
+                "count": len(ordered),
+                "sum": sum(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": _percentile(ordered, 0.5),
+                "p95": _percentile(ordered, 0.95),
+                "max": ordered[-1],
+            }
+        return snap
+
+    def summary(self) -> str:
+        """Render :meth:`snapshot` as one line per metric."""
+        lines = []
+        for name, value in sorted(self.snapshot().items()):
+            if isinstance(value, dict):
+                lines.append(
+                    f"  {name:<26} n={value['count']:<5} mean={value['mean']:.4g} "
+                    f"p50={value['p50']:.4g} p95={value['p95']:.4g} max={value['max']:.4g}"
+                )
+            else:
+                lines.append(f"  {name:<26} {value:g}")
+        return "\n".join(["Metrics:"] + lines) if lines else "Metrics: none recorded"
+
+    def emf(
+        self,
+        namespace: str,
+        dimensions: Optional[Dict[str, str]] = None,
+        timestamp: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return the metrics as CloudWatch Embedded Metric Format documents.
+
+        Counters go into the first document; histogram values are split
+        over as many documents as needed to stay within the EMF limit of
+        100 values per metric.
+        """
+        dimensions = dict(dimensions or {})
+        data = self.export()
+        ts = int((time.time() if timestamp is None else timestamp) * 1000)
+        docs = []
+        start = 0
+        while True:
+            values: Dict[str, Any] = dict(data["counters"]) if start == 0 else {}
+            for name, hist in data["histograms"].items():
+                chunk = hist[start : start + EMF_MAX_VALUES]
+                if chunk:
+                    values[name] = chunk
+            if not values:
+                break
+            docs.append(
+                {
+                    "_aws": {
+                        "Timestamp": ts,
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": namespace,
+                                "Dimensions": [sorted(dimensions)],
+                                "Metrics": [
+                                    {
+                                        "Name": name,
+                                        "Unit": data["units"].get(name, NONE),
+                                    }
+                                    for name in values
+                                ],
+                            }
+                        ],
+                    },
+                    **dimensions,
+                    **values,
+                }
+            )
+            start += EMF_MAX_VALUES
+        return docs
+
+
+class NullMetrics(Metrics):
+    """A registry that records nothing, for benchmarks and opted-out runs."""
+
+    enabled = False
+    _timer = nullcontext()
+
+    def incr(self, name: str, value: float = 1, unit: str = COUNT) -> None:
+        pass
+
+    def observe(self, name: str, value: float, unit: str = NONE) -> None:
+        pass
+
+    def merge(self, exported: Dict[str, Any]) -> None:
+        pass
+
+    def timer(self, name: str):
+        return self._timer
+
+
+_metrics: Optional[Metrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide registry (a :class:`NullMetrics` when
+    ``SCRAPER_METRICS=0``)."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics() if METRICS_ENABLED else NullMetrics()
+    return _metrics
+
+
+def set_metrics(metrics: Optional[Metrics]) -> Optional[Metrics]:
+    """Replace the process-wide registry and return the old one.
+
+    Passing None makes the next :func:`get_metrics` call build a fresh
+    default.
+    """
+    global _metrics
+    with _metrics_lock:
+        previous, _metrics = _metrics, metrics
+        return previous
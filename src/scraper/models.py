@@ -1,12 +1,15 @@
 """Pydantic models used to validate parsed car offers.
 
-Only a single `CarModel` is defined for the current test-suite and
-parser output validation.
+`CarModel` describes a scraped offer. The parser validates offers as
+plain dictionaries against the equivalent :class:`Offer` ``TypedDict``,
+a whole page at a time through :data:`OFFER_LIST_ADAPTER`, which avoids
+building and dumping a model instance per offer.
 """
 
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
 
 
 class CarModel(BaseModel):
@@ -28,3 +31,25 @@ class CarModel(BaseModel):
     mileage_km: Optional[int] = None
     location: Optional[str] = None
     fuel_type: Optional[str] = None
+
+
+class Offer(TypedDict):
+    """Dictionary form of :class:`CarModel` used through the pipeline."""
+
+    id: str
+    url: str
+    car_brand: str
+    model: str
+    year: int
+    price: float
+    price_currency: Optional[str]
+    engine_capacity: Optional[float]
+    engine_power: Optional[int]
+    mileage_km: Optional[int]
+    location: Optional[str]
+    fuel_type: Optional[str]
+
+
+# Validators built once; validating returns plain dicts
+OFFER_ADAPTER = TypeAdapter(Offer)
+OFFER_LIST_ADAPTER = TypeAdapter(List[Offer])
@@ -0,0 +1,194 @@
+"""Columnar Parquet storage backend for scraped offers.
+
+Offers are buffered and written as typed, zstd-compressed row groups into
+a Hive-partitioned dataset (``<folder>/<name>/scrape_date=YYYY-MM-DD/``),
+one file per run and day. :func:`read_offers` reads the dataset back with
+column projection and predicate pushdown, so filters such as
+``year >= 2015 AND price < 50000`` skip row groups by their statistics.
+Offers whose price or mileage changed are appended again with a later
+``scraped_at``; ``read_offers(latest=True)`` keeps only the newest row of
+every offer.
+
+Requires the optional ``pyarrow`` package.
+"""
+
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError as e:  # pragma: no cover - depends on the environment
+    raise ImportError(
+        "The parquet storage backend needs pyarrow: pip install pyarrow"
+    ) from e
+
+from .storage import (
+    Filter,
+    OfferStorage,
+    dataset_name,
+    parse_filter,
+    resolve_data_folder,
+)
+
+_dict_string = pa.dictionary(pa.int32(), pa.string())
+
+# Arrow schema matching :class:`src.scraper.models.CarModel`
+SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("url", pa.string(), nullable=False),
+        pa.field("car_brand", _dict_string, nullable=False),
+        pa.field("model", _dict_string, nullable=False),
+        pa.field("year", pa.int16(), nullable=False),
+        pa.field("price", pa.float64(), nullable=False),
+        pa.field("price_currency", _dict_string),
+        pa.field("engine_capacity", pa.float32()),
+        pa.field("engine_power", pa.int32()),
+        pa.field("mileage_km", pa.int32()),
+        pa.field("location", _dict_string),
+        pa.field("fuel_type", _dict_string),
+        pa.field("scraped_at", pa.timestamp("s", tz="UTC"), nullable=False),
+    ]
+)
+
+PARTITION_FIELD = "scrape_date"
+
+
+class ParquetStorage(OfferStorage):
+    """Write offers to a date-partitioned Parquet dataset.
+
+    Rows are buffered until `row_group_size` offers are pending, then
+    written as one row group; :meth:`flush` and :meth:`close` write the
+    remainder. Each run appends to its own file, so concurrent runs never
+    share a writer.
+    """
+
+    def __init__(
+        self,
+        folder: str = "data",
+        row_group_size: int = 10_000,
+        compression: str = "zstd",
+        index_filename: str = "offer_index.json",
+        changes_filename: str = "offer_changes.jsonl",
+    ):
+        self.folder = resolve_data_folder(folder)
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.index_filename = index_filename
+        self.changes_filename = changes_filename
+        self._index = None
+        self._run_id = uuid.uuid4().hex[:8]
+        self._buffers: Dict[str, List[Dict]] = {}
+        # (dataset name, scrape date) -> open writer
+        self._writers: Dict[Tuple[str, str], pq.ParquetWriter] = {}
+
+    def save(self, offers: List[Dict], filename: str = "all_offers.jsonl") -> str:
+        """Buffer `offers`, writing a row group once enough are pending.
+
+        The dataset is named after `filename` without its extensions.
+        """
+        name = dataset_name(filename)
+        scraped_at = datetime.now(timezone.utc).replace(microsecond=0)
+        buffer = self._buffers.setdefault(name, [])
+        buffer.extend({**o, "scraped_at": scraped_at} for o in offers)
+        if len(buffer) >= self.row_group_size:
+            self._write(name)
+        return str(self.folder / name)
+
+    def save_updated(self, offers: List[Dict]) -> str:
+        """Append the new versions of changed offers; they supersede the
+        older rows for ``read_offers(latest=True)``."""
+        return self.save(offers)
+
+    def _write(self, name: str) -> None:
+        rows = self._buffers.pop(name, [])
+        by_date: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_date.setdefault(row["scraped_at"].date().isoformat(), []).append(row)
+        for day, day_rows in by_date.items():
+            table = pa.Table.from_pylist(
+                [{f: r.get(f) for f in SCHEMA.names} for r in day_rows], schema=SCHEMA
+            )
+            self._writer(name, day).write_table(table, row_group_size=len(day_rows))
+
+    def _writer(self, name: str, day: str) -> pq.ParquetWriter:
+        key = (name, day)
+        writer = self._writers.get(key)
+        if writer is None:
+            part_dir = self.folder / name / f"{PARTITION_FIELD}={day}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime("%H%M%S")
+            path = part_dir / f"part-{stamp}-{self._run_id}.parquet"
+            writer = pq.ParquetWriter(path, SCHEMA, compression=self.compression)
+            self._writers[key] = writer
+        return writer
+
+    def flush(self) -> None:
+        """Write all buffered offers as row groups."""
+        for name in list(self._buffers):
+            self._write(name)
+        super().flush()
+
+    def close(self) -> None:
+        """Flush and finalize the Parquet files of this run."""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def read_offers(
+    folder: Union[str, Path] = "data",
+    where: Union[str, Sequence[Filter], None] = None,
+    columns: Optional[Sequence[str]] = None,
+    name: str = "all_offers",
+    latest: bool = False,
+) -> "pa.Table":
+    """Read a dataset written by :class:`ParquetStorage` as an Arrow table.
+
+    `where` is a filter expression (see :func:`parse_filter`) or a list of
+    pyarrow filter tuples; it is pushed down to partition and row group
+    pruning. `columns` limits which columns are decoded.
+
+    The dataset holds every stored version of an offer. With `latest`
+    only the newest row per id is kept (sorted by id); `where` then
+    applies to that row, so it is evaluated after reading instead of
+    being pushed down.
+    """
+    filters = parse_filter(where) if isinstance(where, str) else where
+    filters = list(filters) if filters else None
+    if not latest:
+        return pq.read_table(
+            Path(folder) / name,
+            columns=list(columns) if columns else None,
+            filters=filters,
+            partitioning="hive",
+        )
+    table = _latest_rows(pq.read_table(Path(folder) / name, partitioning="hive"))
+    if filters:
+        table = table.filter(pq.filters_to_expression(filters))
+    return table.select(list(columns)) if columns else table
+
+
+def _latest_rows(table: "pa.Table") -> "pa.Table":
+    """Keep the last stored row of every offer id."""
+    if table.num_rows == 0:
+        return table
+    rows = pa.array(range(table.num_rows), pa.int64())
+    order = pc.sort_indices(
+        table.append_column("_row", rows),
+        sort_keys=[
+            ("id", "ascending"),
+            ("scraped_at", "descending"),
+            ("_row", "descending"),
+        ],
+    )
+    table = table.take(order)
+    ids = table.column("id").combine_chunks()
+    first = pc.not_equal(ids.slice(1), ids.slice(0, len(ids) - 1))
+    keep = pa.concat_arrays([pa.array([True]), first])
+    return table.filter(keep)
@@ -2,17 +2,22 @@
 
 This module extracts car offer details from listing HTML and returns
 validated dictionaries using :class:`src.scraper.models.CarModel`.
+
+Listing pages embed their search results as JSON in a ``__NEXT_DATA__``
+script block; when it is present offers are read from it directly and the
+BeautifulSoup DOM walk is only used as a fallback; bs4 is imported on
+first use, so runs that only see JSON pages never load it.
 """
 
+import json
 import re
-from typing import Dict, List, Optional
-
-from bs4 import BeautifulSoup
+from typing import Any, Dict, List, Optional
 
 from pydantic import ValidationError
 
-from .config import BASE_URL
-from .models import CarModel
+from .config import BASE_URL, PARSER_BACKEND
+from .metrics import get_metrics
+from .models import OFFER_ADAPTER, OFFER_LIST_ADAPTER
 from .utils import (
     absolute_url,
     make_id_from_url_or_hash,
@@ -20,6 +25,20 @@ from .utils import (
     parse_int_from_text,
 )
 
+NEXT_DATA_MARKER = '<script id="__NEXT_DATA__"'
+
+# Generated CSS class names of the listing markup used by the DOM parsers
+TITLE_CLASS = "etydmma0"
+PRICE_CLASS = "efzkujb1"
+CURRENCY_CLASS = "efzkujb2"
+PARAMS_CLASS = "ooa-x6wpd5"
+EXTRA_INFO_CLASS = "ooa-nxfgg7"
+LOCATION_LIST_CLASS = "ooa-1o0axny"
+
+# "2996 cm3" and "204 KM" / "150 kW" segments of the listing extra info
+_ENGINE_CAPACITY_RE = re.compile(r"(\d{3,4})\s?cm3", re.I)
+_ENGINE_POWER_RE = re.compile(r"(\d{2,4})\s?(KM|kW)", re.I)
+
 
 def split_brand_and_model(title: Optional[str]) -> tuple[str, str]:
     """Split a listing title into (brand, model).
@@ -44,26 +63,25 @@ def parse_offer_element(it, base_url: str) -> Optional[Dict]:
     Attempts to validate the parsed data with :class:`CarModel`. If
     validation fails, a best-effort raw dictionary is returned instead.
     """
-    # id
-    data_id = it.get("data-id")
-    id_val = data_id or make_id_from_url_or_hash("", "")
+    return build_offer(base_url, **collect_offer_texts(it))
+
 
+def collect_offer_texts(it) -> Dict[str, Any]:
+    """Return the raw texts of an <article> as :func:`build_offer` arguments."""
     # title + url
-    title_el = it.select_one("h2.etydmma0 > a")
+    title_el = it.select_one(f"h2.{TITLE_CLASS} > a")
     title = title_el.get_text(strip=True) if title_el else None
     href = title_el["href"] if (title_el and title_el.has_attr("href")) else None
-    url = absolute_url(base_url, href) if href else None
 
     # price + currency
-    price_el = it.select_one("h3.efzkujb1")
-    currency_el = it.select_one("p.efzkujb2")
+    price_el = it.select_one(f"h3.{PRICE_CLASS}")
+    currency_el = it.select_one(f"p.{CURRENCY_CLASS}")
     price_raw = price_el.get_text(strip=True) if price_el else None
-    price = parse_float_from_text(price_raw) if price_raw else None
     currency = currency_el.get_text(strip=True) if currency_el else None
 
     # parameters from <dl>
     params = {}
-    dl = it.select_one("dl.ooa-x6wpd5")
+    dl = it.select_one(f"dl.{PARAMS_CLASS}")
     if dl:
         dts = dl.find_all("dt")
         dds = dl.find_all("dd")
@@ -72,11 +90,58 @@ def parse_offer_element(it, base_url: str) -> Optional[Dict]:
             value = dd.get_text(strip=True)
             params[key] = value
 
+    extra_info_el = it.select_one(f"p.{EXTRA_INFO_CLASS}")
+    extra_text = extra_info_el.get_text(strip=True) if extra_info_el else None
+
+    # location
+    location_el = it.select_one(f"ul.{LOCATION_LIST_CLASS} li p")
+    location = location_el.get_text(strip=True) if location_el else None
+
+    return {
+        "data_id": it.get("data-id"),
+        "title": title,
+        "href": href,
+        "price_raw": price_raw,
+        "currency": currency,
+        "params": params,
+        "extra_text": extra_text,
+        "location": location,
+    }
+
+
+def build_offer(base_url: str, **texts) -> Dict:
+    """Turn the raw texts of one listing <article> into a validated dict.
+
+    See :func:`build_raw_offer` for the arguments.
+    """
+    return _validate_offer(build_raw_offer(base_url, **texts), texts.get("title"))
+
+
+def build_raw_offer(
+    base_url: str,
+    data_id: Optional[str],
+    title: Optional[str],
+    href: Optional[str],
+    price_raw: Optional[str],
+    currency: Optional[str],
+    params: Dict[str, str],
+    extra_text: Optional[str],
+    location: Optional[str],
+) -> Dict:
+    """Turn the raw texts of one listing <article> into an offer dict.
+
+    Shared by the BeautifulSoup and the streaming DOM parsers, which only
+    differ in how they collect these texts. The result is not validated
+    yet; see :func:`validate_offers`.
+    """
+    # id
+    id_val = data_id or make_id_from_url_or_hash("", "")
+    url = absolute_url(base_url, href) if href else None
+    price = parse_float_from_text(price_raw) if price_raw else None
+
     # Extract specific parameters from params dict
     year = None
     mileage = None
-    engine_capacity = None
-    engine_power = None
     fuel_type = None
 
     # year
@@ -93,14 +158,12 @@ def parse_offer_element(it, base_url: str) -> Optional[Dict]:
     # engine capacity and power parsing from <p class="ooa-nxfgg7">
     engine_capacity = None
     engine_power = None
-    extra_info_el = it.select_one("p.ooa-nxfgg7")
-    if extra_info_el:
-        extra_text = extra_info_el.get_text(strip=True)
+    if extra_text:
         # eg.: "2996 cm3 • 204 KM • BMW 523i, Pierwszy właściciel w Polsce od 7lat."
         parts = [part.strip() for part in extra_text.split("•")]
         for part in parts:
             # capacity in cm3
-            m_engine = re.search(r"(\d{3,4})\s?cm3", part, re.I)
+            m_engine = _ENGINE_CAPACITY_RE.search(part)
             if m_engine:
                 try:
                     engine_capacity = float(m_engine.group(1))
@@ -108,7 +171,7 @@ def parse_offer_element(it, base_url: str) -> Optional[Dict]:
                     pass
 
             # engine power in KM or kW
-            m_power = re.search(r"(\d{2,4})\s?(KM|kW)", part, re.I)
+            m_power = _ENGINE_POWER_RE.search(part)
             if m_power:
                 try:
                     engine_power = int(m_power.group(1))
@@ -119,10 +182,6 @@ def parse_offer_element(it, base_url: str) -> Optional[Dict]:
     if "fuel_type" in params:
         fuel_type = params["fuel_type"].capitalize()
 
-    # location
-    location_el = it.select_one("ul.ooa-1o0axny li p")
-    location = location_el.get_text(strip=True) if location_el else None
-
     # brand/model from title
     brand_guess, model_guess = split_brand_and_model(title)
 
@@ -140,31 +199,185 @@ def parse_offer_element(it, base_url: str) -> Optional[Dict]:
         "location": location,
         "fuel_type": fuel_type,
     }
+    return raw
+
+
+def validate_offers(raws: List[Dict]) -> List[Dict]:
+    """Validate a page of raw offers in one pass.
+
+    If any offer is invalid the page is validated offer by offer, so only
+    the broken ones fall back to their raw form.
+    """
+    try:
+        return OFFER_LIST_ADAPTER.validate_python(raws)
+    except ValidationError:
+        return [_validate_offer(raw) for raw in raws]
+
 
+def _validate_offer(raw: Dict, title: Optional[str] = None) -> Dict:
+    """Validate `raw` as a :class:`CarModel`, falling back to `raw` itself."""
     try:
-        car = CarModel.parse_obj(raw)
-        return car.dict()
+        return OFFER_ADAPTER.validate_python(raw)
     except ValidationError as e:
         print("CarModel validation failed:", e, "raw:", raw)
+        get_metrics().incr("parse.validation_failures")
         # Coerce minimal data if validation fails
-        raw["id"] = str(raw.get("id") or make_id_from_url_or_hash(url, title))
+        raw["id"] = str(raw.get("id") or make_id_from_url_or_hash(raw["url"], title))
         raw["url"] = raw.get("url") or ""
         return raw
 
 
-def parse_listings(html: str, base_url: str = BASE_URL) -> List[Dict]:
-    """Parse an HTML listing page and return a list of offers."""
+def extract_next_data(html: str) -> Optional[Dict[str, Any]]:
+    """Return the decoded ``__NEXT_DATA__`` payload of a page, or None.
+
+    The script block is located with plain string search so the rest of
+    the document is never tokenized.
+    """
+    start = html.find(NEXT_DATA_MARKER)
+    if start == -1:
+        return None
+    start = html.find(">", start) + 1
+    end = html.find("</script>", start)
+    if start == 0 or end == -1:
+        return None
+    try:
+        return json.loads(html[start:end])
+    except ValueError:
+        return None
+
+
+def find_advert_nodes(next_data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Return the ``Advert`` nodes of the search results in `next_data`.
+
+    Search results live in one of the ``urqlState`` cache entries, whose
+    ``data`` is itself a JSON string. Entries that do not mention
+    ``advertSearch`` are skipped without being decoded. Returns None when
+    no search results are present.
+    """
+    page_props = (next_data.get("props") or {}).get("pageProps") or {}
+    for entry in (page_props.get("urqlState") or {}).values():
+        data = entry.get("data") if isinstance(entry, dict) else None
+        if not isinstance(data, str) or '"advertSearch"' not in data:
+            continue
+        try:
+            search = json.loads(data).get("advertSearch")
+        except ValueError:
+            continue
+        if isinstance(search, dict):
+            edges = search.get("edges") or []
+            return [e["node"] for e in edges if isinstance(e, dict) and e.get("node")]
+    return None
+
+
+def parse_advert_node(node: Dict[str, Any], base_url: str) -> Optional[Dict]:
+    """Map a ``__NEXT_DATA__`` advert node to the same dict as the DOM path."""
+    return _validate_offer(advert_node_to_raw(node, base_url), node.get("title"))
+
+
+def advert_node_to_raw(node: Dict[str, Any], base_url: str) -> Dict:
+    """Map an advert node to an offer dict without validating it."""
+    params = {
+        p.get("key"): p for p in node.get("parameters") or [] if isinstance(p, dict)
+    }
+
+    def param(key: str, field: str = "value") -> Optional[str]:
+        value = (params.get(key) or {}).get(field)
+        return str(value) if value is not None else None
+
+    title = node.get("title")
+    href = node.get("url")
+    url = absolute_url(base_url, href) if href else None
+
+    amount = (node.get("price") or {}).get("amount") or {}
+    price_raw = amount.get("value", amount.get("units"))
+    price = parse_float_from_text(str(price_raw)) if price_raw is not None else None
+
+    try:
+        year = int(param("year"))
+    except (ValueError, TypeError):
+        year = None
+
+    fuel_type = param("fuel_type", "displayValue")
+    if fuel_type:
+        fuel_type = fuel_type.capitalize()
+
+    loc = node.get("location") or {}
+    city = (loc.get("city") or {}).get("name")
+    region = (loc.get("region") or {}).get("name")
+    if city and region:
+        location = f"{city} ({region})"
+    else:
+        location = city or region
+
+    brand_guess, model_guess = split_brand_and_model(title)
+
+    raw = {
+        "id": str(node.get("id") or make_id_from_url_or_hash(url, title)),
+        "url": url or "",
+        "car_brand": brand_guess,
+        "model": model_guess,
+        "year": year or 0,
+        "price": price or 0.0,
+        "price_currency": amount.get("currencyCode"),
+        "engine_capacity": parse_float_from_text(param("engine_capacity")),
+        "engine_power": parse_int_from_text(param("engine_power")),
+        "mileage_km": parse_int_from_text(param("mileage")),
+        "location": location,
+        "fuel_type": fuel_type,
+    }
+    return raw
+
+
+def parse_listings_json(html: str, base_url: str = BASE_URL) -> Optional[List[Dict]]:
+    """Parse offers from the ``__NEXT_DATA__`` block.
+
+    Returns None when the page carries no such block (or no search results
+    in it) so the caller can fall back to the DOM parser.
+    """
+    next_data = extract_next_data(html)
+    if next_data is None:
+        return None
+    nodes = find_advert_nodes(next_data)
+    if nodes is None:
+        return None
+
+    print(f"Found {len(nodes)} offers in __NEXT_DATA__")
+
+    return validate_offers([advert_node_to_raw(node, base_url) for node in nodes])
+
+
+def parse_listings_dom(html: str, base_url: str = BASE_URL) -> List[Dict]:
+    """Parse an HTML listing page by walking its <article> elements."""
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
-    results = []
 
     # Find all <article> elements with data-id; these are the listings
     items = soup.find_all("article", attrs={"data-id": True})
 
     print(f"Found {len(items)} offer elements")
 
-    for it in items:
-        parsed = parse_offer_element(it, base_url)
-        if parsed:
-            results.append(parsed)
+    raws = [build_raw_offer(base_url, **collect_offer_texts(it)) for it in items]
+    return validate_offers(raws)
+
+
+def parse_listings(
+    html: str, base_url: str = BASE_URL, backend: Optional[str] = None
+) -> List[Dict]:
+    """Parse an HTML listing page and return a list of offers.
+
+    The embedded ``__NEXT_DATA__`` JSON is preferred; pages without it are
+    parsed from the DOM with `backend` ("soup" for BeautifulSoup, "stream"
+    for the incremental tokenizer), defaulting to ``PARSER_BACKEND``.
+    """
+    results = parse_listings_json(html, base_url)
+    if results is not None:
+        return results
+    backend = backend or PARSER_BACKEND
+    if backend == "stream":
+        from .stream_parser import parse_listings_stream
 
-    return results
+        return parse_listings_stream(html, base_url)
+    if backend != "soup":
+        raise ValueError(f"Unknown parser backend: {backend!r}")
+    return parse_listings_dom(html, base_url)
@@ -0,0 +1,138 @@
+"""Parse fetched listing pages in a pool of worker processes.
+
+:func:`iter_parsed_pages` sits between the crawler's fetch stage and its
+writer: fetched pages are handed to a :class:`ProcessPoolExecutor`
+running :func:`src.scraper.parser.parse_listings`, so parsing a large page
+no longer holds up the next request, and parsed pages come back in page
+order to the single writer in :func:`src.scraper.crawler.scrape_pages`.
+
+At most `max_in_flight` pages are held between the two stages. Pages are
+only pulled from the fetch stage when there is room, so a slow parser
+slows fetching down instead of piling up HTML in memory.
+
+Parse times, offer counts and validation failures recorded in a worker
+are sent back with its result and merged into the crawler's metrics.
+
+Where worker processes cannot be started (AWS Lambda has no ``/dev/shm``)
+pages are parsed in the calling process instead.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import Metrics, NullMetrics, get_metrics, set_metrics
+from .parser import parse_listings
+
+# (page number, url, parsed offers or None, fetch error or None)
+ParsedPage = Tuple[int, str, Optional[List[Dict]], Optional[Exception]]
+
+
+def resolve_parse_workers(value: str) -> int:
+    """Turn a ``SCRAPER_PARSE_WORKERS`` value into a worker count.
+
+    ``"auto"`` uses every available core; ``0`` parses in-process.
+    """
+    if value == "auto":
+        try:
+            return len(os.sched_getaffinity(0))
+        except AttributeError:  # not available on macOS / Windows
+            return os.cpu_count() or 1
+    return int(value)
+
+
+def parse_page(html: str, base_url: str) -> List[Dict]:
+    """Parse one listing page, recording its parse time and offer count."""
+    metrics = get_metrics()
+    with metrics.timer("parse.seconds"):
+        offers = parse_listings(html, base_url)
+    metrics.observe("parse.offers", len(offers))
+    return offers
+
+
+def _parse_in_worker(
+    html: str, base_url: str, collect: bool
+) -> Tuple[List[Dict], Optional[Dict[str, Any]]]:
+    # runs in a worker process: record into a fresh registry and ship it
+    # back with the offers
+    metrics = Metrics() if collect else NullMetrics()
+    set_metrics(metrics)
+    offers = parse_page(html, base_url)
+    return offers, metrics.export() if collect else None
+
+
+def parse_inline(results, base_url: str) -> Iterator[ParsedPage]:
+    """Parse fetched pages one after another in this process."""
+    for page, url, html, error in results:
+        offers = parse_page(html, base_url) if error is None else None
+        yield page, url, offers, error
+
+
+def _start_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    try:
+        return ProcessPoolExecutor(max_workers=workers)
+    except (OSError, NotImplementedError) as e:
+        print(f"[pipeline] Cannot start parse workers ({e}); parsing in-process")
+        return None
+
+
+def iter_parsed_pages(
+    results,
+    base_url: str,
+    workers: int,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[ParsedPage]:
+    """Parse the pages of a fetch iterator with `workers` processes.
+
+    `results` yields ``(page, url, html, error)`` tuples as produced by the
+    crawler's fetch stage. Parsed pages are yielded in the same order;
+    pages that failed to fetch pass through with their error. Up to
+    `max_in_flight` pages (default ``2 * workers``) are fetched ahead of
+    the consumer. Closing the generator cancels queued parses and closes
+    `results`.
+    """
+    pool = _start_pool(workers) if workers > 0 else None
+    if pool is None:
+        yield from parse_inline(results, base_url)
+        return
+
+    max_in_flight = max_in_flight or 2 * workers
+    metrics = get_metrics()
+    pending: deque = deque()
+    results = iter(results)
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                item = next(results, None)
+                if item is None:
+                    exhausted = True
+                    break
+                page, url, html, error = item
+                future = (
+                    pool.submit(_parse_in_worker, html, base_url, metrics.enabled)
+                    if error is None
+                    else None
+                )
+                pending.append((page, url, future, error))
+                if error is not None:
+                    # nothing after a failed page is used by the writer
+                    exhausted = True
+            if not pending:
+                break
+            page, url, future, error = pending.popleft()
+            offers = None
+            if future is not None:
+                offers, recorded = future.result()
+                if recorded:
+                    metrics.merge(recorded)
+            yield page, url, offers, error
+    finally:
+        for _, _, future, _ in pending:
+            if future is not None:
+                future.cancel()
+        pool.shutdown(wait=True, cancel_futures=True)
+        close = getattr(results, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,241 @@
+"""Profile a crawl to see where its time and memory go.
+
+:class:`Profiler` wraps a run (see ``python -m src.scraper.main
+--profile``) and writes its results under ``data/profiles/``:
+
+- ``mode="cprofile"``: a ``.prof`` file for ``snakeviz`` or
+  :mod:`pstats`. Deterministic, but it only sees the thread that started
+  it, i.e. not the fetch threads of a concurrent crawl.
+- ``mode="sampling"``: a ``.speedscope.json`` file for
+  https://www.speedscope.app. The stacks of every thread are sampled
+  every `interval` seconds, so time spent waiting on the network shows up
+  next to BeautifulSoup, pydantic and disk writes.
+- ``memory=True``: a :mod:`tracemalloc` snapshot (``.tracemalloc``, load
+  it with :meth:`tracemalloc.Snapshot.load`) taken at the end of the run.
+
+A top-N hotspot summary of each is printed when the profiler stops.
+Pages parsed in worker processes are not covered; profile with
+``parse_workers=0`` to include parsing.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .storage import resolve_data_folder
+
+PROFILE_MODES = ("cprofile", "sampling")
+NAME_FORMAT = "profile-%Y%m%d-%H%M%S"
+
+# (function name, file, first line)
+Frame = Tuple[str, str, int]
+
+
+class SamplingProfiler:
+    """Periodically record the Python stack of every running thread."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.frames: Dict[Frame, int] = {}
+        # thread name -> list of (stack as frame indexes, weight in seconds)
+        self.samples: Dict[str, List[Tuple[List[int], float]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _frame_index(self, code) -> int:
+        key = (
+            getattr(code, "co_qualname", code.co_name),
+            code.co_filename,
+            code.co_firstlineno,
+        )
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_index(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                name = names.get(ident, str(ident))
+                self.samples.setdefault(name, []).append((stack, weight))
+
+    def speedscope(self, name: str) -> Dict:
+        """Return the samples in speedscope's file format."""
+        frames = sorted(self.frames, key=self.frames.get)
+        profiles = []
+        for thread, samples in self.samples.items():
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": thread,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(w for _, w in samples),
+                    "samples": [stack for stack, _ in samples],
+                    "weights": [w for _, w in samples],
+                }
+            )
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "otomoto_scraper",
+            "shared": {
+                "frames": [
+                    {"name": f, "file": path, "line": line} for f, path, line in frames
+                ]
+            },
+            "profiles": profiles,
+        }
+
+    def hotspots(self, top: int = 20) -> List[Tuple[Frame, float, float]]:
+        """Return the `top` functions by self time with their self and
+        total (inclusive) seconds, over all threads."""
+        frames = sorted(self.frames, key=self.frames.get)
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for samples in self.samples.values():
+            for stack, weight in samples:
+                if stack:
+                    own[stack[-1]] += weight
+                for index in set(stack):
+                    total[index] += weight
+        return [(frames[i], seconds, total[i]) for i, seconds in own.most_common(top)]
+
+
+class Profiler:
+    """Profile everything between :meth:`start` and :meth:`stop`.
+
+    Files are named ``<name>.prof``, ``<name>.speedscope.json`` and
+    ``<name>.tracemalloc`` in ``<folder>/profiles``; `name` defaults to a
+    timestamp.
+    """
+
+    def __init__(
+        self,
+        folder: str = "data",
+        mode: Optional[str] = "cprofile",
+        memory: bool = False,
+        top: int = 20,
+        interval: float = 0.005,
+        name: Optional[str] = None,
+    ):
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(
+                f"unknown profile mode {mode!r}, expected one of {PROFILE_MODES}"
+            )
+        self.folder = folder
+        self.mode = mode
+        self.memory = memory
+        self.top = top
+        self.name = name or time.strftime(NAME_FORMAT)
+        self._cprofile = cProfile.Profile() if mode == "cprofile" else None
+        self._sampler = SamplingProfiler(interval) if mode == "sampling" else None
+        self._started = 0.0
+
+    def start(self) -> None:
+        if self.memory:
+            tracemalloc.start(10)
+        self._started = time.perf_counter()
+        if self._sampler is not None:
+            self._sampler.start()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop(self) -> Dict[str, Path]:
+        """Stop profiling, write the results, print the hotspots and return
+        the written files by kind."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        elapsed = time.perf_counter() - self._started
+        snapshot = None
+        if self.memory:
+            # leave out the sampler's own bookkeeping
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, __file__)]
+            )
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        out = resolve_data_folder(str(Path(self.folder) / "profiles"))
+        written: Dict[str, Path] = {}
+        print(f"[profile] {self.name}: {elapsed:.2f}s")
+        if self._cprofile is not None:
+            path = written["cprofile"] = out / f"{self.name}.prof"
+            self._cprofile.dump_stats(str(path))
+            stream = io.StringIO()
+            stats = pstats.Stats(self._cprofile, stream=stream)
+            stats.sort_stats("tottime").print_stats(self.top)
+            print(f"[profile] Top {self.top} functions by own time ({path}):")
+            print(stream.getvalue().strip("\n"))
+        if self._sampler is not None:
+            path = written["sampling"] = out / f"{self.name}.speedscope.json"
+            with path.open("w", encoding="utf-8") as f:
+                json.dump(self._sampler.speedscope(self.name), f)
+            print(f"[profile] Top {self.top} sampled functions by own time ({path}):")
+            print(f"  {'own s':>8} {'total s':>8}  function")
+            for (func, file, line), own, total in self._sampler.hotspots(self.top):
+                print(f"  {own:8.3f} {total:8.3f}  {func} ({file}:{line})")
+        if snapshot is not None:
+            path = written["memory"] = out / f"{self.name}.tracemalloc"
+            snapshot.dump(str(path))
+            print(
+                f"[profile] Peak traced memory {peak / 1024:.0f} KiB; "
+                f"top {self.top} allocation sites ({path}):"
+            )
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                print(f"  {stat}")
+        return written
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def make_profiler(
+    mode: Optional[str] = None,
+    memory: bool = False,
+    page: Optional[int] = None,
+    top: int = 20,
+    folder: str = "data",
+) -> Optional[Profiler]:
+    """Return a :class:`Profiler` for the given options, or None if they
+    ask for no profiling. Profiles of a single `page` are named after it."""
+    if mode is None and not memory:
+        return None
+    name = time.strftime(NAME_FORMAT) + (f"-page{page}" if page else "")
+    return Profiler(folder=folder, mode=mode, memory=memory, top=top, name=name)
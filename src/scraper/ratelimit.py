@@ -0,0 +1,158 @@
+"""Rate limiting helpers used by the concurrent crawler.
+
+A :class:`TokenBucket` paces requests to a single host and
+:class:`HostRateLimiter` keeps one bucket per host so several crawler
+threads can share a single request budget. :class:`AdaptiveRateLimiter`
+adjusts the rate per host from the server's throttling responses.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second.
+
+    `capacity` is the largest burst allowed after an idle period. A
+    `rate` of ``None`` disables limiting entirely.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rate:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available.
+
+        Returns 0.0 on success, otherwise the number of seconds to wait
+        before a token becomes available.
+        """
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill(time.monotonic())
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def set_rate(self, rate: Optional[float]) -> None:
+        """Change the refill rate, keeping the tokens earned so far."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Keep an independent :class:`TokenBucket` for every host."""
+
+    def __init__(self, rate: Optional[float], burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        """Return the bucket for `host`, creating it on first use."""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> None:
+        """Block until a request to the host of `url` is allowed."""
+        self.bucket(urlsplit(url).netloc).acquire()
+
+
+class AdaptiveRateLimiter:
+    """Per-host request rate found by additive increase / multiplicative
+    decrease (AIMD), like TCP congestion control.
+
+    Hosts start unthrottled. The first throttling response (e.g. 429)
+    sets the rate to `decrease` times the rate observed over the last
+    requests; later ones multiply the current rate by `decrease`. Every
+    successful request adds `increase` requests per second, up to
+    `max_rate`, after which the host is unthrottled again.
+    """
+
+    def __init__(
+        self,
+        min_rate: float = 0.2,
+        max_rate: float = 20.0,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+        window: int = 20,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._recent: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url: str) -> str:
+        return urlsplit(url).netloc
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(None)
+                self._recent[host] = deque(maxlen=self.window)
+            return bucket
+
+    def rate(self, url: str) -> Optional[float]:
+        """Current request rate allowed for the host of `url` (None = any)."""
+        return self.bucket(self._host(url)).rate
+
+    def acquire(self, url: str) -> None:
+        """Block until a request to the host of `url` is allowed."""
+        host = self._host(url)
+        self.bucket(host).acquire()
+        with self._lock:
+            self._recent[host].append(time.monotonic())
+
+    def on_success(self, url: str) -> None:
+        bucket = self.bucket(self._host(url))
+        with self._lock:
+            if bucket.rate is not None:
+                rate = bucket.rate + self.increase
+                bucket.set_rate(None if rate >= self.max_rate else rate)
+
+    def on_throttle(self, url: str) -> None:
+        host = self._host(url)
+        bucket = self.bucket(host)
+        with self._lock:
+            current = bucket.rate
+            if current is None:
+                recent = self._recent[host]
+                span = recent[-1] - recent[0] if len(recent) > 1 else 0.0
+                current = (len(recent) - 1) / span if span > 0 else self.max_rate
+            bucket.set_rate(
+                max(self.min_rate, min(self.max_rate, current) * self.decrease)
+            )
+            print(f"[ratelimit] {host} throttled, slowing to {bucket.rate:.2f} req/s")
@@ -0,0 +1,303 @@
+"""Flag relisted and near-duplicate offers with MinHash/LSH.
+
+Sellers often relist a car under a new offer id, so id-based dedupe counts
+it twice. :class:`RelistIndex` remembers every offer it has seen by a
+MinHash signature of its shingles: words and word pairs of the brand and
+model (the listing title), bucketed year, mileage, engine capacity and
+power, fuel type and location words. The signature is cut into `BANDS`
+bands of `ROWS` values; offers sharing any band are candidates, so a new
+offer is compared with a handful of similar offers instead of all of
+them. A candidate is reported when the shingle sets' Jaccard similarity
+reaches `threshold` and the hard facts agree (same brand and year,
+mileage not lower than before, same engine within a tolerance).
+
+Matches against an offer already seen in the same run are reported as
+``"duplicate"`` (two live listings of one car), others as ``"relist"``.
+The index is kept in ``relist_index.json`` next to the offer index, with
+offers not seen for `max_age_days` dropped when it is loaded. The crawler
+uses it with ``detect_relists=True`` (``SCRAPER_DETECT_RELISTS=1``): new
+offers are observed and the matches appended to ``relists.jsonl``, offers
+seen again are re-added so they stay in the index while listed. Without
+an index file, :class:`LocalJSONLStorage` seeds it from the stored offers.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from .storage import utc_now
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_MAX_AGE_DAYS = 60
+
+# fields kept per offer to verify candidates and report matches
+FIELDS = (
+    "car_brand",
+    "model",
+    "year",
+    "mileage_km",
+    "engine_capacity",
+    "engine_power",
+    "fuel_type",
+    "location",
+    "price",
+    "url",
+)
+# numeric fields and the bucket width they are shingled with
+BUCKETS = (
+    ("year", 1),
+    ("mileage_km", 10000),
+    ("engine_capacity", 100),
+    ("engine_power", 10),
+)
+# a relisted car may have been driven a little since
+MILEAGE_TOLERANCE = (-1000, 20000)
+CAPACITY_TOLERANCE = 50
+POWER_TOLERANCE = 5
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(2024)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE))
+    for _ in range(NUM_PERM)
+]
+_WORD = re.compile(r"\w+")
+
+DUPLICATE = "duplicate"
+RELIST = "relist"
+
+
+def _words(text) -> List[str]:
+    return _WORD.findall(str(text).lower()) if text else []
+
+
+def offer_shingles(offer: Dict) -> FrozenSet[str]:
+    """Return the shingle set of `offer` used for similarity."""
+    shingles: Set[str] = set()
+    title = _words(offer.get("car_brand")) + _words(offer.get("model"))
+    shingles.update(f"w:{w}" for w in title)
+    shingles.update(f"p:{a} {b}" for a, b in zip(title, title[1:]))
+    for field, width in BUCKETS:
+        value = offer.get(field)
+        if value is not None:
+            shingles.add(f"{field}:{int(float(value) // width)}")
+    shingles.update(f"f:{w}" for w in _words(offer.get("fuel_type")))
+    shingles.update(f"l:{w}" for w in _words(offer.get("location")))
+    return frozenset(shingles)
+
+
+def minhash(shingles: FrozenSet[str]) -> List[int]:
+    """Return the `NUM_PERM`-value MinHash signature of `shingles`."""
+    hashed = [
+        int.from_bytes(
+            hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little"
+        )
+        for s in shingles
+    ] or [0]
+    return [min((a * x + b) % _MERSENNE for x in hashed) for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature: List[int]) -> List[int]:
+    """Hash each band of `signature` to one integer LSH bucket key."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS : (band + 1) * ROWS]
+        digest = zlib.crc32(struct.pack(f"<{ROWS}Q", *rows))
+        keys.append(band << 32 | digest)
+    return keys
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _within(new, old, low: float, high: float) -> bool:
+    if new is None or old is None:
+        return True
+    return low <= float(new) - float(old) <= high
+
+
+def plausible_relist(new: Dict, old: Dict) -> bool:
+    """Check the facts a relisted car cannot change."""
+    for field in ("car_brand", "year"):
+        if new.get(field) is not None and old.get(field) is not None:
+            if str(new[field]).lower() != str(old[field]).lower():
+                return False
+    return (
+        _within(new.get("mileage_km"), old.get("mileage_km"), *MILEAGE_TOLERANCE)
+        and _within(
+            new.get("engine_capacity"),
+            old.get("engine_capacity"),
+            -CAPACITY_TOLERANCE,
+            CAPACITY_TOLERANCE,
+        )
+        and _within(
+            new.get("engine_power"),
+            old.get("engine_power"),
+            -POWER_TOLERANCE,
+            POWER_TOLERANCE,
+        )
+    )
+
+
+class RelistIndex:
+    """Persistent LSH index of offers, keyed by offer id."""
+
+    def __init__(
+        self,
+        path: Path,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS,
+    ):
+        self.path = Path(path)
+        self.threshold = threshold
+        self._entries: Dict[str, Dict] = {}
+        self._buckets: Dict[int, List[str]] = {}
+        self._seen_now: Set[str] = set()
+        self._dirty = False
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                entries = json.load(f)
+            cutoff = None
+            if max_age_days is not None:
+                cutoff = (
+                    datetime.now(timezone.utc) - timedelta(days=max_age_days)
+                ).isoformat(timespec="seconds")
+            for offer_id, entry in entries.items():
+                if cutoff is not None and entry["last_seen"] < cutoff:
+                    self._dirty = True
+                    continue
+                self._insert(offer_id, entry)
+
+    @classmethod
+    def from_records(
+        cls, path: Path, offers: Iterable[Dict], **kwargs
+    ) -> "RelistIndex":
+        """Create an index at `path` from stored `offers`; later ones win."""
+        index = cls(path, **kwargs)
+        seen_at = utc_now()
+        for offer in offers:
+            if offer.get("id"):
+                index.add(offer, seen_at=seen_at)
+        # stored offers were seen by earlier runs, not this one
+        index._seen_now.clear()
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, offer_id: str) -> bool:
+        return offer_id in self._entries
+
+    def _insert(self, offer_id: str, entry: Dict) -> None:
+        self._entries[offer_id] = entry
+        for key in entry["bands"]:
+            self._buckets.setdefault(key, []).append(offer_id)
+
+    def _remove(self, offer_id: str) -> None:
+        entry = self._entries.pop(offer_id)
+        for key in entry["bands"]:
+            bucket = self._buckets[key]
+            bucket.remove(offer_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def _signature(self, offer: Dict):
+        shingles = offer_shingles(offer)
+        return shingles, band_keys(minhash(shingles))
+
+    def _match(self, offer: Dict, shingles, bands) -> Optional[Dict]:
+        offer_id = str(offer.get("id"))
+        candidates = set()
+        for key in bands:
+            candidates.update(self._buckets.get(key, ()))
+        candidates.discard(offer_id)
+        best = None
+        for candidate in candidates:
+            entry = self._entries[candidate]
+            if not plausible_relist(offer, entry["fields"]):
+                continue
+            similarity = jaccard(shingles, offer_shingles(entry["fields"]))
+            if similarity < self.threshold:
+                continue
+            # ties go to the most recently seen offer
+            rank = (similarity, entry["last_seen"], candidate)
+            if best is None or rank > best:
+                best = rank
+        if best is None:
+            return None
+        similarity, _, candidate = best
+        return {
+            "id": candidate,
+            "similarity": round(similarity, 3),
+            **self._entries[candidate],
+        }
+
+    def _add(self, offer: Dict, bands, seen_at: Optional[str]) -> None:
+        offer_id = str(offer.get("id"))
+        if offer_id in self._entries:
+            self._remove(offer_id)
+        fields = {f: offer.get(f) for f in FIELDS if offer.get(f) is not None}
+        entry = {"fields": fields, "bands": bands, "last_seen": seen_at or utc_now()}
+        self._insert(offer_id, entry)
+        self._seen_now.add(offer_id)
+        self._dirty = True
+
+    def match(self, offer: Dict) -> Optional[Dict]:
+        """Return the most similar other indexed offer as ``{"id",
+        "similarity", "fields", "last_seen"}``, or None if there is none
+        above the threshold."""
+        return self._match(offer, *self._signature(offer))
+
+    def add(self, offer: Dict, seen_at: Optional[str] = None) -> None:
+        """Index `offer` (replacing an older version with the same id)."""
+        self._add(offer, self._signature(offer)[1], seen_at)
+
+    def observe(self, offer: Dict, seen_at: Optional[str] = None) -> Optional[Dict]:
+        """Index `offer` and return a relist event if it looks like an
+        offer seen before under another id."""
+        seen_at = seen_at or utc_now()
+        shingles, bands = self._signature(offer)
+        known = str(offer.get("id")) in self._entries
+        match = None if known else self._match(offer, shingles, bands)
+        self._add(offer, bands, seen_at)
+        if match is None:
+            return None
+        fields = match["fields"]
+        return {
+            "id": str(offer.get("id")),
+            "relist_of": match["id"],
+            "kind": DUPLICATE if match["id"] in self._seen_now else RELIST,
+            "similarity": match["similarity"],
+            "seen_at": seen_at,
+            "previous_seen_at": match["last_seen"],
+            "url": offer.get("url"),
+            "previous_url": fields.get("url"),
+            "price": offer.get("price"),
+            "previous_price": fields.get("price"),
+        }
+
+    def save(self) -> bool:
+        """Write the index to disk (atomically) if it changed; return
+        whether it was written."""
+        if not self._dirty:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = False
+        return True
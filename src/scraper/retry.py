@@ -0,0 +1,173 @@
+"""Retry and failure handling for :class:`src.scraper.fetcher.Fetcher`.
+
+:class:`RetryPolicy` decides whether a failed attempt is worth repeating
+and how long to wait first: exponential backoff with full jitter, or the
+server's ``Retry-After`` when it sends one. :class:`CircuitBreaker` stops
+all requests for a cool-down period after a run of consecutive failures,
+so a crawl pauses while the site is unhappy instead of burning its
+retries and giving up.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional
+
+
+def parse_retry_after(
+    value: Optional[str], now: Optional[float] = None
+) -> Optional[float]:
+    """Return the delay in seconds asked for by a ``Retry-After`` header.
+
+    Both forms are accepted: a number of seconds and an HTTP date.
+    Returns None for a missing or unparsable header.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for failed fetch attempts.
+
+    Attempt `n` (1-based) waits a random time between 0 and
+    ``min(cap, base * 2 ** (n - 1))`` seconds. A ``Retry-After`` from the
+    server takes precedence when it is longer, up to `max_retry_after`.
+    Network errors and the statuses in `retry_statuses` are retried; other
+    HTTP errors (e.g. 404) fail immediately.
+    """
+
+    def __init__(
+        self,
+        tries: int = 3,
+        base: float = 0.5,
+        cap: float = 30.0,
+        max_retry_after: float = 120.0,
+        retry_statuses: Iterable[int] = (403, 408, 429, 500, 502, 503, 504),
+        rng: Optional[random.Random] = None,
+    ):
+        self.tries = tries
+        self.base = base
+        self.cap = cap
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = frozenset(retry_statuses)
+        self._random = rng or random.Random()
+
+    def should_retry(self, attempt: int, status: Optional[int] = None) -> bool:
+        """Return True if attempt `attempt` failing with `status` (None
+        for a network error) should be followed by another one."""
+        if attempt >= self.tries:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait after failed attempt `attempt`."""
+        backoff = self._random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.max_retry_after))
+        return backoff
+
+
+class CircuitOpenError(RuntimeError):
+    """The breaker stays open longer than a caller is willing to wait."""
+
+
+class CircuitBreaker:
+    """Pause all requests after `failure_threshold` consecutive failures.
+
+    Once open, callers of :meth:`wait` block until `cooldown` seconds have
+    passed; then a single trial request is let through (half-open). A
+    success closes the breaker, a failure opens it again with twice the
+    cool-down, up to `max_cooldown`. The default threshold equals
+    :class:`RetryPolicy`'s default tries, so one page failing on every
+    attempt opens the breaker before its fetch gives up.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._open_until = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def wait(self, timeout: Optional[float] = None) -> float:
+        """Block while the breaker is open; return the seconds paused.
+
+        Raises :class:`CircuitOpenError` right away, without sleeping,
+        when the breaker would stay open for more than `timeout` seconds
+        in total.
+        """
+        started = time.monotonic()
+        announced = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.state == self.CLOSED:
+                    return now - started if announced else 0.0
+                if self.state == self.OPEN and now >= self._open_until:
+                    self.state = self.HALF_OPEN
+                if self.state == self.HALF_OPEN and not self._trial_running:
+                    self._trial_running = True
+                    return now - started if announced else 0.0
+                pause = max(self._open_until - now, 0.05)
+            if timeout is not None and now - started + pause > timeout:
+                raise CircuitOpenError(
+                    f"circuit open for another {pause:.1f}s, over the "
+                    f"{timeout:.1f}s wait budget"
+                )
+            if not announced:
+                print(f"[breaker] Circuit open, pausing requests for {pause:.1f}s")
+                announced = True
+            time.sleep(pause)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._trial_running = False
+
+    def record_neutral(self) -> None:
+        """Note an answer that says nothing about the site's health (e.g.
+        a 404): the state is kept, but a trial request is over."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened += 1
+        self._trial_running = False
+        self._open_until = time.monotonic() + self.cooldown
@@ -0,0 +1,361 @@
+"""S3 storage backend streaming offers into multipart uploads.
+
+Every run writes one object per dataset::
+
+    s3://<bucket>/<prefix>/<dataset>/run-<UTC timestamp>-<run id>.jsonl.gz
+    s3://<bucket>/<prefix>/<dataset>/run-<UTC timestamp>-<run id>.manifest.json
+
+Offers are serialized and compressed as they are saved; every time
+`part_size` compressed bytes have built up they are sent as the next part
+of a multipart upload, so memory use is bounded by one part per dataset
+and nothing is written to ``/tmp``. :meth:`S3Storage.close` uploads the
+last part, completes the object and writes its manifest (row count,
+parts, size and SHA-256 of the object); :func:`iter_s3_offers` streams
+the completed runs back.
+
+Change events go to an ``offer_changes`` object of their own. The offer
+index is kept next to the data (``<prefix>/offer_index.json``), so
+incremental crawls also work from a fresh Lambda container; so are the
+relist index (``<prefix>/relist_index.json``) and the crawl schedule
+(``<prefix>/schedule.json``).
+
+Needs ``boto3``; zstd compression needs the optional ``zstandard``
+package.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import uuid
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from .storage import (
+    OfferIndex,
+    OfferStorage,
+    dataset_name,
+    jsonl_bytes,
+    resolve_data_folder,
+    utc_now,
+)
+
+if TYPE_CHECKING:
+    from .relists import RelistIndex
+
+# S3 rejects multipart uploads whose parts (but the last) are smaller
+MIN_PART_SIZE = 5 * 1024 * 1024
+EXTENSIONS = {None: ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def _compressor(compression: Optional[str]):
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+    if compression == "zstd":
+        from .segments import _zstandard
+
+        return _zstandard().ZstdCompressor(level=3).compressobj()
+    if compression is None:
+        return None
+    raise ValueError(
+        f"Unknown compression {compression!r}; expected gzip, zstd or None"
+    )
+
+
+class S3MultipartWriter:
+    """Stream compressed JSONL records into one S3 object.
+
+    The multipart upload is started by the first :meth:`write`; at most
+    `part_size` compressed bytes (plus one batch) are held in memory.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        key: str,
+        compression: Optional[str] = "gzip",
+        part_size: int = 8 * 1024 * 1024,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.compression = compression
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.rows = 0
+        self.size = 0
+        self.parts: List[Dict] = []
+        self._compress = _compressor(compression)
+        self._sha256 = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._upload_id: Optional[str] = None
+
+    def write(self, records: List[Dict]) -> None:
+        data = jsonl_bytes(records)
+        if self._compress is not None:
+            data = self._compress.compress(data)
+        self._buffer.write(data)
+        self.rows += len(records)
+        if self._buffer.tell() >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self) -> None:
+        body = self._buffer.getvalue()
+        self._buffer = io.BytesIO()
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )["UploadId"]
+        number = len(self.parts) + 1
+        resp = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self._sha256.update(body)
+        self.size += len(body)
+        self.parts.append(
+            {"PartNumber": number, "ETag": resp["ETag"], "bytes": len(body)}
+        )
+        print(
+            f"[s3] Uploaded part {number} of s3://{self.bucket}/{self.key} ({len(body)} bytes)"
+        )
+
+    def close(self) -> Optional[Dict]:
+        """Upload the last part and complete the object.
+
+        Returns the object's manifest entry, or None if nothing was
+        written. A failed upload is aborted so no parts are left behind.
+        """
+        if self.rows == 0:
+            return None
+        if self._compress is not None:
+            self._buffer.write(self._compress.flush())
+        try:
+            self._upload_part()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": p["PartNumber"], "ETag": p["ETag"]}
+                        for p in self.parts
+                    ]
+                },
+            )
+        except Exception:
+            self.abort()
+            raise
+        return {
+            "key": self.key,
+            "rows": self.rows,
+            "bytes": self.size,
+            "sha256": self._sha256.hexdigest(),
+            "parts": [
+                {"number": p["PartNumber"], "bytes": p["bytes"]} for p in self.parts
+            ],
+        }
+
+    def abort(self) -> None:
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+            self._upload_id = None
+
+
+class S3Storage(OfferStorage):
+    """Stream offers to S3, one multipart object per dataset and run.
+
+    `folder` is a local scratch folder for the offer index only; the index
+    is loaded from ``<prefix>/offer_index.json`` and uploaded there again
+    by :meth:`close`, once the run's objects are complete.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "otomoto",
+        folder: str = "data",
+        compression: Optional[str] = "gzip",
+        part_size: int = 8 * 1024 * 1024,
+        client=None,
+        index_filename: str = "offer_index.json",
+        changes_filename: str = "offer_changes.jsonl",
+    ):
+        if not bucket:
+            raise ValueError("S3Storage needs a bucket (set S3_BUCKET)")
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3")
+        _compressor(compression)  # reject unknown compressions early
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.folder = resolve_data_folder(folder)
+        self.compression = compression
+        self.part_size = part_size
+        self.index_filename = index_filename
+        self.changes_filename = changes_filename
+        self._index = None
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        self.run_id = f"run-{stamp}-{uuid.uuid4().hex[:8]}"
+        self.created_at = utc_now()
+        self._writers: Dict[str, S3MultipartWriter] = {}
+        self.manifests: Dict[str, Dict] = {}
+        # index files saved locally but not uploaded yet
+        self._unsent: Dict[str, Path] = {}
+
+    def _key(self, *parts: str) -> str:
+        return "/".join(p for p in (self.prefix, *parts) if p)
+
+    def _writer(self, name: str) -> S3MultipartWriter:
+        writer = self._writers.get(name)
+        if writer is None:
+            key = self._key(name, self.run_id + EXTENSIONS[self.compression])
+            writer = self._writers[name] = S3MultipartWriter(
+                self.client, self.bucket, key, self.compression, self.part_size
+            )
+        return writer
+
+    def save(self, offers: List[Dict], filename: str = "all_offers.jsonl") -> str:
+        """Stream `offers` into this run's object and return its URI."""
+        writer = self._writer(dataset_name(filename))
+        writer.write(offers)
+        return f"s3://{self.bucket}/{writer.key}"
+
+    def save_changes(self, events: List[Dict]) -> str:
+        return self.save(events, filename=self.changes_filename)
+
+    def save_relists(self, events: List[Dict]) -> str:
+        return self.save(events, filename=self.relists_filename)
+
+    def _download(self, filename: str, path: Path) -> None:
+        """Fetch ``<prefix>/<filename>`` to `path`, if it exists in S3."""
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.download_file(self.bucket, self._key(filename), str(path))
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            # nothing stored yet: start empty rather than from a stale local copy
+            if path.exists():
+                path.unlink()
+
+    def _load_index(self, path: Path) -> OfferIndex:
+        """Fetch the index from S3 into the scratch folder, if there is one."""
+        self._download(self.index_filename, path)
+        return OfferIndex(path)
+
+    def _load_relists(self, path: Path) -> "RelistIndex":
+        from .relists import RelistIndex
+
+        self._download(self.relist_index_filename, path)
+        return RelistIndex(path)
+
+    def state_path(self, filename: str) -> Path:
+        """Fetch state file ``<prefix>/<filename>`` into the scratch folder."""
+        path = self.folder / filename
+        self._download(filename, path)
+        return path
+
+    def save_state(self, filename: str) -> None:
+        """Upload the state file with the indexes, in :meth:`close`."""
+        self._unsent[filename] = self.folder / filename
+
+    def flush(self) -> None:
+        """Save the offer and relist indexes to the scratch folder.
+
+        Offers already go out part by part, but objects are only completed
+        by :meth:`close`, which uploads the indexes afterwards: an index
+        listing offers of an aborted object would make later runs skip
+        them for good.
+        """
+        for index, filename in (
+            (self._index, self.index_filename),
+            (self._relists, self.relist_index_filename),
+        ):
+            if index is not None and index.save():
+                self._unsent[filename] = index.path
+
+    def close(self) -> None:
+        """Complete every object of this run, write its manifest, then
+        upload the indexes."""
+        self.flush()
+        for name, writer in self._writers.items():
+            entry = writer.close()
+            if entry is None:
+                continue
+            manifest = {
+                "run": self.run_id,
+                "dataset": name,
+                "created_at": self.created_at,
+                "closed_at": utc_now(),
+                "compression": self.compression,
+                **entry,
+            }
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self._key(name, self.run_id + ".manifest.json"),
+                Body=json.dumps(manifest, indent=1).encode("utf-8"),
+                ContentType="application/json",
+            )
+            self.manifests[name] = manifest
+            print(
+                f"[s3] Wrote {entry['rows']} rows to s3://{self.bucket}/{entry['key']}"
+            )
+        self._writers.clear()
+        for filename, path in self._unsent.items():
+            self.client.upload_file(str(path), self.bucket, self._key(filename))
+        self._unsent.clear()
+
+
+def iter_s3_offers(
+    bucket: str,
+    prefix: str = "otomoto",
+    name: str = "all_offers",
+    client=None,
+) -> Iterator[Dict]:
+    """Stream the records of every completed run of dataset `name`.
+
+    Runs are read oldest first, as listed by their manifests; objects are
+    decompressed line by line while they download.
+    """
+    if client is None:
+        import boto3
+
+        client = boto3.client("s3")
+    base = "/".join(p for p in (prefix.strip("/"), name) if p) + "/"
+    manifests = []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=base):
+        manifests.extend(
+            o["Key"]
+            for o in page.get("Contents", [])
+            if o["Key"].endswith(".manifest.json")
+        )
+    for manifest_key in sorted(manifests):
+        manifest = json.loads(
+            client.get_object(Bucket=bucket, Key=manifest_key)["Body"].read()
+        )
+        body = client.get_object(Bucket=bucket, Key=manifest["key"])["Body"]
+        if manifest["compression"] == "gzip":
+            stream = gzip.GzipFile(fileobj=body, mode="rb")
+        elif manifest["compression"] == "zstd":
+            from .segments import _zstandard
+
+            stream = io.BufferedReader(
+                _zstandard().ZstdDecompressor().stream_reader(body)
+            )
+        else:
+            stream = body.iter_lines(keepends=True)
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,236 @@
+"""Adaptive crawl scheduler for several search URLs.
+
+Every search gets its own revisit interval. After each crawl the number
+of new or changed offers found per crawl (its churn, smoothed with an
+exponential moving average) is compared with `target_yield`. Searches
+that yield more than that are revisited sooner, quiet ones later, within
+``[min_interval, max_interval]``. A run crawls only the searches that are
+due, most overdue and busiest first, and shares a fixed budget of page
+requests between them.
+
+The schedule is kept in ``schedule.json`` by the storage backend, next
+to the offer index the incremental crawls use, so with the S3 backend it
+survives between Lambda invocations. Run it with
+``python -m src.scraper.scheduler`` or the ``"schedule"`` Lambda mode.
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .crawler import scrape_pages
+from .storage import OfferStorage
+
+
+@dataclass
+class SearchState:
+    """Crawl history of one search URL."""
+
+    url: str
+    interval: float
+    next_due: float = 0.0
+    churn: Optional[float] = None
+    last_crawled: Optional[float] = None
+    crawls: int = 0
+    last_pages: int = 0
+    last_new: int = 0
+    last_changed: int = 0
+
+
+class CrawlScheduler:
+    """Decide which searches to crawl and how many pages each may use.
+
+    `alpha` is the weight of the latest crawl in the churn average and
+    `target_yield` the number of new or changed offers a crawl should find
+    for its interval to stay unchanged. Intervals move by at most a factor
+    of two per crawl.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        min_interval: float = 3600,
+        max_interval: float = 2 * 24 * 3600,
+        initial_interval: float = 6 * 3600,
+        alpha: float = 0.3,
+        target_yield: float = 10.0,
+    ):
+        self.path = Path(path)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.alpha = alpha
+        self.target_yield = target_yield
+        self.searches: Dict[str, SearchState] = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                self.searches = {
+                    url: SearchState(**state) for url, state in json.load(f).items()
+                }
+
+    def sync(self, urls: Sequence[str]) -> None:
+        """Track exactly `urls`; searches new to the schedule are due now."""
+        self.searches = {
+            url: self.searches.get(url) or SearchState(url, self.initial_interval)
+            for url in urls
+        }
+
+    def due(self, now: Optional[float] = None) -> List[SearchState]:
+        """Return the searches due at `now`, most urgent first.
+
+        Urgency is how far past its due time a search is, in units of its
+        own interval, plus its churn relative to `target_yield`; searches
+        never crawled come first.
+        """
+        now = time.time() if now is None else now
+
+        def urgency(s: SearchState) -> float:
+            if s.last_crawled is None:
+                return float("inf")
+            overdue = (now - s.next_due) / s.interval
+            return overdue + (s.churn or 0.0) / self.target_yield
+
+        ready = [s for s in self.searches.values() if s.next_due <= now]
+        return sorted(ready, key=urgency, reverse=True)
+
+    def plan(
+        self, budget: int, max_pages: int = 10, now: Optional[float] = None
+    ) -> List[Tuple[str, int]]:
+        """Split a budget of `budget` page requests between due searches.
+
+        Every due search gets at least one page while the budget lasts;
+        the rest is shared in proportion to churn, capped at `max_pages`.
+        """
+        due = self.due(now)[:budget]
+        if not due:
+            return []
+        pages = {s.url: 1 for s in due}
+        left = budget - len(due)
+        weights = {
+            s.url: (s.churn if s.churn is not None else self.target_yield) for s in due
+        }
+        total = sum(weights.values())
+        if left > 0 and total > 0:
+            for s in due:
+                extra = int(left * weights[s.url] / total)
+                pages[s.url] = min(max_pages, pages[s.url] + extra)
+        return [(s.url, pages[s.url]) for s in due]
+
+    def record(
+        self,
+        url: str,
+        pages: int,
+        new: int,
+        changed: int,
+        now: Optional[float] = None,
+    ) -> SearchState:
+        """Update the churn and interval of `url` after a crawl."""
+        now = time.time() if now is None else now
+        state = self.searches.setdefault(url, SearchState(url, self.initial_interval))
+        found = new + changed
+        if state.churn is None:
+            state.churn = float(found)
+        else:
+            state.churn = self.alpha * found + (1 - self.alpha) * state.churn
+        factor = self.target_yield / max(state.churn, 0.1)
+        factor = min(2.0, max(0.5, factor))
+        state.interval = min(
+            self.max_interval, max(self.min_interval, state.interval * factor)
+        )
+        state.last_crawled = now
+        state.next_due = now + state.interval
+        state.crawls += 1
+        state.last_pages, state.last_new, state.last_changed = pages, new, changed
+        return state
+
+    def save(self) -> None:
+        """Write the schedule to disk atomically."""
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({u: asdict(s) for u, s in self.searches.items()}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def run_scheduled(
+    urls: Sequence[str],
+    storage: OfferStorage,
+    budget: int = 20,
+    max_pages: int = 10,
+    delay: float = 1.0,
+    scheduler: Optional[CrawlScheduler] = None,
+    now: Optional[float] = None,
+) -> Dict[str, Dict[str, int]]:
+    """Crawl the due searches among `urls` within `budget` page requests.
+
+    Each search is crawled incrementally into `storage` and stops after
+    its first page without new or changed offers; pages it does not use
+    go back into the budget for the searches after it. Returns per-search
+    counts of pages, new and changed offers.
+
+    Without a `scheduler` the schedule is loaded from and saved back to
+    `storage` (see :meth:`OfferStorage.state_path`).
+    """
+    stored = scheduler is None
+    if scheduler is None:
+        scheduler = CrawlScheduler(storage.state_path(storage.schedule_filename))
+    scheduler.sync(urls)
+    report: Dict[str, Dict[str, int]] = {}
+    left = budget
+    plan = scheduler.plan(budget, max_pages=max_pages, now=now)
+    for i, (url, pages) in enumerate(plan):
+        if left <= 0:
+            break
+        # pages left unused by earlier searches go to this one
+        later = sum(p for _, p in plan[i + 1 :])
+        pages = max(1, min(max_pages, left - later))
+        counts = {"pages": 0, "new": 0, "changed": 0}
+
+        def on_page(page: int, new: int, changed: int) -> None:
+            counts["pages"] += 1
+            counts["new"] += new
+            counts["changed"] += changed
+
+        scrape_pages(
+            base_url=url,
+            max_pages=pages,
+            delay=delay,
+            stop_on_empty=True,
+            incremental=True,
+            stop_after_unchanged=1,
+            storage=storage,
+            on_page=on_page,
+        )
+        left -= max(1, counts["pages"])
+        report[url] = counts
+        if not counts["pages"]:
+            # fetch failed: keep the search due instead of learning from it
+            print(f"[schedule] {url}: no page fetched, retrying next run")
+            continue
+        state = scheduler.record(
+            url, counts["pages"], counts["new"], counts["changed"], now=now
+        )
+        print(
+            f"[schedule] {url}: {counts['pages']} pages, {counts['new']} new, "
+            f"{counts['changed']} changed; next visit in {state.interval / 3600:.1f} h"
+        )
+    scheduler.save()
+    if stored:
+        storage.save_state(storage.schedule_filename)
+    return report
+
+
+def main() -> None:
+    """Run one scheduled crawl of ``OTOMOTO_URLS`` into the configured storage."""
+    from .config import CRAWL_BUDGET_PAGES, SEARCH_URLS, STORAGE_BACKEND
+    from .storage import create_storage
+
+    with create_storage(STORAGE_BACKEND, folder="data") as storage:
+        report = run_scheduled(SEARCH_URLS, storage, budget=CRAWL_BUDGET_PAGES)
+    print(f"Crawled {len(report)} of {len(SEARCH_URLS)} searches.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,530 @@
+"""Indexed search over the offers stored by :class:`LocalJSONLStorage`.
+
+:class:`OfferSearch` keeps the stored offers in memory with secondary
+indexes:
+
+- sorted ``(value, offer)`` arrays for ``year``, ``price``,
+  ``mileage_km`` and ``engine_power``, answering range queries with two
+  binary searches;
+- inverted indexes from normalized tokens (lowercase, without Polish
+  diacritics) to offers for ``car_brand``, ``fuel_type``, the words of
+  ``car_brand`` + ``model`` and the words of ``location``.
+
+A query starts from its most selective condition and checks the others
+on that candidate set; results are sorted and paginated::
+
+    python -m src.scraper.search --brand bmw --model "seria 5" \\
+        --year-min 2015 --mileage-max 200000 --fuel diesel \\
+        --location warszawa --sort price --page 1
+
+Indexes are updated incrementally: :meth:`OfferSearch.refresh` (called
+by every search) reads only what was appended to ``<name>.jsonl`` since
+the last refresh, from the remembered byte offset, and the segments
+sealed since then. A file that was replaced or truncated (e.g. by
+:mod:`src.scraper.compaction`) is indexed again from scratch. An offer
+id stored more than once is found with its latest record, and the price
+and mileage changes incremental crawls log to ``offer_changes.jsonl``
+are applied to it, so range filters see current values.
+
+:meth:`OfferSearch.save` writes the indexes, with the byte offsets and
+the set of segments they cover, to ``<name>_search_index.json``; a new
+:class:`OfferSearch` starts from there and reads only what was stored
+since. The command line saves after every search, so repeated queries
+do not index the whole dataset again. Searching never creates the data
+folder.
+"""
+
+import argparse
+import bisect
+import json
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic_core import from_json
+
+from .segments import _open_segment, iter_manifest_segments
+from .storage import apply_change, data_folder
+
+RANGE_FIELDS = ("year", "price", "mileage_km", "engine_power")
+SORT_FIELDS = RANGE_FIELDS + ("id",)
+# query keyword -> (inverted index, offer fields whose tokens it holds)
+TOKEN_FIELDS = {
+    "brand": ("car_brand",),
+    "model": ("car_brand", "model"),
+    "fuel_type": ("fuel_type",),
+    "location": ("location",),
+}
+DEFAULT_PAGE_SIZE = 20
+# bump when the layout of the saved indexes changes
+INDEX_VERSION = 1
+
+_WORD = re.compile(r"\w+")
+Range = Tuple[Optional[float], Optional[float]]
+
+
+@lru_cache(maxsize=65536)
+def _tokens(text: str) -> Tuple[str, ...]:
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text.replace("ł", "l"))
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return tuple(_WORD.findall(text))
+
+
+def tokens(text) -> Tuple[str, ...]:
+    """Lowercase words of `text` without diacritics (``Łódź`` -> ``lodz``)."""
+    # brands, models and locations repeat a lot, hence the cache
+    return _tokens(str(text)) if text else ()
+
+
+class _SortedIndex:
+    """Offer numbers sorted by one numeric field.
+
+    Added entries are buffered and merged into the sorted arrays on the
+    next query; sorting an already sorted array plus a sorted tail is a
+    single linear merge for Timsort.
+    """
+
+    def __init__(self):
+        self.keys: List[float] = []
+        self.docs: List[int] = []
+        self._pending_keys: List[float] = []
+        self._pending_docs: List[int] = []
+
+    def add(self, value, doc: int) -> None:
+        if value is not None:
+            self._pending_keys.append(float(value))
+            self._pending_docs.append(doc)
+
+    def _merge(self) -> None:
+        if not self._pending_keys:
+            return
+        tail = sorted(
+            range(len(self._pending_keys)), key=self._pending_keys.__getitem__
+        )
+        keys = self.keys + [self._pending_keys[i] for i in tail]
+        docs = self.docs + [self._pending_docs[i] for i in tail]
+        # stable, so equal keys stay in the order they were added
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.docs = [docs[i] for i in order]
+        self._pending_keys, self._pending_docs = [], []
+
+    def _bounds(self, low, high) -> Tuple[int, int]:
+        self._merge()
+        start = 0 if low is None else bisect.bisect_left(self.keys, low)
+        stop = len(self.keys) if high is None else bisect.bisect_right(self.keys, high)
+        return start, stop
+
+    def count(self, low, high) -> int:
+        start, stop = self._bounds(low, high)
+        return max(stop - start, 0)
+
+    def range(self, low, high) -> List[int]:
+        start, stop = self._bounds(low, high)
+        return self.docs[start:stop]
+
+    def ordered(self, reverse: bool = False) -> Iterable[int]:
+        self._merge()
+        return reversed(self.docs) if reverse else iter(self.docs)
+
+
+@dataclass
+class SearchResult:
+    """One page of matching offers and the total number of matches."""
+
+    total: int
+    offers: List[Dict] = field(default_factory=list)
+    page: int = 1
+    per_page: int = DEFAULT_PAGE_SIZE
+
+
+class OfferSearch:
+    """In-memory, incrementally refreshed index of one stored dataset.
+
+    Indexes saved by :meth:`save` are loaded on creation, unless a
+    segment they cover has since been removed.
+    """
+
+    def __init__(
+        self,
+        folder: str = "data",
+        name: str = "all_offers",
+        changes_filename: str = "offer_changes.jsonl",
+    ):
+        self.folder = data_folder(str(folder))
+        self.name = name
+        self.changes_filename = changes_filename
+        self.index_path = self.folder / f"{name}_search_index.json"
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self.docs: List[Dict] = []
+        self._by_id: Dict[str, int] = {}
+        self._live: Set[int] = set()
+        self._sorted = {f: _SortedIndex() for f in RANGE_FIELDS}
+        self._inverted: Dict[str, Dict[str, Set[int]]] = {k: {} for k in TOKEN_FIELDS}
+        self._token_targets = [
+            (name, self._inverted[key])
+            for key, fields in TOKEN_FIELDS.items()
+            for name in fields
+        ]
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._offset = 0
+        self._segments: Set[Path] = set()
+        self._changes_id: Optional[Tuple[int, int]] = None
+        self._changes_offset = 0
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def add(self, offer: Dict) -> None:
+        """Index one offer, replacing an earlier record with the same id."""
+        offer_id = str(offer.get("id"))
+        doc = len(self.docs)
+        self.docs.append(offer)
+        previous = self._by_id.get(offer_id)
+        if previous is not None:
+            self._live.discard(previous)
+        self._by_id[offer_id] = doc
+        self._live.add(doc)
+        self._dirty = True
+        for name, index in self._sorted.items():
+            index.add(offer.get(name), doc)
+        for name, inverted in self._token_targets:
+            for token in tokens(offer.get(name)):
+                inverted.setdefault(token, set()).add(doc)
+
+    def _add_lines(self, lines: Iterable[bytes]) -> int:
+        added = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                offer = from_json(line)
+            except ValueError:
+                continue
+            if isinstance(offer, dict):
+                self.add(offer)
+                added += 1
+        return added
+
+    def _apply_changes(self, lines: Iterable[bytes]) -> None:
+        for line in lines:
+            try:
+                event = from_json(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict) or not event.get("changes"):
+                continue
+            doc = self._by_id.get(str(event.get("id")))
+            if doc is not None:
+                self.add(apply_change(self.docs[doc], event))
+
+    @staticmethod
+    def _appended(
+        path: Path, file_id: Optional[Tuple[int, int]], offset: int
+    ) -> Optional[Tuple[Tuple[int, int], List[bytes], int]]:
+        """Return the id of `path`, the complete lines appended after
+        `offset` and the new offset; None if `path` is no longer the file
+        `file_id` names, or was truncated."""
+        stat = path.stat()
+        current = (stat.st_dev, stat.st_ino)
+        if file_id is not None and (current != file_id or stat.st_size < offset):
+            return None
+        lines: List[bytes] = []
+        if stat.st_size > offset:
+            with path.open("rb") as f:
+                f.seek(offset)
+                chunk = f.read(stat.st_size - offset)
+            # a line still being written is read on the next refresh
+            complete = chunk.rfind(b"\n") + 1
+            lines = chunk[:complete].splitlines()
+            offset += complete
+        return current, lines, offset
+
+    def refresh(self) -> int:
+        """Index what was stored since the last refresh, then apply the
+        change events logged since; return how many records were read."""
+        added = 0
+        plain = self.folder / f"{self.name}.jsonl"
+        if plain.exists():
+            tail = self._appended(plain, self._file_id, self._offset)
+            if tail is None:
+                print(f"[search] {plain} was replaced; rebuilding the index")
+                self._reset()
+                tail = self._appended(plain, None, 0)
+            self._file_id, lines, self._offset = tail
+            added += self._add_lines(lines)
+        if (self.folder / self.name).is_dir():
+            for path, _ in iter_manifest_segments(self.folder / self.name):
+                if path in self._segments:
+                    continue
+                with _open_segment(path) as stream:
+                    added += self._add_lines(stream)
+                self._segments.add(path)
+        changes = self.folder / self.changes_filename
+        if changes.exists():
+            tail = self._appended(changes, self._changes_id, self._changes_offset)
+            if tail is None:
+                # applied changes cannot be taken back one by one
+                print(f"[search] {changes} was replaced; rebuilding the index")
+                self._reset()
+                return self.refresh()
+            self._changes_id, lines, self._changes_offset = tail
+            self._apply_changes(lines)
+        return added
+
+    def save(self) -> bool:
+        """Write the indexes to :attr:`index_path` (atomically) if they
+        changed; return whether they were written.
+
+        Only the latest version of every offer is kept, renumbered, so
+        the file does not grow with superseded records.
+        """
+        if not self._dirty or not self.folder.is_dir():
+            return False
+        live = sorted(self._live)
+        number = {doc: i for i, doc in enumerate(live)}
+        ranges = {}
+        for name, index in self._sorted.items():
+            index._merge()
+            kept = [
+                (k, number[d]) for k, d in zip(index.keys, index.docs) if d in number
+            ]
+            ranges[name] = {"keys": [k for k, _ in kept], "docs": [d for _, d in kept]}
+        inverted = {
+            key: {
+                token: sorted(number[d] for d in docs if d in number)
+                for token, docs in postings.items()
+                if not docs.isdisjoint(number)
+            }
+            for key, postings in self._inverted.items()
+        }
+        state = {
+            "version": INDEX_VERSION,
+            "file_id": self._file_id,
+            "offset": self._offset,
+            "changes_id": self._changes_id,
+            "changes_offset": self._changes_offset,
+            "segments": sorted(str(p.relative_to(self.folder)) for p in self._segments),
+            "docs": [self.docs[d] for d in live],
+            "sorted": ranges,
+            "inverted": inverted,
+        }
+        tmp = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+        self._dirty = False
+        return True
+
+    def _load(self) -> None:
+        """Start from the indexes saved by :meth:`save`, if they still
+        apply; :meth:`refresh` notices files replaced since."""
+        try:
+            state = from_json(self.index_path.read_bytes())
+        except (OSError, ValueError):
+            return
+        if not isinstance(state, dict) or state.get("version") != INDEX_VERSION:
+            return
+        segments = {self.folder / p for p in state["segments"]}
+        if not all(p.exists() for p in segments):
+            return
+        self.docs = state["docs"]
+        self._by_id = {str(o.get("id")): i for i, o in enumerate(self.docs)}
+        self._live = set(range(len(self.docs)))
+        for name, saved in state["sorted"].items():
+            self._sorted[name].keys = saved["keys"]
+            self._sorted[name].docs = saved["docs"]
+        for key, postings in state["inverted"].items():
+            # in place: _token_targets holds these dictionaries
+            self._inverted[key].update({t: set(d) for t, d in postings.items()})
+        ids = state["file_id"], state["changes_id"]
+        self._file_id, self._changes_id = (tuple(i) if i else None for i in ids)
+        self._offset = state["offset"]
+        self._changes_offset = state["changes_offset"]
+        self._segments = segments
+
+    def _token_docs(self, key: str, text: str) -> Set[int]:
+        inverted = self._inverted[key]
+        words = tokens(text)
+        if not words:
+            return set()
+        sets = sorted((inverted.get(w, set()) for w in words), key=len)
+        return set.intersection(*sets) if len(sets) > 1 else set(sets[0])
+
+    def search(
+        self,
+        brand: Optional[str] = None,
+        model: Optional[str] = None,
+        fuel_type: Optional[str] = None,
+        location: Optional[str] = None,
+        ranges: Optional[Dict[str, Range]] = None,
+        sort: str = "price",
+        descending: bool = False,
+        page: int = 1,
+        per_page: int = DEFAULT_PAGE_SIZE,
+    ) -> SearchResult:
+        """Return page `page` of the offers matching every condition.
+
+        Text conditions match when all their words occur (e.g. ``model=
+        "seria 5"``; ``model`` also matches brand words). `ranges` maps
+        fields of :data:`RANGE_FIELDS` to inclusive ``(min, max)`` bounds,
+        either of which may be None. Offers missing the `sort` field come
+        last.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort!r}; expected one of {SORT_FIELDS}")
+        ranges = {f: r for f, r in (ranges or {}).items() if r != (None, None)}
+        for name in ranges:
+            if name not in RANGE_FIELDS:
+                raise ValueError(
+                    f"No range index for {name!r}; expected one of {RANGE_FIELDS}"
+                )
+        self.refresh()
+
+        # text conditions, smallest posting set first
+        candidates: Optional[Set[int]] = None
+        texts = {
+            "brand": brand,
+            "model": model,
+            "fuel_type": fuel_type,
+            "location": location,
+        }
+        for docs in sorted(
+            (self._token_docs(k, v) for k, v in texts.items() if v), key=len
+        ):
+            candidates = docs if candidates is None else candidates & docs
+        # the most selective range comes from its index, others are checked
+        checks = dict(ranges)
+        if candidates is None and ranges:
+            name = min(ranges, key=lambda f: self._sorted[f].count(*ranges[f]))
+            candidates = set(self._sorted[name].range(*checks.pop(name)))
+
+        if candidates is None:
+            matches = None  # everything
+        else:
+            matches = [
+                d for d in candidates if d in self._live and self._within(d, checks)
+            ]
+
+        start = (max(page, 1) - 1) * per_page
+        if matches is None:
+            total = len(self._live)
+            ordered = self._ordered_live(sort, descending)
+            page_docs = [d for _, d in zip(range(start + per_page), ordered)][start:]
+        else:
+            total = len(matches)
+            page_docs = self._sort(matches, sort, descending)[start : start + per_page]
+        return SearchResult(total, [self.docs[d] for d in page_docs], page, per_page)
+
+    def _within(self, doc: int, ranges: Dict[str, Range]) -> bool:
+        offer = self.docs[doc]
+        for name, (low, high) in ranges.items():
+            value = offer.get(name)
+            if value is None:
+                return False
+            if (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+
+    def _sort(self, docs: List[int], sort: str, descending: bool) -> List[int]:
+        present = [d for d in docs if self.docs[d].get(sort) is not None]
+        missing = [d for d in docs if self.docs[d].get(sort) is None]
+        key = (
+            (lambda d: str(self.docs[d]["id"]))
+            if sort == "id"
+            else (lambda d: self.docs[d][sort])
+        )
+        return sorted(present, key=key, reverse=descending) + missing
+
+    def _ordered_live(self, sort: str, descending: bool) -> Iterable[int]:
+        """Live offers in `sort` order, walking the sorted index lazily."""
+        if sort == "id":
+            yield from self._sort(list(self._live), sort, descending)
+            return
+        indexed = set()
+        for doc in self._sorted[sort].ordered(reverse=descending):
+            indexed.add(doc)
+            if doc in self._live:
+                yield doc
+        yield from (d for d in sorted(self._live) if d not in indexed)
+
+
+def _format(offer: Dict) -> str:
+    price = offer.get("price")
+    mileage = offer.get("mileage_km")
+    return "  ".join(
+        [
+            f"{offer.get('id', ''):>12}",
+            f"{offer.get('car_brand', '')} {offer.get('model', '')}"[:36].ljust(36),
+            f"{offer.get('year', '')!s:>4}",
+            f"{price:>11,.0f}" if price is not None else f"{'':>11}",
+            f"{mileage:>8,} km" if mileage is not None else f"{'':>11}",
+            f"{offer.get('fuel_type') or '':<10}",
+            offer.get("location") or "",
+        ]
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Search stored Otomoto offers.")
+    ap.add_argument("--folder", default="data")
+    ap.add_argument("--name", default="all_offers", help="dataset to search")
+    ap.add_argument("--brand")
+    ap.add_argument("--model", help='words of the title, e.g. "seria 5"')
+    ap.add_argument("--fuel", help="fuel type, e.g. diesel")
+    ap.add_argument("--location", help="words of the location, e.g. warszawa")
+    for name, flag in (
+        ("year", "year"),
+        ("price", "price"),
+        ("mileage_km", "mileage"),
+        ("engine_power", "power"),
+    ):
+        ap.add_argument(f"--{flag}-min", dest=f"{name}_min", type=float)
+        ap.add_argument(f"--{flag}-max", dest=f"{name}_max", type=float)
+    ap.add_argument("--sort", default="price", choices=SORT_FIELDS)
+    ap.add_argument("--desc", action="store_true", help="sort descending")
+    ap.add_argument("--page", type=int, default=1)
+    ap.add_argument("--per-page", type=int, default=DEFAULT_PAGE_SIZE)
+    ap.add_argument("--json", action="store_true", help="print JSON lines")
+    args = ap.parse_args(argv)
+
+    ranges = {
+        name: (getattr(args, f"{name}_min"), getattr(args, f"{name}_max"))
+        for name in RANGE_FIELDS
+    }
+    search = OfferSearch(args.folder, args.name)
+    result = search.search(
+        brand=args.brand,
+        model=args.model,
+        fuel_type=args.fuel,
+        location=args.location,
+        ranges=ranges,
+        sort=args.sort,
+        descending=args.desc,
+        page=args.page,
+        per_page=args.per_page,
+    )
+    search.save()
+    if args.json:
+        for offer in result.offers:
+            print(json.dumps(offer, ensure_ascii=False))
+        return
+    pages = max(-(-result.total // result.per_page), 1)
+    print(f"{result.total} offers, page {result.page} of {pages}")
+    for offer in result.offers:
+        print(_format(offer))
+
+
+if __name__ == "__main__":
+    main()
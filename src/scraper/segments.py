@@ -0,0 +1,233 @@
+"""Compressed, size- or time-rotated JSONL segments with a run manifest.
+
+:class:`SegmentWriter` streams offers through gzip or zstd into segment
+files of one run::
+
+    <folder>/<name>/run-<UTC timestamp>-<run id>/part-00000.jsonl.gz
+                                               /part-00001.jsonl.gz
+                                               /manifest.json
+
+A segment is closed once `segment_bytes` of JSONL were written to it or
+it has been open for `segment_seconds`, and on :meth:`SegmentWriter.close`.
+After every closed segment the run's ``manifest.json`` is rewritten
+(atomically) with the file name, row count, size and SHA-256 of every
+closed segment, so a crashed run still describes what it wrote.
+
+:func:`iter_segment_records` streams the records of all runs back, one
+line at a time, without decompressing whole files into memory.
+
+zstd needs the optional ``zstandard`` package.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .storage import jsonl_bytes, utc_now
+
+COMPRESSIONS = {None: ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+MANIFEST = "manifest.json"
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:  # pragma: no cover - depends on the environment
+        raise ImportError(
+            "zstd compression needs zstandard: pip install zstandard"
+        ) from e
+    return zstandard
+
+
+class _HashingFile:
+    """Write-only file wrapper tracking the SHA-256 and size of its bytes."""
+
+    def __init__(self, path: Path):
+        self._f = path.open("wb")
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class SegmentWriter:
+    """Append records to rotating, compressed segments of one run."""
+
+    def __init__(
+        self,
+        folder: Path,
+        compression: Optional[str] = "gzip",
+        segment_bytes: Optional[int] = 64 * 1024 * 1024,
+        segment_seconds: Optional[float] = None,
+        level: Optional[int] = None,
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown compression {compression!r}; expected gzip, zstd or None"
+            )
+        if compression == "zstd":
+            _zstandard()  # fail early when the package is missing
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        self.run_dir = Path(folder) / f"run-{stamp}-{uuid.uuid4().hex[:8]}"
+        self.compression = compression
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.level = level
+        self.segments: List[Dict] = []
+        self.created_at = utc_now()
+        self._raw: Optional[_HashingFile] = None
+        self._stream = None
+        self._path: Optional[Path] = None
+        self._rows = 0
+        self._bytes = 0
+        self._opened = 0.0
+
+    def _open(self) -> None:
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{len(self.segments):05d}{COMPRESSIONS[self.compression]}"
+        self._path = self.run_dir / name
+        self._raw = _HashingFile(self._path)
+        if self.compression == "gzip":
+            level = 6 if self.level is None else self.level
+            # mtime=0 keeps the output (and its checksum) reproducible
+            self._stream = gzip.GzipFile(
+                filename="", mode="wb", fileobj=self._raw, compresslevel=level, mtime=0
+            )
+        elif self.compression == "zstd":
+            level = 3 if self.level is None else self.level
+            cctx = _zstandard().ZstdCompressor(level=level)
+            self._stream = cctx.stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._rows = self._bytes = 0
+        self._opened = time.monotonic()
+
+    def _due(self) -> bool:
+        if self.segment_bytes and self._bytes >= self.segment_bytes:
+            return True
+        if (
+            self.segment_seconds
+            and time.monotonic() - self._opened >= self.segment_seconds
+        ):
+            return True
+        return False
+
+    def write(self, records: List[Dict]) -> Path:
+        """Append `records` and return the segment they went to.
+
+        Rotation happens between calls, so the records of one call always
+        share a segment.
+        """
+        if self._stream is not None and self._due():
+            self.seal()
+        if self._stream is None:
+            self._open()
+        data = jsonl_bytes(records)
+        self._stream.write(data)
+        self._rows += len(records)
+        self._bytes += len(data)
+        return self._path
+
+    def seal(self) -> None:
+        """Close the current segment and record it in the manifest."""
+        if self._stream is None:
+            return
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self.segments.append(
+            {
+                "file": self._path.name,
+                "rows": self._rows,
+                "bytes": self._raw.size,
+                "uncompressed_bytes": self._bytes,
+                "sha256": self._raw.sha256.hexdigest(),
+                "closed_at": utc_now(),
+            }
+        )
+        self._stream = self._raw = None
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "run": self.run_dir.name,
+            "created_at": self.created_at,
+            "compression": self.compression,
+            "rows": sum(s["rows"] for s in self.segments),
+            "segments": self.segments,
+        }
+        path = self.run_dir / MANIFEST
+        tmp = path.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, path)
+
+    def close(self) -> None:
+        self.seal()
+
+
+def _open_segment(path: Path):
+    """Return a binary, line-iterable stream of the JSONL in `path`."""
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.name.endswith(".zst"):
+        reader = _zstandard().ZstdDecompressor().stream_reader(path.open("rb"))
+        return io.BufferedReader(reader)
+    return path.open("rb")
+
+
+def _verify(path: Path, segment: Dict) -> None:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    if digest.hexdigest() != segment["sha256"]:
+        raise ValueError(f"Checksum mismatch in {path}")
+
+
+def iter_manifest_segments(folder: Path) -> Iterator[Tuple[Path, Dict]]:
+    """Yield ``(path, manifest entry)`` of the closed segments under
+    `folder`, oldest run first.
+
+    Runs without a manifest (e.g. killed before their first segment was
+    closed) are skipped, as their files may be truncated.
+    """
+    for run_dir in sorted(Path(folder).glob("run-*")):
+        manifest = run_dir / MANIFEST
+        if not manifest.exists():
+            continue
+        with manifest.open("r", encoding="utf-8") as f:
+            segments = json.load(f)["segments"]
+        for segment in segments:
+            yield run_dir / segment["file"], segment
+
+
+def iter_segment_records(folder: Path, verify: bool = False) -> Iterator[Dict]:
+    """Stream the records of every closed segment under `folder`.
+
+    Files are decompressed incrementally, line by line. With `verify`
+    every segment's checksum is compared with its manifest first.
+    """
+    for path, segment in iter_manifest_segments(folder):
+        if verify:
+            _verify(path, segment)
+        with _open_segment(path) as stream:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,237 @@
+"""Split a crawl into shards that run as separate invocations.
+
+A coordinator cuts the search URLs into :class:`Shard` page ranges with
+:func:`plan_shards` and hands each one to a worker, either a separate
+Lambda invocation (see ``lambda_handler.handler``) or a local worker
+process (:func:`run_local`). Every shard crawls its range independently,
+writes its own part file under ``<folder>/parts/<shard_id>/`` and returns
+its offers. :func:`merge_parts` then dedupes the offers of all shards
+against each other and against the coordinator's storage, the same way
+an incremental crawl does.
+
+Shard responses travel in the Lambda response payload, which is capped
+at 6 MB, so keep shards to a few pages each.
+"""
+
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from .storage import CHANGED, NEW, LocalJSONLStorage, OfferStorage, utc_now
+
+# (shard event) -> shard result, see :func:`handle_shard_event`
+Invoker = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+@dataclass
+class Shard:
+    """Pages `start_page` to `end_page` (inclusive) of one search URL."""
+
+    shard_id: str
+    base_url: str
+    start_page: int
+    end_page: int
+
+    def to_event(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Return the invocation event asking a worker to crawl this shard."""
+        return {"mode": "shard", "shard": asdict(self), "options": options or {}}
+
+    @classmethod
+    def from_event(cls, event: Dict[str, Any]) -> "Shard":
+        return cls(**event["shard"])
+
+
+def plan_shards(
+    search_urls: Sequence[str], pages: int, pages_per_shard: int = 5
+) -> List[Shard]:
+    """Cut the first `pages` pages of every search URL into shards."""
+    if pages_per_shard < 1:
+        raise ValueError("pages_per_shard must be at least 1")
+    shards = []
+    for u, url in enumerate(search_urls):
+        for start in range(1, pages + 1, pages_per_shard):
+            end = min(start + pages_per_shard - 1, pages)
+            shards.append(Shard(f"s{u:02d}-p{start:03d}-{end:03d}", url, start, end))
+    return shards
+
+
+# keyword arguments of run_shard that an event may set
+SHARD_OPTIONS = ("delay", "concurrency")
+
+
+def run_shard(
+    shard: Shard,
+    folder: str = "data",
+    delay: float = 1.0,
+    concurrency: int = 1,
+) -> List[Dict]:
+    """Crawl one shard into its own part folder and return its offers.
+
+    The crawl stops early at the first empty page, so shards past the
+    last page of a search finish after a single request.
+    """
+    # imported here so a coordinator does not load the HTTP and parsing stack
+    from .crawler import scrape_pages
+
+    storage = LocalJSONLStorage(folder=str(Path(folder) / "parts" / shard.shard_id))
+    return scrape_pages(
+        base_url=shard.base_url,
+        start_page=shard.start_page,
+        max_pages=shard.end_page,
+        delay=delay,
+        stop_on_empty=True,
+        concurrency=concurrency,
+        storage=storage,
+    )
+
+
+def handle_shard_event(event: Dict[str, Any], folder: str = "data") -> Dict[str, Any]:
+    """Run the shard described by a ``{"mode": "shard"}`` event.
+
+    Only the :data:`SHARD_OPTIONS` of the event's ``options`` are used.
+    """
+    shard = Shard.from_event(event)
+    options = event.get("options") or {}
+    ignored = sorted(set(options) - set(SHARD_OPTIONS))
+    if ignored:
+        print(f"[shard] Ignoring unknown options: {', '.join(ignored)}")
+    kwargs = {k: options[k] for k in SHARD_OPTIONS if k in options}
+    offers = run_shard(shard, folder=folder, **kwargs)
+    return {"shard_id": shard.shard_id, "count": len(offers), "offers": offers}
+
+
+def merge_parts(
+    parts: Iterable[Iterable[Dict]], storage: OfferStorage
+) -> Dict[str, int]:
+    """Merge shard outputs into `storage`, deduplicating across shards.
+
+    Offers seen in an earlier part are dropped. Offers already in the
+    storage's offer index are skipped, unless their price or mileage
+    changed, which is recorded in the change log. Returns counts of the
+    offers read, duplicates, new and changed offers.
+    """
+    index = storage.index
+    seen = set()
+    stats = {"offers": 0, "duplicates": 0, "new": 0, "changed": 0}
+    seen_at = utc_now()
+    for part in parts:
+        new_offers, changed_offers, change_events = [], [], []
+        for off in part:
+            stats["offers"] += 1
+            off_id = str(off.get("id") or off.get("url") or "")
+            if not off_id or off_id in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(off_id)
+            status, changes = index.classify(off)
+            index.record(off, seen_at)
+            if status == NEW:
+                new_offers.append(off)
+            elif status == CHANGED:
+                changed_offers.append(off)
+                change_events.append(
+                    {"id": off_id, "seen_at": seen_at, "changes": changes}
+                )
+        if new_offers:
+            storage.save(new_offers, filename="all_offers.jsonl")
+        if change_events:
+            storage.save_changes(change_events)
+            storage.save_updated(changed_offers)
+        stats["new"] += len(new_offers)
+        stats["changed"] += len(change_events)
+    storage.flush()
+    return stats
+
+
+def run_coordinator(
+    shards: Sequence[Shard],
+    invoke: Invoker,
+    storage: OfferStorage,
+    max_parallel: int = 10,
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Run every shard through `invoke` in parallel and merge the results.
+
+    Shards that fail are reported and left out of the merge.
+    """
+    events = [s.to_event(options) for s in shards]
+
+    def call(event: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return invoke(event)
+        except Exception as e:  # one failed shard must not lose the others
+            print(f"[shards] Shard {event['shard']['shard_id']} failed: {e}")
+            return {"shard_id": event["shard"]["shard_id"], "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(events)))) as pool:
+        results = list(pool.map(call, events))
+    failed = [r["shard_id"] for r in results if "error" in r]
+    stats: Dict[str, Any] = merge_parts(
+        (r["offers"] for r in results if "error" not in r), storage
+    )
+    stats.update(shards=len(shards), failed_shards=failed)
+    print(f"[shards] Merged {len(shards) - len(failed)}/{len(shards)} shards: {stats}")
+    return stats
+
+
+# a synchronous invoke lasts as long as the shard (up to the 900 s Lambda
+# timeout); botocore's default 60 s read timeout and retries would invoke
+# a slow shard again and crawl it twice
+LAMBDA_CLIENT_CONFIG = {
+    "read_timeout": 900,
+    "connect_timeout": 10,
+    "retries": {"max_attempts": 0},
+}
+
+
+def lambda_invoker(function_name: str, client=None) -> Invoker:
+    """Return an invoker running shard events as synchronous Lambda calls."""
+    if client is None:
+        import boto3
+        from botocore.config import Config
+
+        client = boto3.client("lambda", config=Config(**LAMBDA_CLIENT_CONFIG))
+
+    def invoke(event: Dict[str, Any]) -> Dict[str, Any]:
+        resp = client.invoke(
+            FunctionName=function_name,
+            InvocationType="RequestResponse",
+            Payload=json.dumps(event).encode("utf-8"),
+        )
+        payload = json.loads(resp["Payload"].read())
+        if resp.get("FunctionError") or payload.get("statusCode") != 200:
+            raise RuntimeError(f"shard invocation failed: {payload}")
+        return json.loads(payload["body"])
+
+    return invoke
+
+
+def _local_invoke(event: Dict[str, Any], folder: str) -> Dict[str, Any]:
+    # runs in a fresh worker process, like a cold Lambda sandbox
+    return handle_shard_event(event, folder=folder)
+
+
+def run_local(
+    shards: Sequence[Shard],
+    storage: OfferStorage,
+    workers: int = 2,
+    folder: str = "data",
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Run the shards in `workers` local processes and merge the results.
+
+    Workers are spawned rather than forked so each one starts from a clean
+    interpreter, as a Lambda invocation does.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+
+        def invoke(event: Dict[str, Any]) -> Dict[str, Any]:
+            return pool.submit(_local_invoke, event, folder).result()
+
+        return run_coordinator(
+            shards, invoke, storage, max_parallel=workers, options=options
+        )
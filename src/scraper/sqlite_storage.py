@@ -0,0 +1,206 @@
+"""SQLite storage backend for scraped offers.
+
+Uses only the standard library :mod:`sqlite3`. Offers are upserted into an
+indexed ``offers`` table, one transaction per :meth:`SQLiteStorage.save`
+call (i.e. per crawled page), and triggers add a row to ``price_history``
+whenever an offer is first stored or its price changes. The database runs
+in WAL mode so readers can query it while a crawl is writing.
+
+The crawler's offer index lives in the same database, so incremental
+crawls look offers up by primary key instead of loading a JSON file.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .storage import (TRACKED_FIELDS, OfferIndex, OfferStorage, content_hash,
+                      resolve_data_folder, utc_now)
+
+OFFER_FIELDS = (
+    "id",
+    "url",
+    "car_brand",
+    "model",
+    "year",
+    "price",
+    "price_currency",
+    "engine_capacity",
+    "engine_power",
+    "mileage_km",
+    "location",
+    "fuel_type",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS offers (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    car_brand TEXT,
+    model TEXT,
+    year INTEGER,
+    price REAL,
+    price_currency TEXT,
+    engine_capacity REAL,
+    engine_power INTEGER,
+    mileage_km INTEGER,
+    location TEXT,
+    fuel_type TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_offers_brand_model ON offers (car_brand, model);
+CREATE INDEX IF NOT EXISTS idx_offers_year ON offers (year);
+CREATE INDEX IF NOT EXISTS idx_offers_price ON offers (price);
+
+CREATE TABLE IF NOT EXISTS price_history (
+    id TEXT NOT NULL,
+    price REAL,
+    price_currency TEXT,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_price_history_id ON price_history (id, recorded_at);
+
+CREATE TRIGGER IF NOT EXISTS trg_offers_price_insert AFTER INSERT ON offers
+BEGIN
+    INSERT INTO price_history (id, price, price_currency, recorded_at)
+    VALUES (new.id, new.price, new.price_currency, new.last_seen);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_offers_price_update AFTER UPDATE OF price ON offers
+WHEN old.price IS NOT new.price
+BEGIN
+    INSERT INTO price_history (id, price, price_currency, recorded_at)
+    VALUES (new.id, new.price, new.price_currency, new.last_seen);
+END;
+
+CREATE TABLE IF NOT EXISTS offer_index (
+    id TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    price REAL,
+    mileage_km INTEGER
+);
+"""
+
+_COLUMNS = ", ".join(OFFER_FIELDS)
+_UPSERT = f"""
+INSERT INTO offers ({_COLUMNS}, first_seen, last_seen)
+VALUES ({", ".join("?" * len(OFFER_FIELDS))}, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    {", ".join(f"{f} = excluded.{f}" for f in OFFER_FIELDS[1:])},
+    last_seen = excluded.last_seen
+"""
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open (and create if needed) an offers database in WAL mode."""
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SQLiteOfferIndex(OfferIndex):
+    """:class:`OfferIndex` stored in the ``offer_index`` table.
+
+    Lookups go through the primary key, so nothing is loaded up front.
+    Changes become durable on :meth:`save`.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.path = None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM offer_index").fetchone()[0]
+
+    def __contains__(self, offer_id: str) -> bool:
+        return self.get(offer_id) is not None
+
+    def get(self, offer_id: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            "SELECT hash, last_seen, price, mileage_km FROM offer_index WHERE id = ?",
+            (offer_id,),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def record(self, offer: Dict, seen_at: Optional[str] = None) -> None:
+        values = [offer.get(field) for field in TRACKED_FIELDS]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO offer_index (id, hash, last_seen, "
+            f"{', '.join(TRACKED_FIELDS)}) "
+            f"VALUES ({', '.join('?' * (3 + len(values)))})",
+            (str(offer["id"]), content_hash(offer), seen_at or utc_now(), *values),
+        )
+
+    def save(self) -> None:
+        self.conn.commit()
+
+
+class SQLiteStorage(OfferStorage):
+    """Store offers in an indexed SQLite database with price history."""
+
+    def __init__(
+        self,
+        folder: str = "data",
+        db_filename: str = "offers.sqlite3",
+        changes_filename: str = "offer_changes.jsonl",
+    ):
+        self.folder = resolve_data_folder(folder)
+        self.path = self.folder / db_filename
+        self.changes_filename = changes_filename
+        self.conn = connect(self.path)
+        self._index = SQLiteOfferIndex(self.conn)
+
+    def save(self, offers: List[Dict], filename: str = "all_offers.jsonl") -> str:
+        """Upsert `offers` in a single transaction and return the db path.
+
+        `filename` is accepted for compatibility with the other backends;
+        all offers go to the ``offers`` table.
+        """
+        seen_at = utc_now()
+        rows = [
+            tuple(o.get(f) for f in OFFER_FIELDS) + (seen_at, seen_at) for o in offers
+        ]
+        with self.conn:
+            self.conn.executemany(_UPSERT, rows)
+        return str(self.path)
+
+    def save_updated(self, offers: List[Dict]) -> str:
+        """Upsert the new versions, so the rows and the price history
+        follow price changes seen by incremental crawls."""
+        return self.save(offers)
+
+    def select(
+        self,
+        where: str = "",
+        params: Sequence[Any] = (),
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """Return offers matching an SQL `where` clause as dictionaries."""
+        sql = f"SELECT {_COLUMNS} FROM offers"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(sql, tuple(params))]
+
+    def price_history(self, offer_id: str) -> List[Dict]:
+        """Return the recorded prices of one offer, oldest first."""
+        rows = self.conn.execute(
+            "SELECT price, price_currency, recorded_at FROM price_history "
+            "WHERE id = ? ORDER BY recorded_at, rowid",
+            (offer_id,),
+        )
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        """Commit pending index changes and close the connection."""
+        self.flush()
+        self.conn.close()
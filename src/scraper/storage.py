@@ -1,30 +1,452 @@
 """Small local storage helpers used by integration tests.
 
-Provides a thin JSONL writer used by the crawler to persist offers.
+Provides the :class:`OfferStorage` interface implemented by all storage
+backends, the thin JSONL writer used by default to persist offers, and a
+persistent :class:`OfferIndex` that remembers which offers earlier runs
+have already stored so repeat crawls only record what changed. Other
+backends live in their own modules and are created with
+:func:`create_storage`.
+
+With `compression` or a segment size or age, :class:`LocalJSONLStorage`
+writes gzip/zstd segments with a per-run manifest instead of one growing
+file (see :mod:`src.scraper.segments`); :func:`iter_offers` reads both
+layouts back as one stream. :func:`parse_filter` parses the
+``"year >= 2015 AND price < 50000"`` filters the query helpers accept.
 """
 
+import hashlib
 import json
 import os
+import re
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic_core import to_json
+
+from .config import (
+    JSONL_COMPRESSION,
+    S3_BUCKET,
+    S3_COMPRESSION,
+    S3_PART_MB,
+    S3_PREFIX,
+    SEGMENT_MB,
+    SEGMENT_SECONDS,
+)
+
+if TYPE_CHECKING:
+    from .relists import RelistIndex
+    from .segments import SegmentWriter
+
+# Offer fields whose changes are recorded as change events
+TRACKED_FIELDS = ("price", "mileage_km")
+
+# (field, operator, literal) condition, see :func:`parse_filter`
+Filter = Tuple[str, str, Any]
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+
+def utc_now() -> str:
+    """Return the current UTC time as an ISO 8601 string."""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def content_hash(offer: Dict) -> str:
+    """Return a short, stable hash of all fields of `offer`."""
+    raw = json.dumps(offer, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict]:
+    """Yield the records of a JSONL file, skipping blank or broken lines."""
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def apply_change(offer: Dict, event: Dict) -> Dict:
+    """Return `offer` with the new values of change `event` (see
+    :meth:`OfferIndex.classify`); `offer` itself is left as it was."""
+    return {**offer, **{f: new for f, (_, new) in event["changes"].items()}}
+
+
+class OfferIndex:
+    """Persistent index of stored offers keyed by offer id.
+
+    Every entry holds the content hash of the last stored version, the
+    last time the offer was seen and the values of :data:`TRACKED_FIELDS`
+    so changes can be reported as old/new pairs. The index is kept in
+    memory and written to a JSON file by :meth:`save`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    @classmethod
+    def from_jsonl(cls, path: Path, jsonl_path: Path) -> "OfferIndex":
+        """Create an index at `path` from the offers already in `jsonl_path`.
+
+        Later lines win, so the index reflects the latest stored version.
+        """
+        return cls.from_records(
+            path, iter_jsonl(jsonl_path) if jsonl_path.exists() else []
+        )
+
+    @classmethod
+    def from_records(cls, path: Path, offers: Iterable[Dict]) -> "OfferIndex":
+        """Create an index at `path` from stored `offers`; later ones win."""
+        index = cls(path)
+        seen_at = utc_now()
+        for offer in offers:
+            if offer.get("id"):
+                index.record(offer, seen_at=seen_at)
+        return index
 
+    def __len__(self) -> int:
+        return len(self._entries)
 
-class LocalJSONLStorage:
-    """Simple JSONL appender for lists of dictionaries."""
+    def __contains__(self, offer_id: str) -> bool:
+        return offer_id in self._entries
 
-    def __init__(self, folder: str = "data"):
-        # AWS Lambda can only write to /tmp
-        # Check if running in Lambda environment
-        if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
-            self.folder = Path("/tmp") / folder
-        else:
-            self.folder = Path(folder)
-        self.folder.mkdir(parents=True, exist_ok=True)
+    def get(self, offer_id: str) -> Optional[Dict]:
+        return self._entries.get(offer_id)
+
+    def classify(self, offer: Dict) -> Tuple[str, Dict[str, Tuple]]:
+        """Compare `offer` with its indexed version.
+
+        Returns ``(status, changes)`` where status is ``"new"``,
+        ``"changed"`` or ``"unchanged"`` and `changes` maps each changed
+        tracked field to its ``(old, new)`` values. Offers whose other
+        fields changed (e.g. a reworded location) count as unchanged.
+        """
+        entry = self.get(str(offer.get("id")))
+        if entry is None:
+            return NEW, {}
+        if entry.get("hash") == content_hash(offer):
+            return UNCHANGED, {}
+        changes = {
+            field: (entry.get(field), offer.get(field))
+            for field in TRACKED_FIELDS
+            if entry.get(field) != offer.get(field)
+        }
+        return (CHANGED if changes else UNCHANGED), changes
+
+    def record(self, offer: Dict, seen_at: Optional[str] = None) -> None:
+        """Store the hash, tracked values and last-seen time of `offer`."""
+        entry = {"hash": content_hash(offer), "last_seen": seen_at or utc_now()}
+        for field in TRACKED_FIELDS:
+            entry[field] = offer.get(field)
+        self._entries[str(offer["id"])] = entry
+        self._dirty = True
+
+    def save(self) -> bool:
+        """Write the index to disk (atomically) if it changed; return
+        whether it was written."""
+        if not self._dirty:
+            return False
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = False
+        return True
+
+
+def data_folder(folder: str) -> Path:
+    """Return the local folder for output data, without creating it."""
+    # AWS Lambda can only write to /tmp
+    # Check if running in Lambda environment
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        return Path("/tmp") / folder
+    return Path(folder)
+
+
+def resolve_data_folder(folder: str) -> Path:
+    """Return the local folder for output data, creating it if needed."""
+    path = data_folder(folder)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def jsonl_bytes(records: List[Dict]) -> bytes:
+    """Serialize `records` to UTF-8 JSONL without intermediate strings."""
+    return b"".join([to_json(o) + b"\n" for o in records])
+
+
+def append_jsonl(path: Path, records: List[Dict]) -> None:
+    """Append `records` to the JSONL file at `path`."""
+    with path.open("ab") as f:
+        f.write(jsonl_bytes(records))
+
+
+class OfferStorage:
+    """Interface of the offer storage backends used by the crawler.
+
+    Backends write offers with :meth:`save` and may buffer them until
+    :meth:`flush` or :meth:`close`; use them as context managers to make
+    sure everything is written. Every backend keeps a persistent
+    :class:`OfferIndex` and a JSONL change log in its `folder`, used by
+    incremental crawls, and, for crawls detecting relisted offers, a
+    :class:`src.scraper.relists.RelistIndex` and a JSONL log of matches.
+    """
+
+    folder: Path
+    index_filename = "offer_index.json"
+    changes_filename = "offer_changes.jsonl"
+    relist_index_filename = "relist_index.json"
+    relists_filename = "relists.jsonl"
+    schedule_filename = "schedule.json"
+    _index: Optional[OfferIndex] = None
+    _relists: Optional["RelistIndex"] = None
 
     def save(self, offers: List[Dict], filename: str = "all_offers.jsonl") -> str:
-        """Append `offers` to a JSONL file and return the path."""
-        path = self.folder / filename
-        with path.open("a", encoding="utf-8") as f:
-            for o in offers:
-                f.write(json.dumps(o, ensure_ascii=False) + "\n")
+        """Store `offers` and return the location they were written to."""
+        raise NotImplementedError
+
+    @property
+    def index(self) -> OfferIndex:
+        """The persistent :class:`OfferIndex` of this storage, loaded lazily."""
+        if self._index is None:
+            self._index = self._load_index(self.folder / self.index_filename)
+        return self._index
+
+    def _load_index(self, path: Path) -> OfferIndex:
+        return OfferIndex(path)
+
+    def save_changes(self, events: List[Dict]) -> str:
+        """Append change events (see :meth:`OfferIndex.classify`) to disk."""
+        path = self.folder / self.changes_filename
+        append_jsonl(path, events)
+        return str(path)
+
+    def save_updated(self, offers: List[Dict]) -> Optional[str]:
+        """Store the new version of offers whose tracked fields changed.
+
+        Append-only backends keep only the change events written by
+        :meth:`save_changes`, which readers apply to the stored offers;
+        backends keeping one current row per offer override this.
+        """
+        return None
+
+    @property
+    def relist_index(self) -> "RelistIndex":
+        """The persistent relist index of this storage, loaded lazily."""
+        if self._relists is None:
+            self._relists = self._load_relists(self.folder / self.relist_index_filename)
+        return self._relists
+
+    def _load_relists(self, path: Path) -> "RelistIndex":
+        from .relists import RelistIndex
+
+        return RelistIndex(path)
+
+    def save_relists(self, events: List[Dict]) -> str:
+        """Append relist events (see :meth:`RelistIndex.observe`) to disk."""
+        path = self.folder / self.relists_filename
+        append_jsonl(path, events)
         return str(path)
+
+    def state_path(self, filename: str) -> Path:
+        """Return the local path of state file `filename` (such as the
+        crawl schedule), fetched first by backends keeping it elsewhere."""
+        return self.folder / filename
+
+    def save_state(self, filename: str) -> None:
+        """Persist state file `filename` after it was rewritten at
+        :meth:`state_path`; local backends have nothing left to do."""
+
+    def flush(self) -> None:
+        """Write buffered data and persist the indexes that were loaded."""
+        if self._index is not None:
+            self._index.save()
+        if self._relists is not None:
+            self._relists.save()
+
+    def close(self) -> None:
+        """Flush and release any open files."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def dataset_name(filename: str) -> str:
+    """Return the dataset name for a JSONL-style `filename`."""
+    return Path(filename).name.split(".")[0]
+
+
+def iter_offers(
+    folder, name: str = "all_offers", verify: bool = False
+) -> Iterator[Dict]:
+    """Stream the offers of dataset `name` written by :class:`LocalJSONLStorage`.
+
+    The plain ``<name>.jsonl`` file comes first, then the segments of every
+    run under ``<name>/`` (decompressed line by line). With `verify` the
+    segments' checksums are checked against their manifests.
+    """
+    folder = Path(folder)
+    plain = folder / f"{name}.jsonl"
+    if plain.exists():
+        yield from iter_jsonl(plain)
+    if (folder / name).is_dir():
+        from .segments import iter_segment_records
+
+        yield from iter_segment_records(folder / name, verify=verify)
+
+
+_CONDITION = re.compile(
+    r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(==|=|!=|<=|>=|<|>)\s*(.+?)\s*$"
+)
+
+
+def _literal(text: str) -> Any:
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_filter(expression: str) -> List[Filter]:
+    """Parse ``"year >= 2015 AND price < 50000"`` into filter tuples.
+
+    Only conjunctions of ``<field> <op> <literal>`` are supported; string
+    literals may be quoted.
+    """
+    filters = []
+    for part in re.split(r"\s+AND\s+", expression.strip(), flags=re.I):
+        m = _CONDITION.match(part)
+        if not m:
+            raise ValueError(f"Cannot parse filter condition: {part!r}")
+        field, op, value = m.groups()
+        filters.append((field, "==" if op == "=" else op, _literal(value)))
+    return filters
+
+
+class LocalJSONLStorage(OfferStorage):
+    """Simple JSONL appender for lists of dictionaries.
+
+    By default offers are appended to one plain ``<folder>/<filename>``.
+    With `compression` (``"gzip"`` or ``"zstd"``), `segment_bytes` or
+    `segment_seconds` they are streamed into rotating segments under
+    ``<folder>/<dataset>/run-.../`` instead, one run directory with its
+    own manifest per storage instance. Segments are sealed by
+    :meth:`flush` and :meth:`close`.
+    """
+
+    def __init__(
+        self,
+        folder: str = "data",
+        index_filename: str = "offer_index.json",
+        changes_filename: str = "offer_changes.jsonl",
+        compression: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+        segment_seconds: Optional[float] = None,
+    ):
+        self.folder = resolve_data_folder(folder)
+        self.index_filename = index_filename
+        self.changes_filename = changes_filename
+        self._index = None
+        self.compression = compression
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.segmented = bool(compression or segment_bytes or segment_seconds)
+        self._writers: Dict[str, "SegmentWriter"] = {}
+
+    def _load_index(self, path: Path) -> OfferIndex:
+        """Load the index; when no index file exists yet it is built from
+        the stored offers so offers stored by earlier runs are known."""
+        if path.exists():
+            return OfferIndex(path)
+        return OfferIndex.from_records(path, iter_offers(self.folder))
+
+    def _load_relists(self, path: Path) -> "RelistIndex":
+        """Load the relist index, seeding it from the stored offers like
+        :meth:`_load_index` when there is no index file yet."""
+        from .relists import RelistIndex
+
+        if path.exists():
+            return RelistIndex(path)
+        return RelistIndex.from_records(path, iter_offers(self.folder))
+
+    def save(self, offers: List[Dict], filename: str = "all_offers.jsonl") -> str:
+        """Append `offers` to a JSONL file (or the current segment) and
+        return its path."""
+        if not self.segmented:
+            path = self.folder / filename
+            append_jsonl(path, offers)
+            return str(path)
+        name = dataset_name(filename)
+        writer = self._writers.get(name)
+        if writer is None:
+            from .segments import SegmentWriter
+
+            writer = self._writers[name] = SegmentWriter(
+                self.folder / name,
+                compression=self.compression,
+                segment_bytes=self.segment_bytes,
+                segment_seconds=self.segment_seconds,
+            )
+        return str(writer.write(offers))
+
+    def flush(self) -> None:
+        """Seal the open segments, then persist the offer index."""
+        for writer in self._writers.values():
+            writer.seal()
+        super().flush()
+
+
+STORAGE_BACKENDS = ("jsonl", "parquet", "sqlite", "s3")
+
+
+def create_storage(
+    backend: str = "jsonl", folder: str = "data", **kwargs
+) -> OfferStorage:
+    """Create the storage backend called `backend`.
+
+    Backends with optional dependencies are imported on demand.
+    """
+    if backend == "jsonl":
+        kwargs.setdefault("compression", JSONL_COMPRESSION or None)
+        kwargs.setdefault("segment_bytes", int(SEGMENT_MB * 1024 * 1024) or None)
+        kwargs.setdefault("segment_seconds", SEGMENT_SECONDS or None)
+        return LocalJSONLStorage(folder=folder, **kwargs)
+    if backend == "parquet":
+        from .parquet_storage import ParquetStorage
+
+        return ParquetStorage(folder=folder, **kwargs)
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+
+        return SQLiteStorage(folder=folder, **kwargs)
+    if backend == "s3":
+        from .s3_storage import S3Storage
+
+        kwargs.setdefault("bucket", S3_BUCKET)
+        kwargs.setdefault("prefix", S3_PREFIX)
+        kwargs.setdefault("compression", S3_COMPRESSION or None)
+        kwargs.setdefault("part_size", int(S3_PART_MB * 1024 * 1024))
+        return S3Storage(folder=folder, **kwargs)
+    raise ValueError(
+        f"Unknown storage backend {backend!r}; expected one of {STORAGE_BACKENDS}"
+    )
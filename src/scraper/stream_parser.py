@@ -0,0 +1,232 @@
+"""Streaming DOM parser for Otomoto listing pages.
+
+An alternative to the BeautifulSoup walk in :mod:`src.scraper.parser`:
+an :class:`html.parser.HTMLParser` subclass reads the page incrementally
+and only keeps state for the ``<article data-id>`` block it is currently
+inside. Each finished article is turned into the same dict that
+:func:`src.scraper.parser.parse_offer_element` returns.
+"""
+
+from html.parser import HTMLParser
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+
+from .config import BASE_URL
+from .parser import (
+    CURRENCY_CLASS,
+    EXTRA_INFO_CLASS,
+    LOCATION_LIST_CLASS,
+    PARAMS_CLASS,
+    PRICE_CLASS,
+    TITLE_CLASS,
+    build_raw_offer,
+    validate_offers,
+)
+
+VOID_ELEMENTS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Capture:
+    """Stripped text pieces collected for one element (``get_text(strip=True)``)."""
+
+    __slots__ = ("pieces",)
+
+    def __init__(self):
+        self.pieces: List[str] = []
+
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+
+class _Article:
+    """Texts collected for the article currently being read."""
+
+    def __init__(self, data_id: Optional[str]):
+        self.data_id = data_id
+        self.title: Optional[_Capture] = None
+        self.href: Optional[str] = None
+        self.price: Optional[_Capture] = None
+        self.currency: Optional[_Capture] = None
+        self.extra: Optional[_Capture] = None
+        self.location: Optional[_Capture] = None
+        self.seen_params = False
+        self.in_params = False
+        self.dts: List[_Capture] = []
+        self.dds: List[_Capture] = []
+
+
+class ListingStreamParser(HTMLParser):
+    """Incremental tokenizer emitting one offer per ``<article data-id>``.
+
+    Feed it with :meth:`feed` and collect finished offers with
+    :meth:`pop_offers`. Outside of articles no tags or text are retained.
+    """
+
+    def __init__(self, base_url: str = BASE_URL):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self._offers: List[Dict] = []
+        self._article: Optional[_Article] = None
+        # open elements inside the current article: (tag, classes, capture)
+        self._stack: List[Tuple[str, Tuple[str, ...], Optional[_Capture]]] = []
+        self._captures: List[_Capture] = []
+        self._pending: List[str] = []
+
+    def pop_offers(self) -> List[Dict]:
+        """Validate and return the offers finished so far, forgetting them."""
+        offers, self._offers = self._offers, []
+        return validate_offers(offers) if offers else offers
+
+    # text handling ------------------------------------------------------
+
+    def handle_data(self, data: str) -> None:
+        if self._captures:
+            self._pending.append(data)
+
+    def _flush_text(self) -> None:
+        if not self._pending:
+            return
+        text = "".join(self._pending).strip()
+        self._pending = []
+        if text:
+            for capture in self._captures:
+                capture.pieces.append(text)
+
+    # tags ---------------------------------------------------------------
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        article = self._article
+        if article is None:
+            if tag == "article":
+                attr_map = dict(attrs)
+                if "data-id" in attr_map:
+                    self._article = _Article(attr_map["data-id"])
+                    self._stack = [("article", (), None)]
+            return
+
+        self._flush_text()
+        if tag in VOID_ELEMENTS:
+            return
+        attr_map = dict(attrs)
+        classes = tuple((attr_map.get("class") or "").split())
+        capture = self._capture_for(article, tag, classes, attr_map)
+        if capture is not None:
+            self._captures.append(capture)
+        self._stack.append((tag, classes, capture))
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        # self-closing tags never hold text
+        if self._article is not None:
+            self._flush_text()
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._article is None:
+            return
+        self._flush_text()
+        if not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, classes, capture = self._stack.pop()
+            if capture is not None:
+                self._captures.remove(capture)
+            if open_tag == "dl" and PARAMS_CLASS in classes:
+                self._article.in_params = False
+            if open_tag == tag:
+                break
+        if not self._stack:
+            self._finish_article()
+
+    def _capture_for(
+        self, article: _Article, tag, classes, attrs
+    ) -> Optional[_Capture]:
+        """Return a new capture when this element holds one of the fields."""
+        if tag == "a" and article.title is None:
+            parent_tag, parent_classes, _ = self._stack[-1]
+            if parent_tag == "h2" and TITLE_CLASS in parent_classes:
+                article.title = _Capture()
+                article.href = attrs.get("href")
+                return article.title
+        elif tag == "h3" and PRICE_CLASS in classes and article.price is None:
+            article.price = _Capture()
+            return article.price
+        elif tag == "p":
+            if CURRENCY_CLASS in classes and article.currency is None:
+                article.currency = _Capture()
+                return article.currency
+            if EXTRA_INFO_CLASS in classes and article.extra is None:
+                article.extra = _Capture()
+                return article.extra
+            if article.location is None and self._inside_location_list():
+                article.location = _Capture()
+                return article.location
+        elif tag == "dl" and PARAMS_CLASS in classes and not article.seen_params:
+            article.seen_params = article.in_params = True
+        elif article.in_params and tag in ("dt", "dd"):
+            capture = _Capture()
+            (article.dts if tag == "dt" else article.dds).append(capture)
+            return capture
+        return None
+
+    def _inside_location_list(self) -> bool:
+        """True when the stack matches ``ul.<LOCATION_LIST_CLASS> li``."""
+        in_list = False
+        for tag, classes, _ in self._stack:
+            if tag == "ul" and LOCATION_LIST_CLASS in classes:
+                in_list = True
+            elif in_list and tag == "li":
+                return True
+        return False
+
+    def _finish_article(self) -> None:
+        article = self._article
+        self._article = None
+        self._captures = []
+        self._pending = []
+
+        def text(capture: Optional[_Capture]) -> Optional[str]:
+            return capture.text() if capture is not None else None
+
+        params = {
+            dt.text().lower(): dd.text() for dt, dd in zip(article.dts, article.dds)
+        }
+        self._offers.append(
+            build_raw_offer(
+                self.base_url,
+                data_id=article.data_id,
+                title=text(article.title),
+                href=article.href,
+                price_raw=text(article.price) or None,
+                currency=text(article.currency),
+                params=params,
+                extra_text=text(article.extra),
+                location=text(article.location),
+            )
+        )
+
+
+def iter_listings(
+    source: Union[str, IO[str]],
+    base_url: str = BASE_URL,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Dict]:
+    """Yield offers from an HTML string or text stream as they are read."""
+    parser = ListingStreamParser(base_url)
+    if isinstance(source, str):
+        chunks = (source[i : i + chunk_size] for i in range(0, len(source), chunk_size))
+    else:
+        chunks = iter(lambda: source.read(chunk_size), "")
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_offers()
+    parser.close()
+    yield from parser.pop_offers()
+
+
+def parse_listings_stream(html: str, base_url: str = BASE_URL) -> List[Dict]:
+    """Parse an HTML listing page with the streaming tokenizer."""
+    results = list(iter_listings(html, base_url))
+    print(f"Found {len(results)} offer elements")
+    return results
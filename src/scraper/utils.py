@@ -2,40 +2,94 @@
 
 Helpers perform small, well-defined transformations and intentionally
 return `None` when parsing fails.
+
+Patterns are compiled once at import time and digits are extracted with a
+single :meth:`str.translate` pass, since these helpers run for every
+offer of every page. The ``*_from_texts`` variants convert a whole page's
+worth of strings in one call.
 """
 
 import hashlib
 import re
-from typing import Optional
+from typing import Iterable, List, Optional
 from urllib.parse import urljoin
 
+_CURRENCY_RE = re.compile(r"([A-Z]{2,4}|zł|PLN|EUR|USD)", re.I)
+_OFFER_ID_RE = re.compile(r"/oferta/(\d+)")
+# "1 234 567,89" / "1.234.567,89" / "1,234,567.89" once spaces are dropped:
+# groups of three digits joined by one separator, then an optional decimal
+# part after the other separator
+_GROUPED_NUMBER_RE = re.compile(
+    r"(\d{1,3}(?:([.,])\d{3})(?:\2\d{3})*)(?:(?!\2)[.,](\d+))?"
+)
+
+
+class _KeepTable(dict):
+    """`str.translate` table that deletes every character except decimal
+    digits and `extra`. Lookups of other characters are cached, so after
+    the first few calls translating is a pure C loop."""
+
+    def __init__(self, extra: str = ""):
+        super().__init__((ord(c), ord(c)) for c in extra)
+
+    def __missing__(self, key: int) -> Optional[int]:
+        value = key if chr(key).isdecimal() else None
+        self[key] = value
+        return value
+
+
+_DIGITS = _KeepTable()
+_NUMBER_CHARS = _KeepTable(".,")
+
 
 def parse_float_from_text(s: Optional[str]) -> Optional[float]:
     """Parse a localized number string and return a float or None.
 
-    Examples: "89 000 zł" -> 89000.0, "48 500 PLN" -> 48500.0
+    Examples: "89 000 zł" -> 89000.0, "48 500 PLN" -> 48500.0,
+    "1 234,56" -> 1234.56, "1.234.567,89 zł" -> 1234567.89
     """
     if not s:
         return None
-    # "89 000 zł" -> "89000"
-    digits = re.sub(r"[^\d.,]", "", s).replace(",", ".")
-    # remove thousand separators (spaces)
-    digits = re.sub(r"\s+", "", digits)
+    # "89\xa0000 zł" -> "89000"
+    digits = s.translate(_NUMBER_CHARS)
+    if not digits:
+        return None
     try:
-        return float(digits)
+        return float(digits.replace(",", "."))
     except ValueError:
+        pass
+    # several separators: only valid as thousands grouping
+    m = _GROUPED_NUMBER_RE.fullmatch(digits)
+    if m is None:
         return None
+    whole, sep, fraction = m.groups()
+    number = whole.replace(sep, "")
+    return float(f"{number}.{fraction}" if fraction else number)
 
 
 def parse_int_from_text(s: Optional[str]) -> Optional[int]:
     """Return integer parsed from a string or None if parsing fails."""
     if not s:
         return None
-    digits = re.sub(r"[^\d]", "", s)
-    try:
-        return int(digits) if digits else None
-    except ValueError:
-        return None
+    digits = s.translate(_DIGITS)
+    return int(digits) if digits else None
+
+
+def parse_floats_from_texts(values: Iterable[Optional[str]]) -> List[Optional[float]]:
+    """Apply :func:`parse_float_from_text` to a batch of strings."""
+    parse = parse_float_from_text
+    return [parse(v) for v in values]
+
+
+def parse_ints_from_texts(values: Iterable[Optional[str]]) -> List[Optional[int]]:
+    """Apply :func:`parse_int_from_text` to a batch of strings."""
+    table = _DIGITS
+    out: List[Optional[int]] = []
+    append = out.append
+    for v in values:
+        digits = v.translate(table) if v else ""
+        append(int(digits) if digits else None)
+    return out
 
 
 def extract_currency(s: Optional[str]) -> Optional[str]:
@@ -43,7 +97,7 @@ def extract_currency(s: Optional[str]) -> Optional[str]:
     if not s:
         return None
     s = s.strip()
-    m = re.search(r"([A-Z]{2,4}|zł|PLN|EUR|USD)", s, re.I)
+    m = _CURRENCY_RE.search(s)
     if m:
         cur = m.group(0).upper()
         if cur == "ZŁ":
@@ -54,8 +108,8 @@ def extract_currency(s: Optional[str]) -> Optional[str]:
 
 def make_id_from_url_or_hash(url: Optional[str], title: Optional[str]) -> str:
     """Return an ID parsed from an Otomoto URL or a stable short hash."""
-    if url:
-        m = re.search(r"/oferta/(\d+)", url)
+    if url and "/oferta/" in url:
+        m = _OFFER_ID_RE.search(url)
         if m:
             return m.group(1)
     # fallback stable short hash
@@ -147,9 +147,33 @@ resource "aws_iam_role_policy" "lambda_s3" {
       Action = [
         "s3:PutObject",
         "s3:PutObjectAcl",
-        "s3:GetObject"
+        "s3:GetObject",
+        # SCRAPER_STORAGE=s3 wysyła oferty jako multipart upload
+        "s3:AbortMultipartUpload",
+        "s3:ListMultipartUploadParts"
       ]
       Resource = "arn:aws:s3:::${var.s3_bucket_name}/*"
+    }, {
+      # iter_s3_offers listuje manifesty przebiegów
+      Effect   = "Allow"
+      Action   = ["s3:ListBucket"]
+      Resource = "arn:aws:s3:::${var.s3_bucket_name}"
+    }]
+  })
+}
+
+# Tryb "coordinator" wywołuje tę samą funkcję dla każdego sharda
+# (ARN budowany z nazwy, żeby uniknąć cyklu rola <-> funkcja)
+resource "aws_iam_role_policy" "lambda_invoke_self" {
+  name = "${var.project_name}-lambda-invoke-self-policy"
+  role = aws_iam_role.lambda_execution.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect   = "Allow"
+      Action   = ["lambda:InvokeFunction"]
+      Resource = "arn:aws:lambda:*:*:function:${var.lambda_function_name}"
     }]
   })
 }
@@ -185,6 +209,12 @@ resource "aws_lambda_function" "scraper" {
       OTOMOTO_URL           = var.otomoto_url
       S3_BUCKET             = var.s3_bucket_name
       PYTHONUNBUFFERED      = "1"
+      # Oferty idą prosto do S3 (multipart, gzip), bez zapisu w /tmp
+      SCRAPER_STORAGE           = "s3"
+      SCRAPER_S3_PREFIX         = "otomoto"
+      # Gdyby SCRAPER_STORAGE=jsonl: segmenty gzip po 64 MB (surowy JSONL)
+      SCRAPER_JSONL_COMPRESSION = "gzip"
+      SCRAPER_SEGMENT_MB        = "64"
       # AWS_REGION is automatically set by Lambda (reserved key)
     }
   }
@@ -249,33 +279,52 @@ resource "aws_lambda_permission" "eventbridge" {
 # S3 BUCKET - Object storage (opcjonalne, jeśli nie masz bucketa)
 ################################################################################
 # S3 = storage dla plików (jak Dropbox, ale dla aplikacji)
-# Zakomentowane jeśli już masz bucket "otomoto-scraper-2025"
-# resource "aws_s3_bucket" "scraper_output" {
-#   bucket = var.s3_bucket_name
-#
-#   tags = {
-#     Name = "otomoto-scraper-output"
-#   }
-# }
-#
-# resource "aws_s3_bucket_versioning" "scraper_output" {
-#   bucket = aws_s3_bucket.scraper_output.id
-#
-#   versioning_configuration {
-#     status = "Enabled"  # Wersjonowanie plików (historia zmian)
-#   }
-# }
-#
-# resource "aws_s3_bucket_lifecycle_configuration" "scraper_output" {
-#   bucket = aws_s3_bucket.scraper_output.id
-#
-#   # Automatyczne usuwanie starych plików
-#   rule {
-#     id     = "delete-old-files"
-#     status = "Enabled"
-#
-#     expiration {
-#       days = 30  # Usuń pliki starsze niż 30 dni
-#     }
-#   }
-# }
+# Tworzony tylko z create_s3_bucket = true (domyślnie zakładamy, że bucket
+# "otomoto-scraper-2025" już istnieje)
+resource "aws_s3_bucket" "scraper_output" {
+  count  = var.create_s3_bucket ? 1 : 0
+  bucket = var.s3_bucket_name
+
+  tags = {
+    Name = "otomoto-scraper-output"
+  }
+}
+
+resource "aws_s3_bucket_versioning" "scraper_output" {
+  count  = var.create_s3_bucket ? 1 : 0
+  bucket = aws_s3_bucket.scraper_output[0].id
+
+  versioning_configuration {
+    status = "Enabled"  # Wersjonowanie plików (historia zmian)
+  }
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "scraper_output" {
+  count  = var.create_s3_bucket ? 1 : 0
+  bucket = aws_s3_bucket.scraper_output[0].id
+
+  # Automatyczne usuwanie starych plików
+  rule {
+    id     = "delete-old-files"
+    status = "Enabled"
+
+    filter {}
+
+    expiration {
+      days = 30  # Usuń pliki starsze niż 30 dni
+    }
+  }
+
+  # Przerwane multipart uploady (np. timeout Lambdy) zajmują miejsce,
+  # choć nie widać ich jako obiektów - sprzątaj je po dniu
+  rule {
+    id     = "abort-incomplete-multipart-uploads"
+    status = "Enabled"
+
+    filter {}
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}
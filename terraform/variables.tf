@@ -84,6 +84,12 @@ variable "s3_bucket_name" {
   default     = "otomoto-scraper-2025"
 }
 
+variable "create_s3_bucket" {
+  description = "Czy Terraform ma utworzyć bucket s3_bucket_name (false = bucket już istnieje)"
+  type        = bool
+  default     = false
+}
+
 ################################################################################
 # EventBridge (Scheduler) Configuration
 ################################################################################
@@ -1,9 +1,11 @@
 import json
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import pytest
 
 import src.scraper.crawler as crawler_mod
+from src.scraper.metrics import Metrics, set_metrics
 
 
 def load_fixture(name):
@@ -39,6 +41,13 @@ def invalid_html():
     return "<not-valid></html>"
 
 
+class _NullStorage:
+    """Storage stand-in that drops everything it is given"""
+
+    def save(self, offers, filename="all_offers.jsonl"):
+        return filename
+
+
 def test_scrape_one_page_monkeypatched(monkeypatch, tmp_path, sample_html):
     """Test basic crawling with two valid listings"""
 
@@ -170,3 +179,294 @@ def test_scrape_deduplication(monkeypatch, tmp_path, sample_html):
     assert len(offers) == 2
     assert len(storage.saved_offers) == 2
     assert {o["id"] for o in offers} == {"6FRsVn", "6FRt2m"}
+
+
+def test_scrape_concurrent_matches_sequential(monkeypatch, tmp_path, sample_html):
+    """Concurrent crawl returns the same deduped offers as the sequential one"""
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        return sample_html
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    monkeypatch.setattr(crawler_mod, "LocalJSONLStorage", lambda folder: _NullStorage())
+
+    kwargs = dict(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5",
+        max_pages=6,
+        delay=0,
+        stop_on_empty=False,
+    )
+    sequential = crawler_mod.scrape_pages(**kwargs)
+    concurrent = crawler_mod.scrape_pages(concurrency=3, **kwargs)
+
+    assert [o["id"] for o in concurrent] == [o["id"] for o in sequential]
+
+
+def test_scrape_concurrent_stops_on_first_empty_page(
+    monkeypatch, sample_html, empty_html
+):
+    """Pages after the first empty one are not processed in concurrent mode"""
+    fetched = []
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        fetched.append(url)
+        return empty_html if "page=2" in url else sample_html
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    monkeypatch.setattr(crawler_mod, "LocalJSONLStorage", lambda folder: _NullStorage())
+
+    offers = crawler_mod.scrape_pages(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5",
+        max_pages=50,
+        delay=0,
+        stop_on_empty=True,
+        concurrency=2,
+    )
+
+    assert {o["id"] for o in offers} == {"6FRsVn", "6FRt2m"}
+    # only the pages inside the in-flight window may have been requested
+    assert len(fetched) <= 4
+
+
+def test_scrape_incremental_skips_known_and_records_changes(
+    monkeypatch, tmp_path, sample_html
+):
+    """A second run stores nothing new and only logs the price change"""
+    from src.scraper.storage import LocalJSONLStorage
+
+    html = {"value": sample_html}
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        return html["value"]
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    monkeypatch.setattr(
+        crawler_mod,
+        "LocalJSONLStorage",
+        lambda folder: LocalJSONLStorage(folder=str(tmp_path)),
+    )
+    kwargs = dict(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5",
+        max_pages=1,
+        delay=0,
+        incremental=True,
+    )
+
+    first = crawler_mod.scrape_pages(**kwargs)
+    assert {o["id"] for o in first} == {"6FRsVn", "6FRt2m"}
+    assert (tmp_path / "offer_index.json").exists()
+
+    html["value"] = sample_html.replace("239 900", "229 900")
+    second = crawler_mod.scrape_pages(**kwargs)
+
+    assert [o["id"] for o in second] == ["6FRsVn"]
+    lines = (tmp_path / "all_offers.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    events = [
+        json.loads(line)
+        for line in (tmp_path / "offer_changes.jsonl").read_text().splitlines()
+    ]
+    assert len(events) == 1
+    assert events[0]["id"] == "6FRsVn"
+    assert events[0]["changes"] == {"price": [239900.0, 229900.0]}
+
+
+def test_scrape_stops_after_unchanged_pages(monkeypatch, tmp_path, sample_html):
+    """With K=2 the crawl ends after two pages that bring nothing new"""
+    fetched = []
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        fetched.append(url)
+        return sample_html
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    monkeypatch.setattr(crawler_mod, "LocalJSONLStorage", lambda folder: _NullStorage())
+
+    offers = crawler_mod.scrape_pages(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5",
+        max_pages=10,
+        delay=0,
+        stop_after_unchanged=2,
+    )
+
+    assert len(offers) == 2
+    assert len(fetched) == 3
+
+
+def test_scrape_with_parse_workers_matches_inline(monkeypatch, sample_html):
+    """Parsing in worker processes yields the same offers in page order"""
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        if url.endswith("page=4"):
+            raise RuntimeError("boom")
+        return sample_html.replace("6FRsVn", f"6FRsVn-{url[-1]}")
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+
+    kwargs = dict(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5?x=1",
+        max_pages=6,
+        delay=0,
+        stop_on_empty=False,
+        storage=_NullStorage(),
+    )
+    inline = crawler_mod.scrape_pages(**kwargs)
+    pooled = crawler_mod.scrape_pages(parse_workers=2, **kwargs)
+
+    assert [o["id"] for o in pooled] == [o["id"] for o in inline]
+    assert [o["id"] for o in inline] == ["6FRsVn-1", "6FRt2m", "6FRsVn-2", "6FRsVn-3"]
+
+
+def test_scrape_records_stage_metrics(monkeypatch, sample_html):
+    """Parse and store metrics are recorded, also from parse workers"""
+    metrics = Metrics()
+    previous = set_metrics(metrics)
+    monkeypatch.setattr(
+        crawler_mod,
+        "fetch_page",
+        lambda url, timeout=10, save_snapshot=None: sample_html,
+    )
+    try:
+        for workers in (0, 2):
+            crawler_mod.scrape_pages(
+                max_pages=2,
+                delay=0,
+                stop_on_empty=False,
+                storage=_NullStorage(),
+                parse_workers=workers,
+            )
+    finally:
+        set_metrics(previous)
+
+    snap = metrics.snapshot()
+    assert snap["parse.seconds"]["count"] == 4
+    assert snap["parse.offers"]["sum"] == 8
+    assert snap["store.offers"] == 4  # page 2 repeats page 1 within a run
+    assert snap["store.write_seconds"]["count"] == 2
+
+
+def test_scrape_flags_relisted_offer(monkeypatch, tmp_path, sample_html):
+    """An offer reappearing under a new id in a later run is flagged"""
+    from src.scraper.storage import LocalJSONLStorage
+
+    html = {"value": sample_html}
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        return html["value"]
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    kwargs = dict(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5",
+        max_pages=1,
+        delay=0,
+        incremental=True,
+        detect_relists=True,
+    )
+
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        crawler_mod.scrape_pages(storage=storage, **kwargs)
+    assert (tmp_path / "relist_index.json").exists()
+    assert not (tmp_path / "relists.jsonl").exists()
+
+    html["value"] = sample_html.replace("6FRsVn", "7RELST").replace(
+        "239 900", "229 900"
+    )
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        second = crawler_mod.scrape_pages(storage=storage, **kwargs)
+
+    # the relist is still stored as a new offer, and flagged
+    assert [o["id"] for o in second] == ["7RELST"]
+    events = [
+        json.loads(line)
+        for line in (tmp_path / "relists.jsonl")
+        .read_text(encoding="utf-8")
+        .splitlines()
+    ]
+    assert len(events) == 1
+    assert events[0]["id"] == "7RELST" and events[0]["relist_of"] == "6FRsVn"
+    assert events[0]["kind"] == "relist" and events[0]["similarity"] == 1.0
+    assert (events[0]["previous_price"], events[0]["price"]) == (239900.0, 229900.0)
+
+
+def test_relist_detection_covers_offers_stored_before_it(
+    monkeypatch, tmp_path, sample_html
+):
+    """Offers stored without detection, or seen again, are in the index"""
+    from src.scraper.storage import LocalJSONLStorage
+
+    html = {"value": sample_html}
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        return html["value"]
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    kwargs = dict(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5",
+        max_pages=1,
+        delay=0,
+        incremental=True,
+    )
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        crawler_mod.scrape_pages(storage=storage, **kwargs)
+    assert not (tmp_path / "relist_index.json").exists()
+
+    # the index is seeded from the stored offers
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        stored = crawler_mod.scrape_pages(
+            storage=storage, detect_relists=True, **kwargs
+        )
+    assert stored == []
+    index_path = tmp_path / "relist_index.json"
+    entries = json.loads(index_path.read_text(encoding="utf-8"))
+    assert "6FRsVn" in entries and len(entries) == 2
+
+    # an offer seen again is refreshed, so it does not age out while listed
+    month_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+    entries["6FRsVn"]["last_seen"] = month_ago
+    index_path.write_text(json.dumps(entries), encoding="utf-8")
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        crawler_mod.scrape_pages(storage=storage, detect_relists=True, **kwargs)
+    entries = json.loads(index_path.read_text(encoding="utf-8"))
+    assert entries["6FRsVn"]["last_seen"] > month_ago
+
+    html["value"] = sample_html.replace("6FRsVn", "7RELST")
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        crawler_mod.scrape_pages(storage=storage, detect_relists=True, **kwargs)
+    lines = (tmp_path / "relists.jsonl").read_text(encoding="utf-8").splitlines()
+    events = [json.loads(line) for line in lines]
+    assert [(e["id"], e["relist_of"], e["kind"]) for e in events] == [
+        ("7RELST", "6FRsVn", "relist")
+    ]
+
+
+def test_incremental_crawls_update_sqlite_rows_and_price_history(
+    monkeypatch, tmp_path, sample_html
+):
+    """A price change seen by a later crawl reaches the SQLite row"""
+    from src.scraper.sqlite_storage import SQLiteStorage
+
+    html = {"value": sample_html}
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        return html["value"]
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    kwargs = dict(
+        base_url="https://www.otomoto.pl/osobowe/bmw/seria-5",
+        max_pages=1,
+        delay=0,
+        incremental=True,
+    )
+    with SQLiteStorage(folder=str(tmp_path)) as storage:
+        crawler_mod.scrape_pages(storage=storage, **kwargs)
+
+    html["value"] = sample_html.replace("239 900", "229 900")
+    with SQLiteStorage(folder=str(tmp_path)) as storage:
+        changed = crawler_mod.scrape_pages(storage=storage, **kwargs)
+        assert [o["id"] for o in changed] == ["6FRsVn"]
+        row = storage.select("id = ?", ["6FRsVn"])[0]
+        assert row["price"] == 229900.0
+        assert [h["price"] for h in storage.price_history("6FRsVn")] == [
+            239900.0,
+            229900.0,
+        ]
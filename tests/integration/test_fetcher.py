@@ -0,0 +1,247 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from src.scraper import fetcher as fetcher_mod
+from src.scraper import retry as retry_mod
+from src.scraper.fetcher import Fetcher
+from src.scraper.http_cache import HTTPCache
+from src.scraper.ratelimit import AdaptiveRateLimiter
+from src.scraper.retry import CircuitBreaker, RetryPolicy
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    failures_left = 0
+    failure_status = 503
+    retry_after = None
+    etag = '"v1"'
+
+    def do_GET(self):
+        if self.path.endswith("/missing"):
+            status, body = 404, b"gone"
+        elif _Handler.failures_left > 0:
+            _Handler.failures_left -= 1
+            status, body = _Handler.failure_status, b"busy"
+        elif self.headers.get("If-None-Match") == _Handler.etag:
+            status, body = 304, b""
+        else:
+            status, body = 200, "<html>oferta zł</html>".encode("utf-8")
+        self.send_response(status)
+        self.send_header("ETag", _Handler.etag)
+        if status >= 400 and _Handler.retry_after is not None:
+            self.send_header("Retry-After", _Handler.retry_after)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    """Local keep-alive HTTP server"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/osobowe"
+    _Handler.failures_left = 0
+    _Handler.failure_status = 503
+    _Handler.retry_after = None
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetcher_reuses_connections_and_records_stats(server_url):
+    """Only the first request opens a socket; later ones reuse it"""
+    fetcher = Fetcher(pool_size=2)
+    for _ in range(3):
+        assert fetcher.fetch(server_url) == "<html>oferta zł</html>"
+
+    stats = list(fetcher.stats)
+    assert [s.new_connection for s in stats] == [True, False, False]
+    assert all(s.status == 200 for s in stats)
+    assert all(s.content_bytes == len("<html>oferta zł</html>".encode()) for s in stats)
+    assert stats[1].connect == 0.0 and stats[1].dns == 0.0
+
+    summary = fetcher.summary()
+    assert summary["requests"] == 3
+    assert summary["new_connections"] == 1
+    fetcher.close()
+
+
+def test_new_connections_fall_back_to_the_next_address(monkeypatch, server_url):
+    """An unreachable first address does not fail the fetch"""
+    real_getaddrinfo = fetcher_mod.socket.getaddrinfo
+
+    def getaddrinfo(host, port, *args):
+        if host != "example.test":
+            return real_getaddrinfo(host, port, *args)
+        infos = real_getaddrinfo("127.0.0.1", port, *args)
+        # nothing listens on 127.0.0.2 at the server's port
+        return [(*infos[0][:4], ("127.0.0.2", port))] + infos
+
+    monkeypatch.setattr(fetcher_mod.socket, "getaddrinfo", getaddrinfo)
+    fetcher = Fetcher(retry=RetryPolicy(tries=1))
+    url = server_url.replace("127.0.0.1", "example.test")
+    assert fetcher.fetch(url) == "<html>oferta zł</html>"
+    assert fetcher.stats[-1].new_connection and fetcher.stats[-1].status == 200
+    fetcher.close()
+
+
+def test_fetcher_retries_and_saves_snapshot(monkeypatch, server_url, tmp_path):
+    """Server errors are retried and the final body is written to disk"""
+    monkeypatch.setattr(fetcher_mod.time, "sleep", lambda s: None)
+    _Handler.failures_left = 1
+    snapshot = tmp_path / "page.html"
+
+    fetcher = Fetcher()
+    html = fetcher.fetch(server_url, save_snapshot=str(snapshot))
+
+    assert html == snapshot.read_text(encoding="utf-8")
+    assert [s.status for s in fetcher.stats] == [503, 200]
+    fetcher.close()
+
+
+def test_fetcher_raises_after_all_tries(monkeypatch, server_url):
+    monkeypatch.setattr(fetcher_mod.time, "sleep", lambda s: None)
+    _Handler.failures_left = 5
+
+    with pytest.raises(RuntimeError):
+        Fetcher(tries=2).fetch(server_url)
+    _Handler.failures_left = 0
+
+
+def test_fetcher_revalidates_cached_pages(server_url, tmp_path):
+    """The second fetch sends If-None-Match and is served from the cache"""
+    cache = HTTPCache(str(tmp_path / "cache"))
+    fetcher = Fetcher(cache=cache)
+
+    assert fetcher.fetch(server_url) == "<html>oferta zł</html>"
+    assert cache.get(server_url).etag == '"v1"'
+    assert fetcher.fetch(server_url) == "<html>oferta zł</html>"
+
+    assert [s.status for s in fetcher.stats] == [200, 304]
+    assert fetcher.stats[1].content_bytes == 0
+    fetcher.close()
+
+
+def test_fetcher_offline_replays_without_network(server_url, tmp_path):
+    cache = HTTPCache(str(tmp_path / "cache"))
+    Fetcher(cache=cache).fetch(server_url)
+
+    # a fresh process would reload the cache index from disk
+    offline = Fetcher(cache=HTTPCache(str(tmp_path / "cache")), offline=True)
+    assert offline.fetch(server_url) == "<html>oferta zł</html>"
+    assert len(offline.stats) == 0
+    with pytest.raises(RuntimeError):
+        offline.fetch(server_url + "?page=2")
+
+
+def test_fetcher_offline_replays_expired_recordings(server_url, tmp_path):
+    Fetcher(cache=HTTPCache(str(tmp_path / "cache"))).fetch(server_url)
+
+    # replayed more than a TTL after it was recorded
+    cache = HTTPCache(str(tmp_path / "cache"), ttl=-1)
+    offline = Fetcher(cache=cache, offline=True)
+    for _ in range(2):
+        assert offline.fetch(server_url) == "<html>oferta zł</html>"
+    assert len(cache) == 1
+    assert list((tmp_path / "cache").glob("*.html"))
+
+
+def test_fetcher_honors_retry_after_and_slows_down_on_429(monkeypatch, server_url):
+    sleeps = []
+    monkeypatch.setattr(fetcher_mod.time, "sleep", sleeps.append)
+    _Handler.failures_left = 1
+    _Handler.failure_status = 429
+    _Handler.retry_after = "7"
+    limiter = AdaptiveRateLimiter(max_rate=10)
+
+    fetcher = Fetcher(retry=RetryPolicy(tries=3, base=0.1), limiter=limiter)
+    assert fetcher.fetch(server_url) == "<html>oferta zł</html>"
+
+    assert sleeps[0] == 7.0
+    assert limiter.rate(server_url) is not None  # throttled after the 429
+    fetcher.close()
+
+
+def test_fetcher_does_not_retry_client_errors(monkeypatch, server_url):
+    sleeps = []
+    monkeypatch.setattr(fetcher_mod.time, "sleep", sleeps.append)
+    fetcher = Fetcher(tries=3)
+
+    with pytest.raises(RuntimeError):
+        fetcher.fetch(server_url + "/missing")
+    assert [s.status for s in fetcher.stats] == [404]
+    assert sleeps == []
+
+
+def test_fetcher_pauses_on_open_breaker_instead_of_failing(monkeypatch, server_url):
+    monkeypatch.setattr(fetcher_mod.time, "sleep", lambda s: None)
+    _Handler.failures_left = 4
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.01)
+
+    fetcher = Fetcher(retry=RetryPolicy(tries=2, base=0), breaker=breaker)
+    assert fetcher.fetch(server_url) == "<html>oferta zł</html>"
+
+    assert [s.status for s in fetcher.stats] == [503, 503, 503, 503, 200]
+    assert breaker.opened >= 1 and breaker.state == CircuitBreaker.CLOSED
+    fetcher.close()
+
+
+def test_default_fetcher_pauses_when_a_page_runs_out_of_tries(monkeypatch, server_url):
+    monkeypatch.setattr(fetcher_mod.time, "sleep", lambda s: None)
+    monkeypatch.setattr(fetcher_mod, "HTTP_CACHE_DIR", None)
+    monkeypatch.setattr(fetcher_mod, "HTTP_OFFLINE", False)
+    monkeypatch.setattr(fetcher_mod, "_default_fetcher", None)
+    fetcher = fetcher_mod.get_default_fetcher()
+    fetcher.breaker.cooldown = fetcher.breaker.base_cooldown = 0.01
+    _Handler.failures_left = fetcher.retry.tries
+
+    assert fetcher.fetch(server_url) == "<html>oferta zł</html>"
+    assert fetcher.breaker.opened == 1
+    assert fetcher.breaker.state == CircuitBreaker.CLOSED
+    fetcher.close()
+
+
+def test_failing_site_cannot_stall_a_fetch_past_its_wait_budget(
+    monkeypatch, server_url
+):
+    clock, slept = [0.0], []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock[0] += seconds
+
+    fake_time = SimpleNamespace(
+        sleep=sleep, monotonic=lambda: clock[0], perf_counter=time.perf_counter
+    )
+    monkeypatch.setattr(fetcher_mod, "time", fake_time)
+    monkeypatch.setattr(retry_mod, "time", fake_time)
+    _Handler.failures_left = 1000  # 503 forever, like a bot block
+    breaker = CircuitBreaker()  # 30 s cool-down, doubling up to 300 s
+
+    fetcher = Fetcher(breaker=breaker, max_wait=120.0)
+    with pytest.raises(RuntimeError):
+        fetcher.fetch(server_url)
+
+    assert sum(slept) <= 120.0
+    assert breaker.opened >= 1 and len(fetcher.stats) < 10
+    fetcher.close()
+
+
+def test_client_errors_are_not_breaker_successes(monkeypatch, server_url):
+    monkeypatch.setattr(fetcher_mod.time, "sleep", lambda s: None)
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=0.01)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    with pytest.raises(RuntimeError):
+        Fetcher(breaker=breaker).fetch(server_url + "/missing")
+    assert breaker.failures == 2 and breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,39 @@
+import requests
+
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.loadtest import run_loadtest
+
+
+def test_fixture_server_makes_offer_ids_unique_per_page():
+    with FixtureServer(pages=2) as server:
+        first = requests.get(server.url, timeout=5).text
+        second = requests.get(server.url + "?page=2", timeout=5).text
+        beyond = requests.get(server.url + "?page=3", timeout=5).text
+
+    assert "data-id" in first and "data-id" in second
+    assert first != second
+    assert "data-id" not in beyond
+
+
+def test_fixture_server_rate_limit_answers_429_with_retry_after():
+    with FixtureServer(pages=1, rate_limit=0.5) as server:
+        ok = requests.get(server.url, timeout=5)
+        limited = requests.get(server.url, timeout=5)
+
+    assert ok.status_code == 200
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert server.status_counts == {200: 1, 429: 1}
+
+
+def test_loadtest_crawls_all_pages_and_counts_retries():
+    with FixtureServer(pages=4, error_rate=0.2, seed=3) as server:
+        report = run_loadtest(server, max_pages=4, concurrency=2)
+        served = dict(server.status_counts)
+
+    per_page = server.factory.offers_per_page
+    assert report["pages"] == 4
+    assert report["offers"] == 4 * per_page
+    assert report["requests"] == sum(served.values())
+    assert report["retries"] == served.get(503, 0)
+    assert report["pages_per_s"] > 0
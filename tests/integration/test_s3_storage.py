@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import src.scraper.crawler as crawler_mod
+from src.scraper import s3_storage as s3_mod
+from src.scraper.s3_storage import S3Storage, iter_s3_offers
+from src.scraper.scheduler import run_scheduled
+from src.scraper.storage import create_storage
+
+BUCKET = "otomoto-test"
+OFFERS = [
+    {
+        "id": str(i),
+        "url": f"u{i}",
+        "price": 1000.0 + i,
+        "mileage_km": i,
+        # incompressible enough to fill several parts
+        "title": hashlib.sha256(str(i).encode()).hexdigest(),
+    }
+    for i in range(3000)
+]
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    # let a small test run span several parts
+    monkeypatch.setattr(s3_mod, "MIN_PART_SIZE", 1024)
+    with mock_aws():
+        import moto.s3.models
+
+        monkeypatch.setattr(moto.s3.models, "S3_UPLOAD_PART_MIN_SIZE", 1024)
+        client = boto3.client("s3", region_name="eu-north-1")
+        client.create_bucket(
+            Bucket=BUCKET,
+            CreateBucketConfiguration={"LocationConstraint": "eu-north-1"},
+        )
+        yield client
+
+
+def _keys(client, prefix=""):
+    resp = client.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
+    return sorted(o["Key"] for o in resp.get("Contents", []))
+
+
+def test_offers_stream_as_multipart_object_with_manifest(s3, tmp_path):
+    with S3Storage(BUCKET, folder=str(tmp_path), part_size=2048, client=s3) as storage:
+        for i in range(0, len(OFFERS), 50):
+            uri = storage.save(OFFERS[i : i + 50])
+    assert uri == f"s3://{BUCKET}/otomoto/all_offers/{storage.run_id}.jsonl.gz"
+
+    manifest = storage.manifests["all_offers"]
+    stored = json.loads(
+        s3.get_object(
+            Bucket=BUCKET, Key=f"otomoto/all_offers/{storage.run_id}.manifest.json"
+        )["Body"].read()
+    )
+    assert stored == manifest
+    assert manifest["rows"] == len(OFFERS) and len(manifest["parts"]) > 1
+    body = s3.get_object(Bucket=BUCKET, Key=manifest["key"])["Body"].read()
+    assert manifest["sha256"] == hashlib.sha256(body).hexdigest()
+    assert manifest["bytes"] == len(body) == sum(p["bytes"] for p in manifest["parts"])
+    assert [json.loads(line) for line in gzip.decompress(body).splitlines()] == OFFERS
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    # nothing but the offer index touches the local folder
+    assert [p.name for p in tmp_path.iterdir()] == []
+
+
+def test_runs_read_back_in_order_and_index_lives_in_s3(s3, tmp_path):
+    with S3Storage(BUCKET, folder=str(tmp_path / "a"), client=s3) as storage:
+        storage.save(OFFERS[:3])
+        storage.index.record(OFFERS[0])
+    with S3Storage(BUCKET, folder=str(tmp_path / "b"), client=s3) as storage:
+        # a fresh container picks the index up from S3
+        assert "0" in storage.index
+        storage.save(OFFERS[3:5])
+        storage.save_changes([{"id": "0", "field": "price"}])
+
+    assert list(iter_s3_offers(BUCKET, client=s3)) == OFFERS[:5]
+    assert list(iter_s3_offers(BUCKET, name="offer_changes", client=s3)) == [
+        {"id": "0", "field": "price"}
+    ]
+    assert "otomoto/offer_index.json" in _keys(s3)
+
+
+def test_empty_run_writes_nothing(s3, tmp_path):
+    with S3Storage(BUCKET, folder=str(tmp_path), client=s3) as storage:
+        storage.save([])
+    assert storage.manifests == {}
+    assert _keys(s3) == []
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+
+
+def test_failed_completion_aborts_the_upload(s3, tmp_path, monkeypatch):
+    storage = S3Storage(BUCKET, folder=str(tmp_path), client=s3)
+    storage.save(OFFERS[:10])
+
+    def fail(**kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(s3, "complete_multipart_upload", fail)
+    for offer in OFFERS[:10]:
+        storage.index.record(offer)
+    storage.flush()  # as the crawler does before closing
+    assert "otomoto/offer_index.json" not in _keys(s3)
+    with pytest.raises(RuntimeError):
+        storage.close()
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    # the offers were not stored, so the index must not list them either
+    assert "otomoto/offer_index.json" not in _keys(s3)
+
+
+def test_create_storage_s3(s3, tmp_path):
+    storage = create_storage("s3", folder=str(tmp_path), bucket=BUCKET, client=s3)
+    assert isinstance(storage, S3Storage)
+    assert storage.compression == "gzip" and storage.prefix == "otomoto"
+    with pytest.raises(ValueError):
+        create_storage("s3", folder=str(tmp_path), bucket="", client=s3)
+
+
+def test_relist_index_and_log_live_in_s3(s3, tmp_path):
+    with S3Storage(BUCKET, folder=str(tmp_path / "a"), client=s3) as storage:
+        storage.relist_index.observe({"id": "1", "car_brand": "BMW", "year": 2015})
+        storage.save_relists([{"id": "2", "relist_of": "1"}])
+    with S3Storage(BUCKET, folder=str(tmp_path / "b"), client=s3) as storage:
+        assert "1" in storage.relist_index
+
+    assert "otomoto/relist_index.json" in _keys(s3)
+    assert list(iter_s3_offers(BUCKET, name="relists", client=s3)) == [
+        {"id": "2", "relist_of": "1"}
+    ]
+
+
+def test_schedule_lives_in_s3(s3, tmp_path, monkeypatch):
+    sample = Path(__file__).parents[1] / "fixtures" / "sample_page.html"
+    fetched = []
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        fetched.append(url)
+        return sample.read_text(encoding="utf-8")
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    urls = ["https://example/search"]
+    with S3Storage(BUCKET, folder=str(tmp_path / "a"), client=s3) as storage:
+        run_scheduled(urls, storage, budget=2, delay=0, now=0)
+    assert fetched and "otomoto/schedule.json" in _keys(s3)
+
+    fetched.clear()
+    # a fresh container knows the search was crawled an hour ago
+    with S3Storage(BUCKET, folder=str(tmp_path / "b"), client=s3) as storage:
+        assert run_scheduled(urls, storage, budget=2, delay=0, now=3600) == {}
+    assert fetched == []
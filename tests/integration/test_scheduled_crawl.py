@@ -0,0 +1,60 @@
+from itertools import count
+from pathlib import Path
+
+import src.scraper.crawler as crawler_mod
+from src.scraper.scheduler import CrawlScheduler, run_scheduled
+from src.scraper.storage import LocalJSONLStorage
+
+SAMPLE = (Path(__file__).parents[1] / "fixtures" / "sample_page.html").read_text(
+    encoding="utf-8"
+)
+HOUR = 3600
+
+
+def test_run_scheduled_spends_budget_and_backs_off_quiet_searches(
+    monkeypatch, tmp_path
+):
+    fetched = []
+    fresh = count()
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        fetched.append(url)
+        if url.startswith("https://busy"):
+            # fresh offers on every request
+            n = next(fresh)
+            return SAMPLE.replace("6FRsVn", f"b{n}").replace("6FRt2m", f"c{n}")
+        return SAMPLE
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    urls = ["https://busy/search", "https://quiet/search"]
+
+    def scheduler():
+        return CrawlScheduler(
+            tmp_path / "schedule.json", target_yield=2, initial_interval=6 * HOUR
+        )
+
+    first = run_scheduled(
+        urls, storage, budget=6, max_pages=4, delay=0, scheduler=scheduler(), now=0
+    )
+    assert sum(c["pages"] for c in first.values()) <= 6
+    assert first["https://quiet/search"]["new"] == 2
+
+    fetched.clear()
+    second = run_scheduled(
+        urls,
+        storage,
+        budget=6,
+        max_pages=4,
+        delay=0,
+        scheduler=scheduler(),
+        now=7 * HOUR,
+    )
+    assert len(fetched) <= 6
+    assert second["https://busy/search"]["new"] > 0
+    assert second["https://quiet/search"] == {"pages": 1, "new": 0, "changed": 0}
+
+    state = scheduler().searches
+    assert (
+        state["https://busy/search"].interval < state["https://quiet/search"].interval
+    )
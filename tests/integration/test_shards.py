@@ -0,0 +1,157 @@
+import io
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import lambda_handler
+from benchmarks.fixture_server import FixtureServer
+from src.scraper.shards import (
+    Shard,
+    handle_shard_event,
+    lambda_invoker,
+    merge_parts,
+    plan_shards,
+    run_coordinator,
+    run_local,
+)
+from src.scraper.storage import LocalJSONLStorage, iter_jsonl
+
+SAMPLE = Path(__file__).parents[1] / "fixtures" / "sample_page.html"
+
+
+@pytest.fixture
+def server():
+    with FixtureServer(pages=5, template=SAMPLE) as srv:
+        yield srv
+
+
+def test_plan_shards_covers_every_page_once():
+    shards = plan_shards(["a", "b"], pages=7, pages_per_shard=3)
+
+    assert [(s.base_url, s.start_page, s.end_page) for s in shards] == [
+        ("a", 1, 3),
+        ("a", 4, 6),
+        ("a", 7, 7),
+        ("b", 1, 3),
+        ("b", 4, 6),
+        ("b", 7, 7),
+    ]
+    assert len({s.shard_id for s in shards}) == len(shards)
+    assert Shard.from_event(shards[1].to_event()) == shards[1]
+
+
+def test_merge_parts_dedupes_across_parts_and_runs(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    a = {"id": "1", "price": 10.0, "mileage_km": 5}
+    b = {"id": "2", "price": 20.0, "mileage_km": 5}
+
+    assert merge_parts([[a, b], [b]], storage) == {
+        "offers": 3,
+        "duplicates": 1,
+        "new": 2,
+        "changed": 0,
+    }
+    stats = merge_parts([[dict(a, price=9.0)], [b]], storage)
+
+    assert stats == {"offers": 2, "duplicates": 0, "new": 0, "changed": 1}
+    assert [o["id"] for o in iter_jsonl(tmp_path / "all_offers.jsonl")] == ["1", "2"]
+
+
+def test_run_local_shards_in_worker_processes(tmp_path, server):
+    # the same search twice: every offer of the second one is a duplicate
+    shards = plan_shards([server.url, server.url + "?x=1"], pages=6, pages_per_shard=2)
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+
+    stats = run_local(
+        shards, storage, workers=2, folder=str(tmp_path), options={"delay": 0}
+    )
+
+    assert stats["shards"] == 6 and stats["failed_shards"] == []
+    assert stats["new"] == 10
+    assert stats["duplicates"] == 10
+    merged = list(iter_jsonl(tmp_path / "all_offers.jsonl"))
+    assert len({o["id"] for o in merged}) == len(merged) == 10
+    # every shard wrote its own part
+    parts = sorted(
+        p.parent.name for p in (tmp_path / "parts").glob("*/all_offers.jsonl")
+    )
+    assert parts == sorted(s.shard_id for s in shards if s.start_page <= 5)
+
+
+class _InProcessLambda:
+    """boto3 Lambda client stand-in invoking the handler in this process."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        self.calls += 1
+        context = SimpleNamespace(
+            aws_request_id=f"req-{self.calls}",
+            function_name=FunctionName,
+            memory_limit_in_mb=512,
+            invoked_function_arn=FunctionName,
+        )
+        response = lambda_handler.handler(json.loads(Payload), context)
+        return {"Payload": io.BytesIO(json.dumps(response).encode("utf-8"))}
+
+
+def test_coordinator_invokes_lambda_shards(tmp_path, monkeypatch, server):
+    monkeypatch.chdir(tmp_path)
+    client = _InProcessLambda()
+    shards = plan_shards([server.url], pages=5, pages_per_shard=2)
+    storage = LocalJSONLStorage(folder=str(tmp_path / "merged"))
+
+    stats = run_coordinator(
+        shards,
+        lambda_invoker("scraper", client=client),
+        storage,
+        max_parallel=1,
+        options={"delay": 0},
+    )
+
+    assert client.calls == 3
+    assert stats["new"] == 10 and stats["failed_shards"] == []
+
+
+def test_shard_event_ignores_unknown_options(tmp_path, server):
+    shard = plan_shards([server.url], pages=1, pages_per_shard=1)[0]
+    event = shard.to_event({"delay": 0, "max_pages": 99, "storage": "s3"})
+
+    result = handle_shard_event(event, folder=str(tmp_path))
+    assert result["shard_id"] == shard.shard_id and result["count"] == 2
+
+
+def test_lambda_client_waits_for_slow_shards_without_retrying(monkeypatch):
+    import boto3
+
+    created = {}
+
+    def fake_client(service, config=None):
+        created.update(service=service, config=config)
+        return SimpleNamespace()
+
+    monkeypatch.setattr(boto3, "client", fake_client)
+    lambda_invoker("scraper")
+
+    config = created["config"]
+    assert created["service"] == "lambda"
+    assert config.read_timeout == 900 and config.connect_timeout == 10
+    assert config.retries == {"max_attempts": 0}
+
+
+def test_coordinator_reports_failed_shards(tmp_path):
+    def invoke(event):
+        if event["shard"]["start_page"] == 1:
+            raise RuntimeError("timeout")
+        return {"shard_id": event["shard"]["shard_id"], "offers": [{"id": "x"}]}
+
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    stats = run_coordinator(
+        plan_shards(["u"], pages=4, pages_per_shard=2), invoke, storage
+    )
+
+    assert stats["failed_shards"] == ["s00-p001-002"]
+    assert stats["new"] == 1
@@ -0,0 +1,197 @@
+import json
+import statistics
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.scraper.analytics import OfferFrame, load_offers, main  # noqa: E402
+from src.scraper.storage import LocalJSONLStorage  # noqa: E402
+
+OFFERS = [
+    {
+        "id": "1",
+        "car_brand": "Audi",
+        "model": "A4",
+        "year": 2015,
+        "price": 50000.0,
+        "mileage_km": 100000,
+        "fuel_type": "Diesel",
+    },
+    {
+        "id": "2",
+        "car_brand": "Audi",
+        "model": "A4",
+        "year": 2015,
+        "price": 60000.0,
+        "mileage_km": 80000,
+        "fuel_type": "Benzyna",
+    },
+    {
+        "id": "3",
+        "car_brand": "Audi",
+        "model": "A4",
+        "year": 2015,
+        "price": 90000.0,
+        "mileage_km": 0,
+        "fuel_type": "Diesel",
+    },
+    {
+        "id": "4",
+        "car_brand": "Audi",
+        "model": "A6",
+        "year": 2018,
+        "price": 120000.0,
+        "mileage_km": None,
+        "fuel_type": None,
+    },
+    {
+        "id": "5",
+        "car_brand": "BMW",
+        "model": "Seria 3",
+        "year": 2012,
+        "price": 35000.0,
+        "mileage_km": 200000,
+        "fuel_type": "Diesel",
+    },
+    {
+        "id": "6",
+        "car_brand": "BMW",
+        "model": None,
+        "year": 2012,
+        "price": 1.0,
+        "mileage_km": 1,
+        "fuel_type": "Diesel",
+    },
+]
+
+
+def test_from_records_dictionary_encodes_sorted_categories():
+    frame = OfferFrame.from_records(OFFERS)
+    assert len(frame) == 6
+    assert frame.categories["car_brand"] == ["Audi", "BMW"]
+    assert frame.codes["car_brand"].tolist() == [0, 0, 0, 0, 1, 1]
+    assert frame.labels("model") == ["A4", "A4", "A4", "A6", "Seria 3", None]
+    assert frame.labels("location") == [None] * 6
+    assert np.isnan(frame.column("mileage_km")[3])
+
+
+def test_group_by_matches_numpy_percentiles():
+    frame = OfferFrame.from_records(OFFERS)
+    rows = frame.group_by(
+        ["model", "year"],
+        "price",
+        ["count", "mean", "median", "p25", "p90", "min", "max"],
+    )
+    # offers without a model are left out
+    assert [(r["model"], r["year"], r["count"]) for r in rows] == [
+        ("A4", 2015, 3),
+        ("A6", 2018, 1),
+        ("Seria 3", 2012, 1),
+    ]
+    a4 = [50000.0, 60000.0, 90000.0]
+    assert rows[0]["mean"] == pytest.approx(statistics.mean(a4))
+    assert rows[0]["median"] == 60000.0
+    assert rows[0]["p25"] == pytest.approx(np.percentile(a4, 25))
+    assert rows[0]["p90"] == pytest.approx(np.percentile(a4, 90))
+    assert (rows[0]["min"], rows[0]["max"]) == (50000.0, 90000.0)
+    assert rows[1]["p25"] == rows[1]["p90"] == 120000.0
+
+
+def test_group_by_randomized_against_python():
+    rng = np.random.default_rng(7)
+    brands = ["Audi", "BMW", "Opel", "Skoda"]
+    offers = [
+        {
+            "id": str(i),
+            "car_brand": brands[rng.integers(4)],
+            "year": int(rng.integers(2000, 2005)),
+            "price": float(rng.integers(1000, 90000)),
+        }
+        for i in range(2000)
+    ]
+    rows = OfferFrame.from_records(offers).group_by(
+        ["car_brand", "year"], "price", ["count", "sum", "p10", "median"]
+    )
+    assert len(rows) == 20
+    for row in rows:
+        prices = [
+            o["price"]
+            for o in offers
+            if (o["car_brand"], o["year"]) == (row["car_brand"], row["year"])
+        ]
+        assert row["count"] == len(prices)
+        assert row["sum"] == pytest.approx(sum(prices))
+        assert row["median"] == pytest.approx(statistics.median(prices))
+        assert row["p10"] == pytest.approx(np.percentile(prices, 10))
+
+
+def test_price_per_km_where_and_whole_frame():
+    frame = OfferFrame.from_records(OFFERS)
+    (row,) = frame.where("fuel_type = Diesel AND year >= 2015").group_by(
+        [], "price_per_km", ["count", "max"]
+    )
+    # zero mileage has no price per km
+    assert row == {"count": 1, "max": 0.5}
+    assert len(frame.where("car_brand != Audi")) == 2
+    assert len(frame.where("car_brand = Tesla")) == 0
+    with pytest.raises(ValueError):
+        frame.where("model > A4")
+    with pytest.raises(ValueError):
+        frame.group_by(["model"], "price", ["mode"])
+    assert OfferFrame.from_records([]).group_by(["model"]) == []
+
+
+def test_load_offers_keeps_latest_record_and_cli(tmp_path, capsys):
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    storage.save(OFFERS)
+    storage.save([{**OFFERS[0], "price": 55000.0}])
+
+    assert len(load_offers(str(tmp_path), latest=False)) == 7
+    frame = load_offers(str(tmp_path))
+    assert len(frame) == 6 and frame.column("price")[0] == 55000.0
+
+    main(
+        [
+            "--folder",
+            str(tmp_path),
+            "--by",
+            "car_brand",
+            "--agg",
+            "median",
+            "--min-count",
+            "2",
+            "--json",
+        ]
+    )
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert rows == [
+        {"car_brand": "Audi", "count": 4, "median": 75000.0},
+        {"car_brand": "BMW", "count": 2, "median": 17500.5},
+    ]
+    main(
+        ["--folder", str(tmp_path), "--by", "model", "--sort", "count", "--limit", "1"]
+    )
+    out = capsys.readouterr().out
+    assert out.startswith("6 offers, 1 groups") and "A4" in out
+
+
+def test_load_offers_applies_logged_changes(tmp_path):
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        storage.save(OFFERS[:2])
+        # what an incremental crawl logs instead of storing the offer again
+        storage.save_changes(
+            [
+                {"id": "1", "seen_at": "t1", "changes": {"price": [50000.0, 48000.0]}},
+                {"id": "1", "seen_at": "t2", "changes": {"price": [48000.0, 45000.0]}},
+                {"id": "2", "seen_at": "t2", "changes": {"mileage_km": [80000, 81000]}},
+                {"id": "9", "seen_at": "t2", "changes": {"price": [1.0, 2.0]}},
+            ]
+        )
+
+    frame = load_offers(str(tmp_path))
+    assert len(frame) == 2
+    assert frame.column("price").tolist() == [45000.0, 60000.0]
+    assert frame.column("mileage_km").tolist() == [100000.0, 81000.0]
+    raw = load_offers(str(tmp_path), latest=False)
+    assert raw.column("price").tolist() == [50000.0, 60000.0]
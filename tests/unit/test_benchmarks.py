@@ -0,0 +1,34 @@
+from benchmarks.harness import Result, compare
+
+
+def _result(name, seconds, peak):
+    return Result(
+        name=name,
+        seconds_per_call=seconds,
+        calls=10,
+        pages_per_s=None,
+        offers_per_s=None,
+        ops_per_s=1 / seconds,
+        alloc_peak_bytes=peak,
+        alloc_blocks=0,
+    )
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {
+        "fast": {"seconds_per_call": 1.0, "alloc_peak_bytes": 1000},
+        "slow": {"seconds_per_call": 1.0, "alloc_peak_bytes": 1000},
+        "fat": {"seconds_per_call": 1.0, "alloc_peak_bytes": 1000},
+    }
+    results = [
+        _result("fast", 1.1, 1000),
+        _result("slow", 1.5, 1000),
+        _result("fat", 0.5, 2000),
+        _result("new-case", 9.0, 9000),
+    ]
+
+    regressions = compare(results, baseline, threshold=0.25)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("slow: seconds_per_call")
+    assert regressions[1].startswith("fat: alloc_peak_bytes")
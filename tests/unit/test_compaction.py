@@ -0,0 +1,92 @@
+import gzip
+import json
+
+import pytest
+
+from src.scraper.compaction import compact, main
+from src.scraper.storage import LocalJSONLStorage, iter_jsonl
+
+
+def _offer(i, price=1000.0, mileage=100):
+    return {"id": str(i), "url": f"u{i}", "price": price, "mileage_km": mileage}
+
+
+def _write(path, records):
+    with path.open("w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_keeps_latest_record_sorted_and_emits_collapsed_changes(tmp_path):
+    first = tmp_path / "a.jsonl"
+    second = tmp_path / "b.jsonl"
+    _write(first, [_offer(3), _offer(1), _offer(2), _offer(3, price=900.0)])
+    _write(second, [_offer(1), {"url": "no-id"}, _offer(3, price=800.0, mileage=150)])
+    with first.open("a", encoding="utf-8") as f:
+        f.write("{broken\n\n")
+
+    stats = compact(
+        [first, second],
+        tmp_path / "out.jsonl",
+        changes_output=tmp_path / "changes.jsonl",
+    )
+
+    assert list(iter_jsonl(tmp_path / "out.jsonl")) == [
+        _offer(1),
+        _offer(2),
+        _offer(3, price=800.0, mileage=150),
+    ]
+    changes = list(iter_jsonl(tmp_path / "changes.jsonl"))
+    assert changes == [
+        {"id": "3", "seen_at": None, "changes": {"price": [1000.0, 900.0]}},
+        {
+            "id": "3",
+            "seen_at": None,
+            "changes": {"price": [900.0, 800.0], "mileage_km": [100, 150]},
+        },
+    ]
+    assert stats["records"] == 8 and stats["offers"] == 3
+    assert stats["changes"] == 2 and stats["skipped"] == 2
+    # spill files are cleaned up
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "a.jsonl",
+        "b.jsonl",
+        "changes.jsonl",
+        "out.jsonl",
+    ]
+
+
+@pytest.mark.parametrize("partitions", [1, 2, 16])
+def test_oversized_partitions_are_split_and_merged(tmp_path, partitions):
+    # fixed-length ids, like Otomoto's
+    records = [_offer(f"{6100000000 + i % 500}", price=float(i)) for i in range(2000)]
+    _write(tmp_path / "all.jsonl", records)
+
+    # a tiny budget forces every partition to be split again
+    stats = compact(
+        [tmp_path / "all.jsonl"],
+        tmp_path / "out.jsonl",
+        partitions=partitions,
+        partition_bytes=4096,
+    )
+
+    out = list(iter_jsonl(tmp_path / "out.jsonl"))
+    assert [o["id"] for o in out] == [str(6100000000 + i) for i in range(500)]
+    assert all(o["price"] == 1500.0 + int(o["id"]) - 6100000000 for o in out)
+    assert stats["partitions"] > partitions and stats["changes"] == 1500
+    assert 0 < stats["largest_partition"] <= 4096
+
+
+def test_compacts_segments_and_gzip_in_place(tmp_path):
+    with LocalJSONLStorage(folder=str(tmp_path), compression="gzip") as storage:
+        storage.save([_offer(1), _offer(2)])
+        storage.save([_offer(1, price=1.0)])
+    plain = tmp_path / "all_offers.jsonl"
+    _write(plain, [_offer(2, price=2.0), _offer(2, price=2.0)])
+
+    main([str(plain), str(tmp_path / "all_offers"), "-o", str(plain)])
+    assert list(iter_jsonl(plain)) == [_offer(1, price=1.0), _offer(2)]
+
+    compact([plain], tmp_path / "out.jsonl.gz")
+    lines = gzip.decompress((tmp_path / "out.jsonl.gz").read_bytes()).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["1", "2"]
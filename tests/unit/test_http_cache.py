@@ -0,0 +1,41 @@
+from src.scraper import http_cache as cache_mod
+from src.scraper.http_cache import HTTPCache
+
+
+def test_cache_evicts_least_recently_used_over_budget(tmp_path):
+    cache = HTTPCache(str(tmp_path), ttl=None, max_bytes=25)
+    cache.store("a", "x" * 10)
+    cache.store("b", "y" * 10)
+    assert cache.get("a") is not None  # "a" is now the most recently used
+    cache.store("c", "z" * 10)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert len(list(tmp_path.glob("*.html"))) == 2
+
+
+def test_cache_drops_expired_entries(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "time", lambda: now[0])
+    cache = HTTPCache(str(tmp_path), ttl=60)
+    entry = cache.store("a", "body", etag='"e"', last_modified="Mon, 01 Jan 2024")
+
+    assert cache.conditional_headers(entry) == {
+        "If-None-Match": '"e"',
+        "If-Modified-Since": "Mon, 01 Jan 2024",
+    }
+    now[0] += 30
+    cache.refresh(entry)
+    now[0] += 59
+    assert cache.read(cache.get("a")) == "body"
+    now[0] += 2
+    assert cache.get("a", allow_stale=True) is entry  # kept for replays
+    assert cache.get("a") is None
+
+
+def test_cache_index_survives_reload(tmp_path):
+    HTTPCache(str(tmp_path)).store("https://x/1", "zażółć", etag='"1"')
+    reloaded = HTTPCache(str(tmp_path))
+    entry = reloaded.get("https://x/1")
+    assert entry.etag == '"1"'
+    assert reloaded.read(entry) == "zażółć"
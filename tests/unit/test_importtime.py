@@ -0,0 +1,48 @@
+"""Cold-start guard: importing the Lambda handler must stay cheap."""
+
+import os
+
+import pytest
+
+from benchmarks.importtime import LAMBDA_ENV, measure, parse_importtime
+
+# loading the crawl stack (requests, pydantic, bs4) takes well over 200 ms
+HANDLER_BUDGET_MS = 100
+HEAVY = ("bs4", "requests", "pydantic", "pydantic_core", "dotenv", "boto3")
+
+
+def test_handler_import_skips_heavy_modules():
+    profile = measure("lambda_handler", env=LAMBDA_ENV, repeat=1)
+
+    assert [m for m in HEAVY if m in profile.modules] == []
+
+
+# wall-clock timings are flaky on shared runners; `make importtime` checks
+# the same budget
+@pytest.mark.skipif(
+    not os.getenv("SCRAPER_IMPORTTIME_BUDGET"),
+    reason="set SCRAPER_IMPORTTIME_BUDGET=1 to check the import time budget",
+)
+def test_handler_import_stays_in_budget():
+    profile = measure("lambda_handler", env=LAMBDA_ENV, repeat=3)
+
+    assert profile.total_ms < HANDLER_BUDGET_MS, profile.top(10)
+
+
+def test_parser_loads_bs4_only_for_dom_fallback():
+    profile = measure("src.scraper.parser", env=LAMBDA_ENV, repeat=1)
+
+    assert "bs4" not in profile.modules
+    assert "pydantic" in profile.modules
+
+
+def test_parse_importtime_output():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+    )
+    profile = parse_importtime("json", stderr)
+
+    assert profile.total_ms == 0.42
+    assert profile.top(1) == [("json", 300, 420)]
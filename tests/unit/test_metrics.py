@@ -0,0 +1,84 @@
+from src.scraper.metrics import (
+    EMF_MAX_VALUES,
+    SECONDS,
+    Metrics,
+    NullMetrics,
+    get_metrics,
+    set_metrics,
+)
+
+
+def test_counters_histograms_and_timers():
+    m = Metrics()
+    m.incr("fetch.requests")
+    m.incr("fetch.requests", 2)
+    for v in (1, 2, 3, 4):
+        m.observe("parse.offers", v)
+    with m.timer("store.write_seconds"):
+        pass
+
+    snap = m.snapshot()
+    assert snap["fetch.requests"] == 3
+    assert snap["parse.offers"] == {
+        "count": 4,
+        "sum": 10,
+        "mean": 2.5,
+        "p50": 3,
+        "p95": 4,
+        "max": 4,
+    }
+    assert snap["store.write_seconds"]["count"] == 1
+    assert m.units["store.write_seconds"] == SECONDS
+    assert "fetch.requests" in m.summary()
+
+
+def test_merge_adds_exported_metrics():
+    worker, parent = Metrics(), Metrics()
+    worker.incr("parse.validation_failures")
+    worker.observe("parse.offers", 32)
+    parent.observe("parse.offers", 10)
+
+    parent.merge(worker.export())
+
+    assert parent.counters == {"parse.validation_failures": 1}
+    assert parent.histograms["parse.offers"] == [10, 32]
+
+
+def test_emf_splits_histograms_into_documents():
+    m = Metrics()
+    m.incr("fetch.requests", 5)
+    for i in range(EMF_MAX_VALUES + 1):
+        m.observe("fetch.latency", i / 1000, SECONDS)
+
+    docs = m.emf("Scraper", {"FunctionName": "fn"}, timestamp=1.5)
+
+    assert len(docs) == 2
+    first, second = docs
+    directive = first["_aws"]["CloudWatchMetrics"][0]
+    assert first["_aws"]["Timestamp"] == 1500
+    assert directive["Namespace"] == "Scraper"
+    assert directive["Dimensions"] == [["FunctionName"]]
+    assert {"Name": "fetch.latency", "Unit": "Seconds"} in directive["Metrics"]
+    assert first["FunctionName"] == "fn" and first["fetch.requests"] == 5
+    assert len(first["fetch.latency"]) == EMF_MAX_VALUES
+    assert second["fetch.latency"] == [0.1] and "fetch.requests" not in second
+
+
+def test_null_metrics_record_nothing():
+    m = NullMetrics()
+    m.incr("a")
+    m.observe("b", 1.0)
+    with m.timer("c"):
+        pass
+    m.merge({"counters": {"a": 1}, "histograms": {"b": [1.0]}})
+
+    assert m.snapshot() == {} and m.emf("ns") == []
+
+
+def test_set_metrics_swaps_the_shared_registry():
+    null = NullMetrics()
+    previous = set_metrics(null)
+    try:
+        assert get_metrics() is null
+    finally:
+        set_metrics(previous)
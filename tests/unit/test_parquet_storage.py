@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src.scraper.parquet_storage import ParquetStorage, parse_filter, read_offers
+from src.scraper.storage import create_storage
+
+
+def _offer(i, year, price):
+    return {
+        "id": str(i),
+        "url": f"https://www.otomoto.pl/oferta/{i}",
+        "car_brand": "BMW",
+        "model": "Seria 5",
+        "year": year,
+        "price": price,
+        "price_currency": "PLN",
+        "engine_capacity": 1995.0,
+        "engine_power": 190,
+        "mileage_km": None,
+        "location": "Kraków",
+        "fuel_type": "Diesel",
+    }
+
+
+def test_parse_filter():
+    assert parse_filter("year >= 2015 AND price < 50000") == [
+        ("year", ">=", 2015),
+        ("price", "<", 50000),
+    ]
+    assert parse_filter("fuel_type = 'Diesel' and price <= 1.5") == [
+        ("fuel_type", "==", "Diesel"),
+        ("price", "<=", 1.5),
+    ]
+    with pytest.raises(ValueError):
+        parse_filter("year between 1 and 2")
+
+
+def test_parquet_storage_round_trip_with_pushdown(tmp_path):
+    offers = [
+        _offer(1, 2010, 30000.0),
+        _offer(2, 2016, 45000.0),
+        _offer(3, 2020, 90000.0),
+    ]
+
+    with create_storage("parquet", folder=str(tmp_path), row_group_size=2) as storage:
+        assert isinstance(storage, ParquetStorage)
+        storage.save(offers[:2])
+        storage.save(offers[2:])
+
+    files = list((tmp_path / "all_offers").glob("scrape_date=*/*.parquet"))
+    assert len(files) == 1
+
+    table = read_offers(tmp_path)
+    assert table.num_rows == 3
+    assert table.column("mileage_km").null_count == 3
+
+    cheap_recent = read_offers(
+        tmp_path, "year >= 2015 AND price < 50000", columns=["id", "price"]
+    )
+    assert cheap_recent.column_names == ["id", "price"]
+    assert cheap_recent.to_pylist() == [{"id": "2", "price": 45000.0}]
+
+
+def test_create_storage_rejects_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        create_storage("csv", folder=str(tmp_path))
+
+
+def test_latest_rows_follow_changed_offers(tmp_path):
+    with create_storage("parquet", folder=str(tmp_path)) as storage:
+        storage.save([_offer(1, 2016, 45000.0), _offer(2, 2018, 60000.0)])
+        storage.save_updated([_offer(1, 2016, 41000.0)])
+
+    assert read_offers(tmp_path).num_rows == 3  # every version is kept
+    latest = read_offers(tmp_path, columns=["id", "price"], latest=True)
+    assert latest.to_pylist() == [
+        {"id": "1", "price": 41000.0},
+        {"id": "2", "price": 60000.0},
+    ]
+    # the filter sees current prices, not the superseded row
+    stale = read_offers(tmp_path, "price > 44000", columns=["id"], latest=True)
+    assert stale.to_pylist() == [{"id": "2"}]
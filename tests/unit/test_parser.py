@@ -0,0 +1,94 @@
+from pathlib import Path
+
+import pytest
+
+from src.scraper.models import CarModel
+from src.scraper.parser import (
+    extract_next_data,
+    parse_listings,
+    parse_listings_dom,
+    parse_listings_json,
+    validate_offers,
+)
+
+FIXTURES = Path(__file__).parents[1] / "fixtures"
+SNAPSHOT = Path(__file__).parents[2] / "snapshot.html"
+BASE_URL = "https://www.otomoto.pl/osobowe/bmw/seria-5"
+
+
+@pytest.fixture
+def next_data_html():
+    """Listing page whose offers only exist in the __NEXT_DATA__ block"""
+    return (FIXTURES / "next_data_page.html").read_text(encoding="utf-8")
+
+
+def test_parse_listings_uses_next_data(next_data_html):
+    offers = parse_listings(next_data_html, BASE_URL)
+
+    assert [o["id"] for o in offers] == ["6140887488", "6143149694"]
+    first = offers[0]
+    assert first["url"] == (
+        "https://www.otomoto.pl/osobowe/oferta/bmw-seria-5-ID6HAxmo.html"
+    )
+    assert first["car_brand"] == "BMW"
+    assert first["model"] == "Seria 5"
+    assert first["year"] == 2011
+    assert first["price"] == 48500.0
+    assert first["price_currency"] == "PLN"
+    assert first["engine_capacity"] == 2996.0
+    assert first["engine_power"] == 204
+    assert first["mileage_km"] == 120030
+    assert first["location"] == "Szczecin (Zachodniopomorskie)"
+    assert first["fuel_type"] == "Benzyna"
+
+
+def test_parse_listings_json_returns_none_without_block():
+    html = (FIXTURES / "sample_page.html").read_text(encoding="utf-8")
+    assert extract_next_data(html) is None
+    assert parse_listings_json(html, BASE_URL) is None
+    # the public entry point falls back to the DOM parser
+    assert {o["id"] for o in parse_listings(html, BASE_URL)} == {"6FRsVn", "6FRt2m"}
+
+
+def test_extract_next_data_ignores_broken_json():
+    html = '<script id="__NEXT_DATA__" type="application/json">{oops</script>'
+    assert extract_next_data(html) is None
+
+
+@pytest.mark.skipif(not SNAPSHOT.exists(), reason="snapshot.html not available")
+def test_next_data_matches_dom_on_snapshot():
+    """Both paths agree on the saved page, except engine power which the DOM
+    path guesses from free-text descriptions"""
+    html = SNAPSHOT.read_text(encoding="utf-8")
+    from_json = parse_listings_json(html, BASE_URL)
+    from_dom = parse_listings_dom(html, BASE_URL)
+
+    assert len(from_json) == len(from_dom) == 32
+    for a, b in zip(from_json, from_dom):
+        a.pop("engine_power")
+        b.pop("engine_power")
+        assert a == b
+
+
+def test_validate_offers_matches_car_model_and_isolates_bad_offers():
+    good = {
+        "id": "1",
+        "url": "u",
+        "car_brand": "BMW",
+        "model": "Seria 5",
+        "year": "2015",
+        "price": "48500",
+        "price_currency": "PLN",
+        "engine_capacity": None,
+        "engine_power": 190,
+        "mileage_km": None,
+        "location": None,
+        "fuel_type": "Diesel",
+    }
+    bad = dict(good, id="2", year="unknown")
+
+    assert validate_offers([good]) == [CarModel.model_validate(good).model_dump()]
+
+    validated, fallback = validate_offers([good, bad])
+    assert validated["id"] == "1" and validated["year"] == 2015
+    assert fallback is bad
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from src.scraper.pipeline import iter_parsed_pages, resolve_parse_workers
+
+SAMPLE = (Path(__file__).parents[1] / "fixtures" / "sample_page.html").read_text(
+    encoding="utf-8"
+)
+BASE_URL = "https://www.otomoto.pl/osobowe/bmw/seria-5"
+
+
+def test_iter_parsed_pages_bounds_pages_in_flight():
+    pulled = []
+
+    def fetched():
+        for page in range(1, 11):
+            pulled.append(page)
+            yield page, f"u{page}", SAMPLE, None
+
+    parsed = iter_parsed_pages(fetched(), BASE_URL, workers=1, max_in_flight=2)
+    page, url, offers, error = next(parsed)
+
+    assert (page, url, error) == (1, "u1", None)
+    assert len(offers) == 2
+    assert pulled == [1, 2]
+
+    rest = list(parsed)
+    assert [p[0] for p in rest] == list(range(2, 11))
+
+
+def test_iter_parsed_pages_passes_errors_through_and_stops():
+    error = RuntimeError("boom")
+    pages = [(1, "u1", SAMPLE, None), (2, "u2", None, error), (3, "u3", SAMPLE, None)]
+
+    parsed = list(iter_parsed_pages(iter(pages), BASE_URL, workers=1))
+
+    assert [(p[0], p[3]) for p in parsed] == [(1, None), (2, error)]
+
+
+def test_resolve_parse_workers():
+    assert resolve_parse_workers("0") == 0
+    assert resolve_parse_workers("3") == 3
+    assert resolve_parse_workers("auto") >= 1
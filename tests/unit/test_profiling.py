@@ -0,0 +1,80 @@
+import json
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+import src.scraper.crawler as crawler_mod
+from src.scraper import main as main_mod
+from src.scraper.profiling import Profiler, make_profiler
+
+SAMPLE = Path(__file__).parents[1] / "fixtures" / "sample_page.html"
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+def test_cprofile_and_memory_snapshot(tmp_path):
+    prof = Profiler(folder=str(tmp_path), mode="cprofile", memory=True, name="run")
+    prof.start()
+    _busy(0.05)
+    blob = [bytearray(1024) for _ in range(100)]
+    written = prof.stop()
+
+    assert written["cprofile"] == tmp_path / "profiles" / "run.prof"
+
+    stats = pstats.Stats(str(written["cprofile"]))
+    assert any(func[2] == "_busy" for func in stats.stats)
+    snapshot = tracemalloc.Snapshot.load(str(written["memory"]))
+    assert sum(s.size for s in snapshot.statistics("filename")) >= 100 * 1024
+    del blob
+
+
+def test_sampling_profile_is_speedscope_json(tmp_path, capsys):
+    prof = Profiler(
+        folder=str(tmp_path), mode="sampling", interval=0.001, top=3, name="s"
+    )
+    prof.start()
+    _busy(0.1)
+    written = prof.stop()
+
+    doc = json.loads(written["sampling"].read_text(encoding="utf-8"))
+    names = [f["name"] for f in doc["shared"]["frames"]]
+    assert "_busy" in names
+    main_thread = next(p for p in doc["profiles"] if p["name"] == "MainThread")
+    assert main_thread["type"] == "sampled"
+    assert len(main_thread["samples"]) == len(main_thread["weights"]) > 0
+    assert "Top 3 sampled functions" in capsys.readouterr().out
+
+
+def test_make_profiler_options(tmp_path):
+    assert make_profiler() is None
+    assert make_profiler("cprofile", page=3).name.endswith("-page3")
+    with pytest.raises(ValueError):
+        Profiler(mode="perf")
+
+
+def test_main_profiles_a_single_page(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    fetched = []
+    html = SAMPLE.read_text(encoding="utf-8")
+
+    def fake_fetch(url, timeout=10, save_snapshot=None):
+        fetched.append(url)
+        return html
+
+    monkeypatch.setattr(crawler_mod, "fetch_page", fake_fetch)
+    main_mod.main(
+        ["--profile", "cprofile", "--profile-page", "3", "--profile-top", "5"]
+    )
+
+    assert [u.rsplit("=", 1)[-1] for u in fetched] == ["3"]
+    profiles = list((tmp_path / "data" / "profiles").glob("*-page3.prof"))
+    assert len(profiles) == 1
@@ -0,0 +1,44 @@
+from src.scraper.ratelimit import AdaptiveRateLimiter, HostRateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.1
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = TokenBucket(rate=None)
+    assert all(bucket.try_acquire() == 0.0 for _ in range(100))
+
+
+def test_host_rate_limiter_keeps_bucket_per_host():
+    limiter = HostRateLimiter(rate=1.0)
+    assert limiter.bucket("a.example") is limiter.bucket("a.example")
+    assert limiter.bucket("a.example") is not limiter.bucket("b.example")
+    assert limiter.bucket("a.example").try_acquire() == 0.0
+    # a different host still has its own token available
+    assert limiter.bucket("b.example").try_acquire() == 0.0
+
+
+def test_adaptive_rate_limiter_decreases_on_throttle_and_recovers():
+    limiter = AdaptiveRateLimiter(
+        min_rate=0.5, max_rate=4.0, increase=1.0, decrease=0.5
+    )
+    url = "https://a.example/x"
+    assert limiter.rate(url) is None
+
+    limiter.on_throttle(url)  # no history yet: start from max_rate
+    assert limiter.rate(url) == 2.0
+    limiter.on_throttle(url)
+    limiter.on_throttle(url)
+    assert limiter.rate(url) == 0.5  # floored at min_rate
+
+    limiter.on_success(url)
+    assert limiter.rate(url) == 1.5
+    for _ in range(3):
+        limiter.on_success(url)
+    assert limiter.rate(url) is None  # back to unthrottled
+    assert limiter.rate("https://b.example/") is None
@@ -0,0 +1,102 @@
+import json
+import random
+
+from src.scraper.relists import RelistIndex, jaccard, offer_shingles
+
+CAR = {
+    "id": "1",
+    "url": "https://www.otomoto.pl/osobowe/oferta/bmw-ID1.html",
+    "car_brand": "BMW",
+    "model": "Seria 5 530i xDrive",
+    "year": 2021,
+    "price": 239900.0,
+    "engine_capacity": 1998.0,
+    "engine_power": 252,
+    "mileage_km": 45275,
+    "location": "Warszawa, Mokotów",
+    "fuel_type": "Benzyna",
+}
+
+
+def _random_offers(n, seed=1):
+    rng = random.Random(seed)
+    brands = ["Audi", "BMW", "Opel", "Skoda", "Toyota"]
+    models = ["A4", "Seria 3", "Astra", "Octavia", "Corolla", "A6 Avant", "X5"]
+    cities = ["Kraków", "Gdańsk", "Poznań", "Łódź", "Lublin"]
+    return [
+        {
+            "id": f"r{i}",
+            "car_brand": rng.choice(brands),
+            "model": rng.choice(models),
+            "year": rng.randint(2000, 2024),
+            "mileage_km": rng.randint(0, 300000),
+            "engine_capacity": rng.choice([1395.0, 1598.0, 1968.0]),
+            "engine_power": rng.randint(90, 300),
+            "location": rng.choice(cities),
+            "fuel_type": rng.choice(["Diesel", "Benzyna"]),
+            "price": float(rng.randint(10000, 200000)),
+        }
+        for i in range(n)
+    ]
+
+
+def test_shingles_cover_title_numbers_and_location():
+    shingles = offer_shingles(CAR)
+    assert {"w:bmw", "w:xdrive", "p:530i xdrive", "year:2021", "l:mokotów"} <= shingles
+    assert "mileage_km:4" in shingles and "engine_capacity:19" in shingles
+    moved = offer_shingles({**CAR, "location": "Kraków"})
+    assert 0.6 < jaccard(shingles, moved) < 1
+
+
+def test_relist_found_among_many_offers(tmp_path):
+    index = RelistIndex(tmp_path / "relist_index.json")
+    for offer in _random_offers(2000):
+        index.observe(offer)
+    assert index.observe(CAR, "2026-01-01T00:00:00+00:00") is None
+    index.save()
+
+    index = RelistIndex(tmp_path / "relist_index.json", max_age_days=None)
+    relist = {**CAR, "id": "2", "url": "u2", "price": 229900.0, "mileage_km": 45900}
+    event = index.observe(relist)
+    assert event["relist_of"] == "1" and event["kind"] == "relist"
+    assert event["previous_seen_at"] == "2026-01-01T00:00:00+00:00"
+    assert event["similarity"] == 1.0
+    # the same car listed twice in one run is a duplicate
+    event = index.observe({**relist, "id": "3"})
+    assert event["relist_of"] == "2" and event["kind"] == "duplicate"
+
+
+def test_different_cars_and_known_ids_are_not_flagged(tmp_path):
+    index = RelistIndex(tmp_path / "relist_index.json")
+    index.observe(CAR)
+    assert index.observe({**CAR, "price": 1.0}) is None  # same id again
+    assert index.observe({**CAR, "id": "2", "year": 2020}) is None
+    # a relisted car cannot have less mileage
+    assert index.observe({**CAR, "id": "3", "mileage_km": 20000}) is None
+    assert index.observe({**CAR, "id": "4", "engine_power": 340}) is None
+    assert index.observe({**CAR, "id": "5", "model": "X5 xDrive40d"}) is None
+    assert len(index) == 5
+
+
+def test_index_seeded_from_stored_offers_reports_relists(tmp_path):
+    index = RelistIndex.from_records(
+        tmp_path / "relist_index.json", [CAR, {"url": "no-id"}, *_random_offers(20)]
+    )
+    assert len(index) == 21 and "1" in index
+
+    event = index.observe({**CAR, "id": "2"})
+    assert event["relist_of"] == "1" and event["kind"] == "relist"
+
+
+def test_old_entries_are_dropped_on_load(tmp_path):
+    path = tmp_path / "relist_index.json"
+    index = RelistIndex(path)
+    index.observe(CAR, seen_at="2000-01-01T00:00:00+00:00")
+    index.observe({**CAR, "id": "2", "car_brand": "Audi"})
+    assert index.save() and not index.save()
+
+    reloaded = RelistIndex(path, max_age_days=30)
+    assert "1" not in reloaded and "2" in reloaded
+    assert reloaded.observe({**CAR, "id": "9"}) is None
+    reloaded.save()
+    assert set(json.loads(path.read_text(encoding="utf-8"))) == {"2", "9"}
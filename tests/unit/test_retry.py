@@ -0,0 +1,56 @@
+import random
+import time
+from email.utils import formatdate
+
+from src.scraper.retry import CircuitBreaker, RetryPolicy, parse_retry_after
+
+
+def test_parse_retry_after_accepts_seconds_and_dates():
+    now = time.time()
+    assert parse_retry_after("12") == 12.0
+    assert 29 <= parse_retry_after(formatdate(now + 30, usegmt=True), now=now) <= 30
+    assert parse_retry_after(formatdate(now - 30, usegmt=True), now=now) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_policy_backoff_is_jittered_capped_and_honors_retry_after():
+    policy = RetryPolicy(
+        tries=5, base=1.0, cap=4.0, max_retry_after=60, rng=random.Random(1)
+    )
+    delays = [policy.delay(attempt) for attempt in range(1, 6) for _ in range(50)]
+
+    assert all(0 <= d <= 4.0 for d in delays)
+    assert max(delays) > 3.0 and min(delays) < 0.5
+    assert policy.delay(1, retry_after=10) == 10
+    assert policy.delay(1, retry_after=600) == 60
+
+
+def test_retry_policy_only_retries_transient_failures():
+    policy = RetryPolicy(tries=3)
+    assert policy.should_retry(1, None)
+    assert policy.should_retry(1, 429) and policy.should_retry(2, 503)
+    assert not policy.should_retry(1, 404)
+    assert not policy.should_retry(3, 503)
+
+
+def test_circuit_breaker_opens_pauses_and_closes_again():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    paused = breaker.wait()
+    assert paused > 0 and breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record_failure()  # failed trial: open again for longer
+    assert breaker.state == CircuitBreaker.OPEN and breaker.cooldown == 0.1
+
+    breaker.wait()
+    breaker.record_neutral()  # e.g. a 404: the next caller gets the trial
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.wait()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.wait() == 0.0 and breaker.cooldown == 0.05
@@ -0,0 +1,55 @@
+from src.scraper.scheduler import CrawlScheduler
+
+HOUR = 3600
+
+
+def _scheduler(tmp_path):
+    return CrawlScheduler(
+        tmp_path / "schedule.json",
+        min_interval=HOUR,
+        max_interval=48 * HOUR,
+        initial_interval=6 * HOUR,
+        target_yield=10,
+    )
+
+
+def test_busy_searches_are_revisited_sooner_than_quiet_ones(tmp_path):
+    sched = _scheduler(tmp_path)
+    sched.sync(["busy", "quiet"])
+    for run in range(4):
+        now = run * 100 * HOUR
+        sched.record("busy", pages=3, new=40, changed=5, now=now)
+        sched.record("quiet", pages=1, new=0, changed=0, now=now)
+
+    busy, quiet = sched.searches["busy"], sched.searches["quiet"]
+    assert busy.interval == HOUR
+    assert quiet.interval == 48 * HOUR
+    assert busy.churn > quiet.churn == 0.0
+
+
+def test_plan_shares_budget_by_churn_and_persists(tmp_path):
+    sched = _scheduler(tmp_path)
+    sched.sync(["busy", "quiet", "later"])
+    sched.record("busy", pages=3, new=30, changed=0, now=0)
+    sched.record("quiet", pages=1, new=1, changed=0, now=0)
+    sched.record("later", pages=1, new=1, changed=0, now=0)
+    sched.searches["later"].next_due = 10 * 24 * HOUR
+    sched.save()
+
+    reloaded = _scheduler(tmp_path)
+    plan = reloaded.plan(budget=12, max_pages=10, now=3 * 24 * HOUR)
+
+    assert [url for url, _ in plan] == ["busy", "quiet"]
+    assert dict(plan)["busy"] > dict(plan)["quiet"] >= 1
+    assert sum(p for _, p in plan) <= 12
+
+
+def test_sync_adds_new_searches_as_due_and_drops_removed(tmp_path):
+    sched = _scheduler(tmp_path)
+    sched.sync(["a"])
+    sched.record("a", pages=1, new=10, changed=0, now=0)
+    sched.sync(["a", "b"])
+
+    assert [s.url for s in sched.due(now=1)] == ["b"]
+    sched.sync(["b"])
+    assert list(sched.searches) == ["b"]
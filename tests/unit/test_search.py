@@ -0,0 +1,186 @@
+import json
+
+import pytest
+
+from src.scraper.search import OfferSearch, main, tokens
+from src.scraper.storage import LocalJSONLStorage
+
+
+def _offer(i, **fields):
+    offer = {
+        "id": str(i),
+        "car_brand": "BMW",
+        "model": "Seria 5",
+        "year": 2016,
+        "price": 100000.0,
+        "mileage_km": 150000,
+        "fuel_type": "Diesel",
+        "location": "Warszawa, Mokotów",
+    }
+    offer.update(fields)
+    return offer
+
+
+OFFERS = [
+    _offer(1),
+    _offer(2, year=2014),
+    _offer(3, mileage_km=250000),
+    _offer(4, fuel_type="Benzyna"),
+    _offer(5, location="Łódź, Bałuty"),
+    _offer(6, model="Seria 3"),
+    _offer(7, car_brand="Audi", model="A6"),
+    _offer(8, price=80000.0),
+    _offer(9, price=None),
+]
+
+
+def _ids(result):
+    return [o["id"] for o in result.offers]
+
+
+def test_tokens_are_normalized():
+    assert tokens("Łódź, Bałuty") == ("lodz", "baluty")
+    assert tokens(None) == ()
+
+
+def test_combines_text_and_range_conditions(tmp_path):
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        storage.save(OFFERS)
+    search = OfferSearch(str(tmp_path))
+
+    result = search.search(
+        brand="bmw",
+        model="seria 5",
+        fuel_type="diesel",
+        location="warszawa",
+        ranges={"year": (2015, None), "mileage_km": (None, 200000)},
+    )
+    # cheapest first, offers without a price last
+    assert _ids(result) == ["8", "1", "9"] and result.total == 3
+
+    assert _ids(search.search(location="lodz")) == ["5"]
+    assert _ids(search.search(ranges={"price": (90000, 100000)}, sort="id")) == [
+        str(i) for i in range(1, 8)
+    ]
+    assert search.search(model="seria 7").total == 0
+    with pytest.raises(ValueError):
+        search.search(sort="colour")
+
+
+def test_pagination_and_sorting_without_filters(tmp_path):
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        storage.save([_offer(i, price=float(i)) for i in range(25)])
+    search = OfferSearch(str(tmp_path))
+
+    first = search.search(per_page=10)
+    last = search.search(per_page=10, page=3, sort="price", descending=True)
+    assert first.total == last.total == 25
+    assert _ids(first) == [str(i) for i in range(10)]
+    assert _ids(last) == ["4", "3", "2", "1", "0"]
+
+
+def test_refresh_reads_only_appended_offers(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    storage.save(OFFERS[:2])
+    search = OfferSearch(str(tmp_path))
+    assert search.refresh() == 2
+
+    storage.save([_offer(1, price=50000.0), _offer(10)])
+    # a line still being written is left for the next refresh
+    with (tmp_path / "all_offers.jsonl").open("a", encoding="utf-8") as f:
+        f.write(json.dumps(_offer(11))[:20])
+    assert search.refresh() == 2
+    assert len(search) == 3
+    assert search.search(ranges={"price": (None, 60000)}).offers == [
+        _offer(1, price=50000.0)
+    ]
+
+    # a compacted (replaced) file is indexed from scratch
+    path = tmp_path / "all_offers.jsonl"
+    tmp = tmp_path / "compacted.jsonl"
+    tmp.write_text(json.dumps(_offer(12)) + "\n", encoding="utf-8")
+    tmp.replace(path)
+    assert _ids(search.search()) == ["12"]
+
+
+def test_indexes_sealed_segments(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path), compression="gzip")
+    storage.save(OFFERS[:3])
+    storage.flush()
+    search = OfferSearch(str(tmp_path))
+    assert search.search().total == 3
+
+    storage.save(OFFERS[3:])
+    assert search.refresh() == 0  # the open segment is not sealed yet
+    storage.close()
+    assert search.refresh() == len(OFFERS) - 3
+    assert search.search(fuel_type="benzyna").total == 1
+
+
+def test_cli(tmp_path, capsys):
+    with LocalJSONLStorage(folder=str(tmp_path)) as storage:
+        storage.save(OFFERS)
+
+    main(["--folder", str(tmp_path), "--model", "seria 5", "--year-min", "2015"])
+    out = capsys.readouterr().out
+    assert out.startswith("6 offers, page 1 of 1")
+
+    main(["--folder", str(tmp_path), "--location", "łódź", "--json", "--per-page", "1"])
+    assert json.loads(capsys.readouterr().out) == OFFERS[4]
+
+
+def test_saved_indexes_are_reused_and_extended(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    storage.save(OFFERS)
+    storage.save([_offer(1, price=50000.0)])
+    search = OfferSearch(str(tmp_path))
+    search.search()
+    assert search.save() and not search.save()  # nothing new the second time
+
+    reloaded = OfferSearch(str(tmp_path))
+    assert reloaded.refresh() == 0 and len(reloaded) == len(OFFERS)
+    assert _ids(reloaded.search(location="lodz")) == ["5"]
+    assert reloaded.search(ranges={"price": (None, 60000)}).offers == [
+        _offer(1, price=50000.0)
+    ]
+
+    storage.save([_offer(10, year=2020)])
+    assert reloaded.refresh() == 1
+    assert _ids(reloaded.search(ranges={"year": (2019, None)})) == ["10"]
+    reloaded.save()
+
+    # a compacted file invalidates the saved indexes
+    tmp = tmp_path / "compacted.jsonl"
+    tmp.write_text(json.dumps(_offer(12)) + "\n", encoding="utf-8")
+    tmp.replace(tmp_path / "all_offers.jsonl")
+    assert _ids(OfferSearch(str(tmp_path)).search()) == ["12"]
+
+
+def test_logged_changes_reach_range_filters(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    storage.save(OFFERS[:2])
+    search = OfferSearch(str(tmp_path))
+    assert search.search(ranges={"price": (None, 90000)}).total == 0
+
+    storage.save_changes(
+        [{"id": "2", "seen_at": "t1", "changes": {"price": [100000.0, 85000.0]}}]
+    )
+    result = search.search(ranges={"price": (None, 90000)})
+    assert result.offers == [_offer(2, year=2014, price=85000.0)]
+    search.save()
+    assert OfferSearch(str(tmp_path)).search(sort="price").offers[0]["price"] == 85000.0
+
+    storage.save_changes(
+        [{"id": "2", "seen_at": "t2", "changes": {"price": [85000.0, 95000.0]}}]
+    )
+    reloaded = OfferSearch(str(tmp_path))
+    assert reloaded.search(ranges={"price": (None, 90000)}).total == 0
+    assert len(reloaded) == 2
+
+
+def test_searching_does_not_create_the_folder(tmp_path, capsys):
+    missing = tmp_path / "missing"
+    assert OfferSearch(str(missing)).search().total == 0
+    main(["--folder", str(missing)])
+    assert capsys.readouterr().out.startswith("0 offers")
+    assert not missing.exists()
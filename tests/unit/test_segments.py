@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+
+from src.scraper import segments as segments_mod
+from src.scraper.storage import LocalJSONLStorage, iter_offers
+
+OFFERS = [
+    {
+        "id": str(i),
+        "url": f"u{i}",
+        "price": 1000.0 + i,
+        "mileage_km": i,
+        "location": "Łódź",
+    }
+    for i in range(30)
+]
+
+
+def _run_dirs(tmp_path):
+    return sorted((tmp_path / "all_offers").glob("run-*"))
+
+
+def test_gzip_segments_rotate_by_size_with_manifest(tmp_path):
+    storage = LocalJSONLStorage(
+        folder=str(tmp_path), compression="gzip", segment_bytes=500
+    )
+    for i in range(0, 30, 5):
+        storage.save(OFFERS[i : i + 5])
+    storage.close()
+
+    (run,) = _run_dirs(tmp_path)
+    manifest = json.loads((run / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["rows"] == 30 and manifest["compression"] == "gzip"
+    assert len(manifest["segments"]) > 1
+    for seg in manifest["segments"]:
+        data = (run / seg["file"]).read_bytes()
+        assert seg["file"].endswith(".jsonl.gz")
+        assert seg["sha256"] == hashlib.sha256(data).hexdigest()
+        assert seg["bytes"] == len(data) < seg["uncompressed_bytes"]
+        assert len(gzip.decompress(data).splitlines()) == seg["rows"]
+
+    assert list(iter_offers(tmp_path, verify=True)) == OFFERS
+    assert not (tmp_path / "all_offers.jsonl").exists()
+
+
+def test_segments_rotate_by_age(monkeypatch, tmp_path):
+    clock = [0.0]
+    monkeypatch.setattr(segments_mod.time, "monotonic", lambda: clock[0])
+    storage = LocalJSONLStorage(
+        folder=str(tmp_path), compression="gzip", segment_seconds=60
+    )
+
+    storage.save(OFFERS[:2])
+    clock[0] = 30
+    storage.save(OFFERS[2:4])  # same segment
+    clock[0] = 61
+    storage.save(OFFERS[4:6])  # new segment
+    storage.close()
+
+    (run,) = _run_dirs(tmp_path)
+    manifest = json.loads((run / "manifest.json").read_text(encoding="utf-8"))
+    assert [s["rows"] for s in manifest["segments"]] == [4, 2]
+
+
+def test_reader_joins_plain_file_and_runs_and_checks_checksums(tmp_path):
+    LocalJSONLStorage(folder=str(tmp_path)).save(OFFERS[:3])
+    with LocalJSONLStorage(folder=str(tmp_path), compression="gzip") as storage:
+        storage.save(OFFERS[3:6])
+    with LocalJSONLStorage(folder=str(tmp_path), segment_bytes=1) as storage:
+        storage.save(OFFERS[6:8])
+
+    assert [o["id"] for o in iter_offers(tmp_path)] == [str(i) for i in range(8)]
+
+    # the index of a new storage is rebuilt from every layout
+    assert len(LocalJSONLStorage(folder=str(tmp_path)).index) == 8
+
+    run = _run_dirs(tmp_path)[0]
+    part = next(run.glob("part-*"))
+    part.write_bytes(gzip.compress(b'{"id": "x"}\n'))
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        list(iter_offers(tmp_path, verify=True))
+
+
+def test_unsealed_segments_are_not_listed(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path), compression="gzip")
+    storage.save(OFFERS[:2])
+    # still open: no manifest yet, so readers skip the partial file
+    assert list(iter_offers(tmp_path)) == []
+    storage.flush()
+    assert len(list(iter_offers(tmp_path))) == 2
+
+
+def test_zstd_segments_round_trip(tmp_path):
+    pytest.importorskip("zstandard")
+    with LocalJSONLStorage(folder=str(tmp_path), compression="zstd") as storage:
+        storage.save(OFFERS)
+
+    (run,) = _run_dirs(tmp_path)
+    assert [p.name for p in run.glob("part-*")] == ["part-00000.jsonl.zst"]
+    assert list(iter_offers(tmp_path, verify=True)) == OFFERS
+
+
+def test_unknown_compression_is_rejected(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path), compression="lz4")
+    with pytest.raises(ValueError, match="Unknown compression"):
+        storage.save(OFFERS[:1])
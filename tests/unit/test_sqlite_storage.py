@@ -0,0 +1,64 @@
+from src.scraper.sqlite_storage import SQLiteStorage
+from src.scraper.storage import create_storage
+
+OFFER = {
+    "id": "6FRsVn",
+    "url": "https://www.otomoto.pl/oferta/6FRsVn",
+    "car_brand": "BMW",
+    "model": "Seria 5 530i xDrive",
+    "year": 2021,
+    "price": 239900.0,
+    "price_currency": "PLN",
+    "engine_capacity": 1998.0,
+    "engine_power": 252,
+    "mileage_km": 45275,
+    "location": "Warszawa, Mokotów",
+    "fuel_type": "Benzyna",
+}
+
+
+def test_sqlite_upsert_keeps_one_row_and_price_history(tmp_path):
+    with create_storage("sqlite", folder=str(tmp_path)) as storage:
+        assert isinstance(storage, SQLiteStorage)
+        storage.save([OFFER])
+        storage.save([{**OFFER, "mileage_km": 46000}])  # no price change
+        storage.save([{**OFFER, "price": 229900.0}])
+
+        rows = storage.select()
+        assert len(rows) == 1
+        assert rows[0]["price"] == 229900.0
+        assert [h["price"] for h in storage.price_history("6FRsVn")] == [
+            239900.0,
+            229900.0,
+        ]
+        mode = storage.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+
+def test_sqlite_select_uses_indexes(tmp_path):
+    with SQLiteStorage(folder=str(tmp_path)) as storage:
+        storage.save(
+            [{**OFFER, "id": str(i), "year": 2000 + i % 20} for i in range(50)]
+        )
+        recent = storage.select("year >= ?", (2015,), order_by="price", limit=100)
+        assert len(recent) == 10
+        plan = storage.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM offers WHERE car_brand = ? AND model = ?",
+            ("BMW", "Seria 5"),
+        ).fetchall()
+        assert "idx_offers_brand_model" in " ".join(str(tuple(r)) for r in plan)
+
+
+def test_sqlite_offer_index_persists(tmp_path):
+    with SQLiteStorage(folder=str(tmp_path)) as storage:
+        assert storage.index.classify(OFFER) == ("new", {})
+        storage.index.record(OFFER)
+        storage.flush()
+
+    with SQLiteStorage(folder=str(tmp_path)) as storage:
+        assert "6FRsVn" in storage.index
+        assert len(storage.index) == 1
+        assert storage.index.classify({**OFFER, "price": 1.0}) == (
+            "changed",
+            {"price": (239900.0, 1.0)},
+        )
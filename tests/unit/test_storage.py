@@ -0,0 +1,50 @@
+import json
+
+from src.scraper.storage import LocalJSONLStorage, OfferIndex
+
+OFFER = {"id": "1", "url": "u", "price": 100.0, "mileage_km": 1000, "location": "A"}
+
+
+def test_offer_index_classifies_and_persists(tmp_path):
+    index = OfferIndex(tmp_path / "index.json")
+    assert index.classify(OFFER) == ("new", {})
+
+    index.record(OFFER, seen_at="2025-01-01T00:00:00+00:00")
+    index.save()
+
+    reloaded = OfferIndex(tmp_path / "index.json")
+    assert "1" in reloaded
+    assert reloaded.get("1")["last_seen"] == "2025-01-01T00:00:00+00:00"
+    assert reloaded.classify(OFFER) == ("unchanged", {})
+    # only price/mileage count as changes
+    assert reloaded.classify({**OFFER, "location": "B"}) == ("unchanged", {})
+    assert reloaded.classify({**OFFER, "price": 90.0, "mileage_km": 1200}) == (
+        "changed",
+        {"price": (100.0, 90.0), "mileage_km": (1000, 1200)},
+    )
+
+
+def test_storage_index_bootstraps_from_existing_jsonl(tmp_path):
+    lines = [OFFER, {**OFFER, "price": 95.0}, {**OFFER, "id": "2"}]
+    (tmp_path / "all_offers.jsonl").write_text(
+        "".join(json.dumps(o) + "\n" for o in lines), encoding="utf-8"
+    )
+
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+
+    assert len(storage.index) == 2
+    assert storage.index.get("1")["price"] == 95.0
+    storage.flush()
+    assert (tmp_path / "offer_index.json").exists()
+
+
+def test_jsonl_storage_writes_utf8_json_lines(tmp_path):
+    storage = LocalJSONLStorage(folder=str(tmp_path))
+    offer = dict(OFFER, location="Łódź (Łódzkie)")
+    storage.save([offer])
+    path = storage.save([OFFER])
+
+    raw = (tmp_path / "all_offers.jsonl").read_bytes()
+    assert "Łódź".encode("utf-8") in raw
+    assert [json.loads(line) for line in raw.splitlines()] == [offer, OFFER]
+    assert path == str(tmp_path / "all_offers.jsonl")
@@ -0,0 +1,49 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from src.scraper.parser import parse_listings, parse_listings_dom
+from src.scraper.stream_parser import iter_listings, parse_listings_stream
+
+FIXTURES = Path(__file__).parents[1] / "fixtures"
+SNAPSHOT = Path(__file__).parents[2] / "snapshot.html"
+BASE_URL = "https://www.otomoto.pl/osobowe/bmw/seria-5"
+
+
+@pytest.fixture
+def sample_html():
+    return (FIXTURES / "sample_page.html").read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 64 * 1024])
+def test_stream_parser_matches_soup_for_any_chunking(sample_html, chunk_size):
+    expected = parse_listings_dom(sample_html, BASE_URL)
+    streamed = list(iter_listings(io.StringIO(sample_html), BASE_URL, chunk_size))
+    assert streamed == expected
+
+
+def test_stream_parser_handles_entities_and_void_tags():
+    html = """
+    <article data-id="X1">
+      <h2 class="etydmma0"><a href="/oferta/x-ID1.html">Audi <br>A4 &amp; co</a></h2>
+      <h3 class="efzkujb1">12&nbsp;500</h3><p class="efzkujb2">PLN</p>
+      <img src="x.jpg">
+      <ul class="ooa-1o0axny"><li><span><p>Gdańsk</p></span></li></ul>
+    </article>
+    """
+    assert parse_listings_stream(html, BASE_URL) == parse_listings_dom(html, BASE_URL)
+
+
+def test_parse_listings_selects_backend(sample_html):
+    soup = parse_listings(sample_html, BASE_URL, backend="soup")
+    stream = parse_listings(sample_html, BASE_URL, backend="stream")
+    assert stream == soup
+    with pytest.raises(ValueError):
+        parse_listings(sample_html, BASE_URL, backend="regex")
+
+
+@pytest.mark.skipif(not SNAPSHOT.exists(), reason="snapshot.html not available")
+def test_stream_parser_matches_soup_on_snapshot():
+    html = SNAPSHOT.read_text(encoding="utf-8")
+    assert parse_listings_stream(html, BASE_URL) == parse_listings_dom(html, BASE_URL)
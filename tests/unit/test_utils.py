@@ -1,9 +1,14 @@
+import hashlib
+import random
+import re
+
 import pytest
 
 # from src.scraper.utils import some_utility_function
 from src.scraper.models import CarModel
-from src.scraper.utils import (extract_currency, parse_float_from_text,
-                               parse_int_from_text)
+from src.scraper.utils import (extract_currency, make_id_from_url_or_hash,
+                               parse_float_from_text, parse_floats_from_texts,
+                               parse_int_from_text, parse_ints_from_texts)
 
 
 def test_parse_int_from_text():
@@ -37,3 +42,72 @@ def test_valid_car_model_creation():
     assert car.id == "1"
     assert car.car_brand == "Toyota"
     assert car.price == 20000.0
+
+
+def test_parse_float_polish_formats():
+    assert parse_float_from_text("1 234,56") == 1234.56
+    assert parse_float_from_text("1\xa0234,56 zł") == 1234.56
+    assert parse_float_from_text("1 234 567 PLN") == 1234567.0
+    assert parse_float_from_text("1.234.567,89 zł") == 1234567.89
+    assert parse_float_from_text("1,234,567.89") == 1234567.89
+    assert parse_float_from_text("2.0 l / 1.5 l") is None
+    assert parse_float_from_text("brak") is None
+
+
+def test_batch_helpers_match_single_value_helpers():
+    values = ["225 275 km", None, "", "brak", "1 234,56 zł", "0"]
+    assert parse_ints_from_texts(values) == [parse_int_from_text(v) for v in values]
+    assert parse_floats_from_texts(values) == [parse_float_from_text(v) for v in values]
+
+
+# Implementations before the precompiled / translate-based rewrite, kept
+# as the reference for the randomized comparison below.
+def _legacy_parse_float_from_text(s):
+    if not s:
+        return None
+    digits = re.sub(r"[^\d.,]", "", s).replace(",", ".")
+    digits = re.sub(r"\s+", "", digits)
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+def _legacy_parse_int_from_text(s):
+    if not s:
+        return None
+    digits = re.sub(r"[^\d]", "", s)
+    try:
+        return int(digits) if digits else None
+    except ValueError:
+        return None
+
+
+def _legacy_make_id(url, title):
+    if url:
+        m = re.search(r"/oferta/(\d+)", url)
+        if m:
+            return m.group(1)
+    raw = (url or "") + "|" + (title or "")
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+_ALPHABET = "0123456789" * 3 + " \xa0 \t.,-+ezłPLNkm/٣²"
+
+
+def _random_texts(count, seed=20240601):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(0, 14)))
+
+
+def test_rewritten_helpers_agree_with_legacy_implementations():
+    for text in _random_texts(5000):
+        legacy = _legacy_parse_float_from_text(text)
+        # the rewrite only adds results for grouped numbers the old
+        # implementation rejected
+        if legacy is not None:
+            assert parse_float_from_text(text) == legacy, text
+        assert parse_int_from_text(text) == _legacy_parse_int_from_text(text), text
+        url = f"https://www.otomoto.pl/oferta/{text}"
+        assert make_id_from_url_or_hash(url, text) == _legacy_make_id(url, text)